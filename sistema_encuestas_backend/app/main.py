@@ -1,5 +1,4 @@
 # app/main.py
-import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers.auth_router import router as auth_router
@@ -12,16 +11,21 @@ from app.routers.dashboard_router import router as dashboard_router
 from app.routers.admin_analytics_router import router as admin_analytics_router
 from app.routers.perfil_router import router as perfil_router
 from app.routers.configuracion_inicial_router import router as configuracion_inicial_router
+from app.routers.metricas_router import router as metricas_router
 
 from app.middleware.security_headers import SecurityHeadersMiddleware
-from app.middleware.rate_limiter import RateLimiter
+from app.middleware.rate_limiter import RateLimitMiddleware
 from app.middleware.cors_middleware import CORSErrorMiddleware
-
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from app.middleware.metricas_middleware import (
+    MetricasMiddleware, registrar_eventos_db, respuesta_metricas, marcar_worker_terminado,
 )
+from app.database import engine
+from app.services.configuracion_service import configuracion_service
+from app.services.email_outbox_service import email_outbox_service
+from app.utils.logs import configurar_logging
+
+# Configurar logging: cola + hilo escritor, formato clave=valor (ver app/utils/logs.py)
+configurar_logging()
 
 app = FastAPI()
 
@@ -31,6 +35,14 @@ origins = [
     "http://127.0.0.1:3000",
 ]
 
+# Límite de peticiones por IP; se registra antes que CORS para que las respuestas 429
+# también lleven los encabezados CORS
+app.add_middleware(RateLimitMiddleware)
+
+# Headers de seguridad en todas las respuestas (incluidas las 429); /docs, /redoc y
+# /openapi.json van sin CSP para que Swagger UI y ReDoc carguen sus scripts del CDN
+app.add_middleware(SecurityHeadersMiddleware)
+
 # Middleware personalizado para CORS con manejo de errores
 app.add_middleware(CORSErrorMiddleware, allowed_origins=origins)
 
@@ -41,8 +53,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Encabezados de respuesta que el frontend puede leer (paginación del catálogo)
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 
+# Métricas por ruta; se registra último para medir también a los demás middlewares
+app.add_middleware(MetricasMiddleware, router=app.router)
+registrar_eventos_db(engine)
+
 api_prefix = "/api"
 
 # Incluir routers
@@ -56,6 +74,7 @@ app.include_router(dashboard_router, prefix=api_prefix)
 app.include_router(admin_analytics_router, prefix=api_prefix)
 app.include_router(perfil_router, prefix=api_prefix)
 app.include_router(configuracion_inicial_router, prefix=api_prefix)
+app.include_router(metricas_router, prefix=api_prefix)
 
 # Ruta de prueba pública para verificar CORS
 @app.get("/api/ping")
@@ -66,3 +85,19 @@ async def ping():
 @app.get("/")
 async def root():
     return {"message": "API de Sistema de Encuestas"}
+
+# Métricas Prometheus (no se publica en nginx; se consulta dentro de la red interna)
+@app.get("/metrics", include_in_schema=False)
+async def metricas_prometheus():
+    return respuesta_metricas()
+
+@app.on_event("startup")
+async def al_iniciar():
+    await configuracion_service.iniciar_escucha()
+    await email_outbox_service.iniciar()
+
+@app.on_event("shutdown")
+async def al_apagar():
+    await configuracion_service.detener_escucha()
+    await email_outbox_service.detener()
+    marcar_worker_terminado()
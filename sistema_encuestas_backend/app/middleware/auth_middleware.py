@@ -2,88 +2,201 @@
 Middleware de autenticación
 """
 import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
 from app.config import settings
 from app.database import get_db
 from app.models.usuario import Usuario
+from app.utils.cache import CacheTTL
+from app.utils.logs import campos
 
 # Configurar logger
 logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
+# Para endpoints públicos que cambian su respuesta si hay sesión
+security_opcional = HTTPBearer(auto_error=False)
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
-) -> Usuario:
+
+@dataclass(frozen=True)
+class UsuarioAutenticado:
     """
-    Obtiene el usuario actual desde el token JWT
+    Copia de solo lectura del usuario autenticado, desligada de la sesión.
+    Contiene los campos que usan los routers; no incluye password_hash.
     """
-    logger.info("🔐 Iniciando validación de token JWT")
-    
-    # Log del token (solo primeros y últimos caracteres por seguridad)
-    token = credentials.credentials
-    logger.info(f"🔑 Token recibido: {token[:10]}...{token[-10:] if len(token) > 20 else token}")
-    
-    credentials_exception = HTTPException(
+    id_usuario: int
+    nombre: str
+    apellido: str
+    email: str
+    documento_numero: str
+    celular_numero: Optional[str]
+    metodo_registro: Optional[str]
+    estado: Optional[bool]
+    rol_id: int
+    fecha_registro: Optional[datetime]
+    email_verificado: Optional[bool]
+    fecha_verificacion: Optional[datetime]
+    google_id: Optional[str]
+    avatar_url: Optional[str]
+    proveedor_auth: Optional[str]
+    puntos_totales: int
+    puntos_disponibles: int
+    puntos_canjeados: int
+    fecha_nacimiento: Optional[datetime]
+    sexo: Optional[str]
+    localizacion: Optional[str]
+
+    @classmethod
+    def desde_usuario(cls, usuario: Usuario) -> "UsuarioAutenticado":
+        return cls(
+            id_usuario=usuario.id_usuario,
+            nombre=usuario.nombre,
+            apellido=usuario.apellido,
+            email=usuario.email,
+            documento_numero=usuario.documento_numero,
+            celular_numero=usuario.celular_numero,
+            metodo_registro=usuario.metodo_registro,
+            estado=usuario.estado,
+            rol_id=usuario.rol_id,
+            fecha_registro=usuario.fecha_registro,
+            email_verificado=usuario.email_verificado,
+            fecha_verificacion=usuario.fecha_verificacion,
+            google_id=usuario.google_id,
+            avatar_url=usuario.avatar_url,
+            proveedor_auth=usuario.proveedor_auth,
+            puntos_totales=usuario.puntos_totales or 0,
+            puntos_disponibles=usuario.puntos_disponibles or 0,
+            puntos_canjeados=usuario.puntos_canjeados or 0,
+            fecha_nacimiento=usuario.fecha_nacimiento,
+            sexo=usuario.sexo,
+            localizacion=usuario.localizacion,
+        )
+
+    def puede_canjear(self, puntos_requeridos: int) -> bool:
+        """Verifica si el usuario tiene suficientes puntos para canjear"""
+        return self.puntos_disponibles >= puntos_requeridos
+
+
+# Caché por worker: id_usuario -> UsuarioAutenticado.
+# Las escrituras del propio worker la invalidan explícitamente; el TTL acota
+# cuánto tarda en verse un cambio hecho desde otro worker.
+cache_usuarios = CacheTTL(
+    max_entradas=settings.cache_usuario_max_entradas,
+    ttl_segundos=settings.cache_usuario_ttl_segundos,
+)
+
+
+def invalidar_usuario_cache(id_usuario: Optional[int]) -> None:
+    """Descarta el usuario cacheado; llamar después de modificar su fila"""
+    if id_usuario is not None:
+        cache_usuarios.invalidar(id_usuario)
+
+
+def _credenciales_invalidas() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _decodificar_token(token: str) -> tuple:
+    """Devuelve (email, usuario_id) del token JWT o lanza 401"""
     try:
-        payload = jwt.decode(
-            credentials.credentials, 
-            settings.secret_key, 
-            algorithms=[settings.algorithm]
-        )
-        email = payload.get("sub")
-        usuario_id = payload.get("usuario_id")
-        
-        logger.info(f"✅ Token decodificado correctamente - Email: {email}, Usuario ID: {usuario_id}")
-        
-        if email is None or usuario_id is None:
-            logger.error("❌ Token válido pero sin email o usuario_id")
-            raise credentials_exception
-            
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     except JWTError as e:
-        logger.error(f"❌ Error al decodificar token JWT: {str(e)}")
-        raise credentials_exception
-    
-    # Buscar usuario en la base de datos
+        logger.warning("Token JWT inválido", extra=campos(error=str(e)))
+        raise _credenciales_invalidas()
+
+    email = payload.get("sub")
+    usuario_id = payload.get("usuario_id")
+    if email is None or usuario_id is None:
+        logger.warning("Token válido pero sin email o usuario_id")
+        raise _credenciales_invalidas()
+
+    return email, usuario_id
+
+
+async def _cargar_usuario(db: AsyncSession, email: str, usuario_id: int) -> Usuario:
+    """Carga la fila del usuario por clave primaria y verifica que coincida con el token"""
     try:
-        query = await db.execute(select(Usuario).where(Usuario.email == email))
-        user = query.scalars().first()
-        
-        if user is None:
-            logger.error(f"❌ Usuario no encontrado en BD con email: {email}")
-            raise credentials_exception
-        
-        logger.info(f"✅ Usuario autenticado correctamente: {user.email} (ID: {user.id_usuario}, Rol: {user.rol_id})")
-        return user
-        
+        user = await db.get(Usuario, usuario_id)
     except Exception as e:
-        logger.error(f"❌ Error en consulta de base de datos: {str(e)}")
-        raise credentials_exception
+        logger.error("Error en consulta de base de datos", extra=campos(error=str(e)))
+        raise _credenciales_invalidas()
+
+    if user is None or user.email != email:
+        logger.warning("Usuario del token no encontrado en BD", extra=campos(id_usuario=usuario_id))
+        raise _credenciales_invalidas()
+
+    return user
+
 
-async def get_admin_user(current_user: Usuario = Depends(get_current_user)):
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> UsuarioAutenticado:
+    """
+    Obtiene el usuario actual desde el token JWT.
+    Devuelve una copia de solo lectura cacheada por worker; los endpoints que
+    modifican al usuario deben usar get_current_user_db.
+    """
+    email, usuario_id = _decodificar_token(credentials.credentials)
+
+    usuario = cache_usuarios.obtener(usuario_id)
+    if usuario is not None and usuario.email == email:
+        return usuario
+
+    user = await _cargar_usuario(db, email, usuario_id)
+    usuario = UsuarioAutenticado.desde_usuario(user)
+    cache_usuarios.guardar(usuario_id, usuario)
+
+    logger.debug("Usuario autenticado", extra=campos(id_usuario=usuario.id_usuario, rol_id=usuario.rol_id))
+    return usuario
+
+
+async def get_current_user_opcional(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_opcional),
+    db: AsyncSession = Depends(get_db)
+) -> Optional[UsuarioAutenticado]:
+    """
+    Como get_current_user, pero devuelve None si la petición no trae token.
+    Un token presente pero inválido sigue respondiendo 401.
+    """
+    if credentials is None:
+        return None
+    return await get_current_user(credentials, db)
+
+
+async def get_current_user_db(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> Usuario:
+    """
+    Obtiene la fila del usuario actual ligada a la sesión, para endpoints que la modifican.
+    El endpoint debe llamar a invalidar_usuario_cache después de hacer commit.
+    """
+    email, usuario_id = _decodificar_token(credentials.credentials)
+    return await _cargar_usuario(db, email, usuario_id)
+
+
+async def get_admin_user(current_user: UsuarioAutenticado = Depends(get_current_user)):
     """
     Verifica que el usuario actual sea administrador
     """
     user_rol = getattr(current_user, 'rol_id', None)
-    logger.info(f"🔐 Verificando permisos de admin - Usuario: {current_user.email}, Rol: {user_rol}")
-    
+
     if user_rol != 1:  # Rol ID 1 es administrador
-        logger.error(f"❌ Acceso denegado - Usuario {current_user.email} no es administrador (Rol: {user_rol})")
+        logger.warning("Acceso denegado: el usuario no es administrador", extra=campos(id_usuario=current_user.id_usuario, rol_id=user_rol))
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No tienes permisos de administrador"
         )
-    
-    logger.info(f"✅ Acceso de administrador confirmado para: {current_user.email}")
-    return current_user 
\ No newline at end of file
+
+    return current_user
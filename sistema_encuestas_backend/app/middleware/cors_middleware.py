@@ -1,52 +1,87 @@
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi.responses import JSONResponse
-from typing import Callable
+"""
+CORS Error Middleware
+
+Middleware ASGI que asegura que los headers CORS se incluyan incluso cuando hay
+errores de autenticación o autorización. Solo modifica el mensaje
+http.response.start, así que las respuestas en streaming pasan sin tocarse.
+"""
 import logging
+from typing import Iterable, List, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.logs import campos
 
 logger = logging.getLogger(__name__)
 
-class CORSErrorMiddleware(BaseHTTPMiddleware):
+Encabezados = List[Tuple[bytes, bytes]]
+
+ENCABEZADOS_CORS: Encabezados = [
+    (b"access-control-allow-credentials", b"true"),
+    (b"access-control-allow-methods", b"*"),
+    (b"access-control-allow-headers", b"*"),
+]
+ENCABEZADO_MAX_AGE = (b"access-control-max-age", b"3600")
+
+
+def reemplazar_encabezados(existentes: Iterable[Tuple[bytes, bytes]], nuevos: Encabezados) -> Encabezados:
+    """Devuelve los encabezados existentes con `nuevos` en lugar de los de igual nombre"""
+    nombres = {nombre for nombre, _ in nuevos}
+    return [h for h in existentes if h[0].lower() not in nombres] + nuevos
+
+
+class CORSErrorMiddleware:
     """
     Middleware que asegura que los headers CORS se incluyan
     incluso cuando hay errores de autenticación o autorización
     """
-    
-    def __init__(self, app, allowed_origins: list):
-        super().__init__(app)
-        self.allowed_origins = allowed_origins
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        origin = request.headers.get("origin")
-        
-        # Log de la petición
-        logger.info(f"🌐 CORS - Petición desde origen: {origin} a {request.method} {request.url.path}")
-        
-        # Procesar la petición
+
+    def __init__(self, app: ASGIApp, allowed_origins: list):
+        self.app = app
+        self.allowed_origins = frozenset(origen.encode("latin-1") for origen in allowed_origins)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        for nombre, valor in scope["headers"]:
+            if nombre == b"origin":
+                origin = valor
+                break
+
+        encabezados: Encabezados = []
+        if origin in self.allowed_origins:
+            encabezados = [(b"access-control-allow-origin", origin)] + ENCABEZADOS_CORS
+        elif origin is not None:
+            logger.debug("Origen no permitido: %r", origin)
+
+        # Manejar preflight requests
+        if scope["method"] == "OPTIONS":
+            encabezados.append(ENCABEZADO_MAX_AGE)
+
+        respuesta_iniciada = False
+
+        async def send_con_cors(message: Message) -> None:
+            nonlocal respuesta_iniciada
+            if message["type"] == "http.response.start":
+                respuesta_iniciada = True
+                if encabezados:
+                    message["headers"] = reemplazar_encabezados(message.get("headers", []), encabezados)
+            await send(message)
+
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_con_cors)
         except Exception as e:
-            logger.error(f"❌ Error en petición: {str(e)}")
+            # Si la respuesta ya empezó no se puede reemplazar por un 500
+            if respuesta_iniciada:
+                raise
+            logger.error("❌ Error en petición", extra=campos(error=str(e)))
             # Crear respuesta de error con CORS headers
             response = JSONResponse(
                 status_code=500,
                 content={"detail": "Error interno del servidor"}
             )
-        
-        # Siempre agregar headers CORS si el origen está permitido
-        if origin and origin in self.allowed_origins:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-            response.headers["Access-Control-Allow-Methods"] = "*"
-            response.headers["Access-Control-Allow-Headers"] = "*"
-            
-            logger.info(f"✅ Headers CORS agregados para origen: {origin}")
-        elif origin:
-            logger.warning(f"⚠️ Origen no permitido: {origin}")
-        
-        # Manejar preflight requests
-        if request.method == "OPTIONS":
-            logger.info("🔄 Petición OPTIONS (preflight) manejada")
-            response.headers["Access-Control-Max-Age"] = "3600"
-        
-        return response 
\ No newline at end of file
+            await response(scope, receive, send_con_cors)
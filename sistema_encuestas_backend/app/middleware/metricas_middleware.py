@@ -0,0 +1,225 @@
+"""
+Métricas Prometheus por ruta
+
+MetricasMiddleware registra, por plantilla de ruta de FastAPI (por ejemplo
+/api/admin/respuestas-detalladas/{id_encuesta}), un histograma de latencia,
+las peticiones en curso y el conteo por código de estado. Con
+registrar_eventos_db(engine) cada sentencia SQL se suma a la petición que la
+originó: cantidad de consultas y tiempo en la base.
+
+Con varios workers de uvicorn, PROMETHEUS_MULTIPROC_DIR debe apuntar a un
+directorio vacío antes de arrancar; cada worker escribe ahí sus valores y
+GET /metrics los agrega (ver docker-entrypoint.sh).
+
+Con PRESUPUESTO_CONSULTAS_HEADER=true, una petición con el encabezado
+X-Query-Budget registra sus sentencias agrupadas por huella y recibe
+X-Query-Count y X-Query-Budget en la respuesta (ver app/utils/presupuesto_consultas.py).
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+from starlette.responses import Response
+from starlette.routing import Match, Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.utils.logs import campos
+from app.utils.presupuesto_consultas import PresupuestoExcedido, ReporteConsultas, presupuesto_de_ruta
+
+logger = logging.getLogger(__name__)
+
+# Ruta usada cuando ninguna coincide (404), para no crear una serie por URL
+RUTA_DESCONOCIDA = "sin_ruta"
+
+LATENCIA = Histogram(
+    "http_request_duration_seconds", "Duración de las peticiones HTTP", ["method", "ruta"],
+)
+EN_CURSO = Gauge(
+    "http_requests_in_progress", "Peticiones HTTP en curso", ["method", "ruta"],
+    multiprocess_mode="livesum",
+)
+PETICIONES = Counter(
+    "http_requests_total", "Peticiones HTTP atendidas", ["method", "ruta", "status"],
+)
+CONSULTAS_DB = Histogram(
+    "http_request_db_queries", "Sentencias SQL ejecutadas por petición", ["ruta"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+TIEMPO_DB = Histogram(
+    "http_request_db_seconds", "Tiempo en la base de datos por petición", ["ruta"],
+)
+
+
+class MedicionPeticion:
+    """Consultas y tiempo de base acumulados por la petición en curso"""
+    __slots__ = ("consultas", "segundos_db", "sentencias")
+
+    def __init__(self, guardar_sentencias: bool = False):
+        self.consultas = 0
+        self.segundos_db = 0.0
+        # Solo se guarda el texto de cada sentencia cuando se pide (X-Query-Budget o contar_consultas)
+        self.sentencias: Optional[List[str]] = [] if guardar_sentencias else None
+
+
+_medicion_actual: ContextVar[Optional[MedicionPeticion]] = ContextVar("medicion_peticion", default=None)
+
+
+@contextmanager
+def contar_consultas(maximo: Optional[int] = None) -> Iterator[MedicionPeticion]:
+    """
+    Cuenta las sentencias ejecutadas dentro del bloque (en la tarea actual).
+    Si se indica `maximo` y se supera, lanza PresupuestoExcedido con el detalle
+    por huella:
+
+        with contar_consultas(maximo=3) as medicion:
+            await servicio.obtener(db, id_encuesta)
+    """
+    medicion = MedicionPeticion(guardar_sentencias=True)
+    token = _medicion_actual.set(medicion)
+    try:
+        yield medicion
+    finally:
+        _medicion_actual.reset(token)
+    if maximo is not None and medicion.consultas > maximo:
+        raise PresupuestoExcedido(ReporteConsultas(medicion.sentencias).texto(maximo))
+
+
+def buscar_ruta(router: Router, scope: Scope):
+    """Ruta que atenderá la petición, o None si ninguna coincide"""
+    parcial = None
+    # Igual que el Router: gana la primera coincidencia completa; si solo hay
+    # coincidencias de path (otro método), se usa la primera para el 405
+    for ruta in router.routes:
+        coincidencia, _ = ruta.matches(scope)
+        if coincidencia == Match.FULL:
+            return ruta
+        if coincidencia == Match.PARTIAL and parcial is None:
+            parcial = ruta
+    return parcial
+
+
+def _presupuesto_pedido(scope: Scope) -> Optional[str]:
+    """Valor del encabezado X-Query-Budget, si la depuración por encabezado está activa"""
+    if not settings.presupuesto_consultas_header:
+        return None
+    for nombre, valor in scope["headers"]:
+        if nombre == b"x-query-budget":
+            return valor.decode("latin-1").strip()
+    return None
+
+
+def _registrar_reporte(metodo: str, ruta: str, reporte: ReporteConsultas, maximo: Optional[int]) -> None:
+    excedido = maximo is not None and reporte.total > maximo
+    nivel = logging.WARNING if excedido else logging.INFO
+    logger.log(
+        nivel, "Consultas de la petición",
+        extra=campos(
+            method=metodo, ruta=ruta, consultas=reporte.total, presupuesto=maximo,
+            huellas=len(reporte.huellas), repetidas=sum(reporte.repetidas().values()),
+        )
+    )
+    for huella, veces in reporte.huellas.most_common():
+        logger.log(nivel, "Sentencia de la petición", extra=campos(ruta=ruta, veces=veces, huella=huella))
+
+
+class MetricasMiddleware:
+    """Middleware ASGI que mide cada petición HTTP por plantilla de ruta"""
+
+    def __init__(self, app: ASGIApp, router: Router, excluir: tuple = ("/metrics",)):
+        self.app = app
+        self.router = router
+        self.excluir = frozenset(excluir)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.excluir:
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        objeto_ruta = buscar_ruta(self.router, scope)
+        ruta = getattr(objeto_ruta, "path", RUTA_DESCONOCIDA)
+        status = 500
+
+        pedido = _presupuesto_pedido(scope)
+        maximo = None
+        if pedido is not None:
+            # "X-Query-Budget: 5" fija el presupuesto de esta petición; cualquier otro valor usa el declarado
+            maximo = int(pedido) if pedido.isdigit() else presupuesto_de_ruta(objeto_ruta)
+
+        async def send_con_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if pedido is not None:
+                    # Sentencias hasta el inicio de la respuesta (un streaming puede seguir consultando)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-query-count", str(medicion.consultas).encode()),
+                        (b"x-query-budget", str(maximo).encode() if maximo is not None else b"none"),
+                    ]
+            await send(message)
+
+        medicion = MedicionPeticion(guardar_sentencias=pedido is not None)
+        token = _medicion_actual.set(medicion)
+        en_curso = EN_CURSO.labels(metodo, ruta)
+        en_curso.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_con_status)
+        finally:
+            LATENCIA.labels(metodo, ruta).observe(time.perf_counter() - inicio)
+            en_curso.dec()
+            PETICIONES.labels(metodo, ruta, str(status)).inc()
+            CONSULTAS_DB.labels(ruta).observe(medicion.consultas)
+            TIEMPO_DB.labels(ruta).observe(medicion.segundos_db)
+            _medicion_actual.reset(token)
+            if pedido is not None:
+                _registrar_reporte(metodo, ruta, ReporteConsultas(medicion.sentencias), maximo)
+
+
+def registrar_eventos_db(engine) -> None:
+    """Suma cada sentencia ejecutada por `engine` a la petición en curso"""
+    motor = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(motor, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(motor, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info["metricas_inicio"].pop()
+        medicion = _medicion_actual.get()
+        if medicion is not None:
+            medicion.consultas += 1
+            medicion.segundos_db += time.perf_counter() - inicio
+            if medicion.sentencias is not None:
+                medicion.sentencias.append(statement)
+
+    @event.listens_for(motor, "handle_error")
+    def _error(contexto_excepcion):
+        conexion = contexto_excepcion.connection
+        if conexion is not None and conexion.info.get("metricas_inicio"):
+            conexion.info["metricas_inicio"].pop()
+
+
+def respuesta_metricas() -> Response:
+    """Métricas en formato de texto de Prometheus (agregadas entre workers si aplica)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return Response(generate_latest(registro), media_type=CONTENT_TYPE_LATEST)
+
+
+def marcar_worker_terminado() -> None:
+    """Descarta las peticiones en curso de este worker al apagarse (modo multiproceso)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
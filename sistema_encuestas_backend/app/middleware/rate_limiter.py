@@ -1,98 +1,293 @@
 """
 Rate Limiter Middleware
+
+Limita peticiones con GCRA (Generic Cell Rate Algorithm): por cada clave se
+guarda un único valor, el "tiempo teórico de llegada" (TAT), así que la memoria
+por clave es constante sin importar el volumen de peticiones.
+
+El estado vive en un backend intercambiable:
+- BackendMemoria: dentro del proceso (cada worker limita por separado); con un
+  reloj inyectable sirve también como backend falso para pruebas.
+- BackendRedis: compartido entre workers y servidores; el cálculo se hace en un
+  script Lua atómico usando la hora del servidor Redis.
 """
+import ipaddress
+import logging
+import math
 import time
-from collections import defaultdict, deque
-from fastapi import HTTPException, Request
-from typing import Dict, Deque
-import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.middleware.auth_middleware import get_current_user
+from app.utils.logs import campos
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ReglaLimite:
+    """`limite` peticiones cada `periodo_segundos`, con ráfagas de hasta `rafaga` (por defecto = limite)"""
+    nombre: str
+    limite: int
+    periodo_segundos: float = 60.0
+    rafaga: Optional[int] = None
+    mensaje: str = "Demasiadas requests. Espera un momento antes de continuar."
+
+    @property
+    def intervalo(self) -> float:
+        """Segundos entre peticiones a ritmo sostenido"""
+        return self.periodo_segundos / self.limite
+
+    @property
+    def tolerancia(self) -> float:
+        """Adelanto máximo permitido respecto del ritmo sostenido"""
+        return self.intervalo * (self.rafaga or self.limite)
+
+
+@dataclass(frozen=True)
+class ResultadoLimite:
+    permitido: bool
+    restantes: int
+    reintentar_en: float  # segundos; 0 si la petición fue permitida
+
+
+def _gcra(tat: float, ahora: float, intervalo: float, tolerancia: float) -> Tuple[bool, float, int, float]:
+    """Devuelve (permitido, nuevo_tat, restantes, reintentar_en)"""
+    tat = max(tat, ahora)
+    nuevo_tat = tat + intervalo
+    permitido_desde = nuevo_tat - tolerancia
+    if ahora < permitido_desde:
+        return False, tat, 0, permitido_desde - ahora
+    restantes = int((tolerancia - (nuevo_tat - ahora)) // intervalo)
+    return True, nuevo_tat, max(0, restantes), 0.0
+
+
+class BackendMemoria:
+    """Estado GCRA en un diccionario del proceso, acotado a `max_claves`"""
+
+    def __init__(self, max_claves: int = 100_000, reloj: Callable[[], float] = time.monotonic):
+        self.max_claves = max_claves
+        self.reloj = reloj
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+
+    async def consumir(self, clave: str, intervalo: float, tolerancia: float) -> ResultadoLimite:
+        ahora = self.reloj()
+        permitido, nuevo_tat, restantes, reintentar_en = _gcra(
+            self._tats.get(clave, ahora), ahora, intervalo, tolerancia
+        )
+        if permitido:
+            self._tats[clave] = nuevo_tat
+            self._tats.move_to_end(clave)
+            self._purgar(ahora)
+        return ResultadoLimite(permitido, restantes, reintentar_en)
+
+    def _purgar(self, ahora: float) -> None:
+        # Las claves se ordenan por última actualización: las primeras son las que vencen antes
+        while self._tats:
+            clave, tat = next(iter(self._tats.items()))
+            if tat > ahora and len(self._tats) <= self.max_claves:
+                break
+            del self._tats[clave]
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+# KEYS[1] = clave, ARGV[1] = intervalo (µs), ARGV[2] = tolerancia (µs)
+# Devuelve {permitido (0/1), restantes, reintentar_en (µs)}
+SCRIPT_GCRA = """
+local intervalo = tonumber(ARGV[1])
+local tolerancia = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or ahora
+if tat < ahora then tat = ahora end
+local nuevo_tat = tat + intervalo
+local permitido_desde = nuevo_tat - tolerancia
+if ahora < permitido_desde then
+    return {0, 0, permitido_desde - ahora}
+end
+redis.call('SET', KEYS[1], nuevo_tat, 'PX', math.ceil((nuevo_tat - ahora) / 1000))
+return {1, math.floor((tolerancia - (nuevo_tat - ahora)) / intervalo), 0}
+"""
+
+
+class BackendRedis:
+    """Estado GCRA en Redis, compartido por todos los workers y servidores"""
+
+    def __init__(self, cliente, prefijo: str = "rate_limit:"):
+        self.cliente = cliente
+        self.prefijo = prefijo
+        self._script = cliente.register_script(SCRIPT_GCRA)
+
+    async def consumir(self, clave: str, intervalo: float, tolerancia: float) -> ResultadoLimite:
+        permitido, restantes, reintentar_en = await self._script(
+            keys=[self.prefijo + clave],
+            args=[int(intervalo * 1_000_000), int(tolerancia * 1_000_000)],
+        )
+        return ResultadoLimite(bool(permitido), max(0, int(restantes)), int(reintentar_en) / 1_000_000)
+
 
 class RateLimiter:
-    def __init__(self):
-        # Almacena las requests por IP: {ip: deque_of_timestamps}
-        self.requests: Dict[str, Deque[float]] = defaultdict(lambda: deque())
-        # Configuración: máximo 60 requests por minuto por IP
-        self.max_requests = 60
-        self.window_seconds = 60
-        # Configuración especial para login: máximo 5 intentos por minuto
-        self.login_max_requests = 5
-        self.login_window_seconds = 60
-        self.login_requests: Dict[str, Deque[float]] = defaultdict(lambda: deque())
-
-    def is_allowed(self, ip: str, endpoint: str = None) -> bool:
-        """Verifica si la IP puede hacer otra request"""
-        current_time = time.time()
-        
-        # Configuración específica para login
-        if endpoint and "login" in endpoint:
-            requests_deque = self.login_requests[ip]
-            max_req = self.login_max_requests
-            window = self.login_window_seconds
-        else:
-            requests_deque = self.requests[ip]
-            max_req = self.max_requests
-            window = self.window_seconds
-        
-        # Remover requests antiguas
-        while requests_deque and current_time - requests_deque[0] > window:
-            requests_deque.popleft()
-        
-        # Verificar si se puede hacer otra request
-        if len(requests_deque) >= max_req:
-            return False
-        
-        # Agregar la request actual
-        requests_deque.append(current_time)
-        return True
-
-    def cleanup_old_entries(self):
-        """Limpia entradas antiguas periódicamente"""
-        current_time = time.time()
-        
-        # Cleanup requests normales
-        for ip in list(self.requests.keys()):
-            deque_obj = self.requests[ip]
-            while deque_obj and current_time - deque_obj[0] > self.window_seconds:
-                deque_obj.popleft()
-            if not deque_obj:
-                del self.requests[ip]
-        
-        # Cleanup requests de login
-        for ip in list(self.login_requests.keys()):
-            deque_obj = self.login_requests[ip]
-            while deque_obj and current_time - deque_obj[0] > self.login_window_seconds:
-                deque_obj.popleft()
-            if not deque_obj:
-                del self.login_requests[ip]
+    """Aplica reglas de límite sobre un backend; si el backend falla, deja pasar la petición"""
 
-# Instancia global del rate limiter
-rate_limiter = RateLimiter()
-
-async def rate_limit_middleware(request: Request, call_next):
-    """Middleware para aplicar rate limiting"""
-    # Obtener IP del cliente
-    client_ip = request.client.host if request.client else "unknown"
-    
-    # Verificar rate limiting
-    endpoint = str(request.url.path)
-    if not rate_limiter.is_allowed(client_ip, endpoint):
-        if "login" in endpoint:
-            raise HTTPException(
-                status_code=429,
-                detail="Demasiados intentos de login. Espera 1 minuto antes de intentar nuevamente."
+    def __init__(self, backend):
+        self.backend = backend
+        self.rechazos: Dict[str, int] = {}
+        self.errores_backend = 0
+
+    async def verificar(self, clave: str, regla: ReglaLimite) -> ResultadoLimite:
+        try:
+            resultado = await self.backend.consumir(f"{regla.nombre}:{clave}", regla.intervalo, regla.tolerancia)
+        except Exception as e:
+            # Un Redis caído no debe dejar la API sin servicio
+            self.errores_backend += 1
+            logger.warning(
+                "⚠️ Rate limiter sin backend; se permite la petición",
+                extra=campos(error=type(e).__name__, detalle=str(e))
             )
-        else:
-            raise HTTPException(
+            return ResultadoLimite(True, 0, 0.0)
+
+        if not resultado.permitido:
+            self.rechazos[regla.nombre] = self.rechazos.get(regla.nombre, 0) + 1
+        return resultado
+
+    def obtener_metricas(self) -> Dict[str, object]:
+        return {
+            "backend": type(self.backend).__name__,
+            "rechazos": dict(self.rechazos),
+            "errores_backend": self.errores_backend,
+        }
+
+
+def crear_backend():
+    """Backend según settings.rate_limit_backend ("memoria" o "redis")"""
+    if settings.rate_limit_backend == "redis":
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            logger.warning("⚠️ RATE_LIMIT_BACKEND=redis pero el paquete redis no está instalado; se usa memoria")
+            return BackendMemoria()
+        return BackendRedis(redis_asyncio.from_url(settings.redis_url))
+    return BackendMemoria()
+
+
+# Instancia global del rate limiter
+rate_limiter = RateLimiter(crear_backend())
+
+# Reglas por IP (middleware)
+REGLA_LOGIN = ReglaLimite(
+    "login", settings.rate_limit_login_por_minuto,
+    mensaje="Demasiados intentos de login. Espera 1 minuto antes de intentar nuevamente."
+)
+REGLA_GENERAL = ReglaLimite("general", settings.rate_limit_general_por_minuto)
+# Rutas exactas a las que se aplica REGLA_LOGIN
+RUTAS_LOGIN = frozenset({"/api/auth/login", "/api/auth/login/"})
+
+# Reglas por usuario (dependencias de endpoints)
+REGLA_RESPUESTAS = ReglaLimite(
+    "respuestas", settings.rate_limit_respuestas_por_minuto,
+    mensaje="Estás enviando respuestas demasiado rápido. Espera un momento."
+)
+REGLA_CANJES = ReglaLimite(
+    "canjes", settings.rate_limit_canjes_por_minuto,
+    mensaje="Demasiadas solicitudes de canje. Espera un momento."
+)
+
+
+def _segundos_reintento(resultado: ResultadoLimite) -> str:
+    return str(max(1, math.ceil(resultado.reintentar_en)))
+
+
+PROXIES_CONFIABLES = tuple(
+    ipaddress.ip_network(red.strip(), strict=False)
+    for red in settings.rate_limit_proxies_confiables.split(",")
+    if red.strip()
+)
+
+
+@lru_cache(maxsize=1024)
+def _es_proxy_confiable(ip: str) -> bool:
+    try:
+        direccion = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(direccion in red for red in PROXIES_CONFIABLES)
+
+
+def _ip_cliente(scope: Scope) -> str:
+    """
+    IP de la conexión o, si viene de un proxy confiable, la que informa el proxy:
+    X-Real-IP o, en X-Forwarded-For, la última IP que no es de un proxy confiable
+    (las primeras las escribe el cliente y se pueden falsear).
+    """
+    cliente = scope.get("client")
+    ip = cliente[0] if cliente else "unknown"
+    if not settings.rate_limit_ip_desde_proxy or not _es_proxy_confiable(ip):
+        return ip
+    headers = dict(scope.get("headers") or [])
+    real_ip = headers.get(b"x-real-ip", b"").strip()
+    if real_ip:
+        return real_ip.decode("latin-1")
+    for candidata in reversed(headers.get(b"x-forwarded-for", b"").decode("latin-1").split(",")):
+        candidata = candidata.strip()
+        if candidata and not _es_proxy_confiable(candidata):
+            return candidata
+    return ip
+
+
+class RateLimitMiddleware:
+    """Middleware ASGI que limita por IP: reglas de login y general"""
+
+    def __init__(self, app: ASGIApp, limitador: Optional[RateLimiter] = None):
+        self.app = app
+        self.limitador = limitador or rate_limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not settings.rate_limit_activo:
+            await self.app(scope, receive, send)
+            return
+
+        regla = REGLA_LOGIN if scope["path"] in RUTAS_LOGIN else REGLA_GENERAL
+        resultado = await self.limitador.verificar(_ip_cliente(scope), regla)
+        if not resultado.permitido:
+            respuesta = JSONResponse(
+                {"detail": regla.mensaje},
                 status_code=429,
-                detail="Demasiadas requests. Espera un momento antes de continuar."
+                headers={"Retry-After": _segundos_reintento(resultado)},
             )
-    
-    response = await call_next(request)
-    return response
-
-# Tarea en background para limpiar entradas antiguas
-async def cleanup_rate_limiter():
-    """Limpia el rate limiter cada 5 minutos"""
-    while True:
-        await asyncio.sleep(300)  # 5 minutos
-        rate_limiter.cleanup_old_entries() 
\ No newline at end of file
+            await respuesta(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+
+def limite_por_usuario(regla: ReglaLimite, dependencia_usuario: Callable = get_current_user):
+    """
+    Dependencia que aplica `regla` por usuario autenticado (clave usuario_id) y
+    devuelve lo mismo que `dependencia_usuario`, para usarla en su lugar.
+    Acepta tanto UsuarioAutenticado como el payload del token (dict con usuario_id).
+    """
+    async def verificar_limite(current_user=Depends(dependencia_usuario)):
+        if settings.rate_limit_activo:
+            if isinstance(current_user, dict):
+                id_usuario = current_user.get("usuario_id")
+            else:
+                id_usuario = current_user.id_usuario
+            resultado = await rate_limiter.verificar(f"usuario:{id_usuario}", regla)
+            if not resultado.permitido:
+                raise HTTPException(
+                    status_code=429,
+                    detail=regla.mensaje,
+                    headers={"Retry-After": _segundos_reintento(resultado)},
+                )
+        return current_user
+
+    return verificar_limite
@@ -1,35 +1,62 @@
 """
 Security Headers Middleware
 """
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Middleware para agregar headers de seguridad"""
-    
-    async def dispatch(self, request: Request, call_next):
-        response: Response = await call_next(request)
-        
-        # Headers de seguridad
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        
-        # Content Security Policy básico
-        csp = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline'; "
-            "style-src 'self' 'unsafe-inline'; "
-            "img-src 'self' data: https:; "
-            "font-src 'self'; "
-            "connect-src 'self'"
-        )
-        response.headers["Content-Security-Policy"] = csp
-        
-        # HSTS (HTTP Strict Transport Security)
-        if request.url.scheme == "https":
-            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        
-        return response 
\ No newline at end of file
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware.cors_middleware import Encabezados, reemplazar_encabezados
+
+# Content Security Policy básico
+CSP = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline'; "
+    "style-src 'self' 'unsafe-inline'; "
+    "img-src 'self' data: https:; "
+    "font-src 'self'; "
+    "connect-src 'self'"
+)
+
+# Documentación de FastAPI: Swagger UI y ReDoc cargan scripts y estilos desde
+# cdn.jsdelivr.net, que la CSP bloquearía; en estas rutas no se envía la CSP
+RUTAS_DOCUMENTACION = frozenset({"/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"})
+
+# Headers de seguridad, ya codificados para ASGI
+ENCABEZADOS_SEGURIDAD_SIN_CSP: Encabezados = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+]
+ENCABEZADOS_SEGURIDAD: Encabezados = ENCABEZADOS_SEGURIDAD_SIN_CSP + [
+    (b"content-security-policy", CSP.encode("latin-1")),
+]
+
+# HSTS (HTTP Strict Transport Security), solo sobre https
+HSTS: Encabezados = [(b"strict-transport-security", b"max-age=31536000; includeSubDomains")]
+ENCABEZADOS_SEGURIDAD_HTTPS: Encabezados = ENCABEZADOS_SEGURIDAD + HSTS
+ENCABEZADOS_DOCUMENTACION_HTTPS: Encabezados = ENCABEZADOS_SEGURIDAD_SIN_CSP + HSTS
+
+
+class SecurityHeadersMiddleware:
+    """Middleware ASGI para agregar headers de seguridad"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        https = scope.get("scheme") == "https"
+        if scope["path"] in RUTAS_DOCUMENTACION:
+            encabezados = ENCABEZADOS_DOCUMENTACION_HTTPS if https else ENCABEZADOS_SEGURIDAD_SIN_CSP
+        else:
+            encabezados = ENCABEZADOS_SEGURIDAD_HTTPS if https else ENCABEZADOS_SEGURIDAD
+
+        async def send_con_encabezados(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = reemplazar_encabezados(message.get("headers", []), encabezados)
+            await send(message)
+
+        await self.app(scope, receive, send_con_encabezados)
@@ -0,0 +1,62 @@
+-- Migración: Contador de canjes por premio e índices del catálogo
+-- Fecha: 2026-10-18
+-- Descripción: premios.total_canjes cuenta los canjes del premio que no fueron
+-- rechazados ni cancelados. Lo mantiene un trigger sobre canjes, así el catálogo
+-- lo lee de la misma fila del premio sin agrupar la tabla canjes en cada
+-- consulta. El canje ya actualiza la fila del premio (stock), por lo que el
+-- trigger no agrega bloqueos nuevos.
+
+-- Paso 1: Columna del contador
+ALTER TABLE public.premios
+ADD COLUMN IF NOT EXISTS total_canjes INTEGER NOT NULL DEFAULT 0;
+
+-- Paso 2: Mantenerlo al crear, modificar o eliminar canjes
+CREATE OR REPLACE FUNCTION public.canjes_actualizar_total_premio() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE')
+       AND OLD.estado NOT IN ('RECHAZADO', 'CANCELADO') THEN
+        UPDATE public.premios SET total_canjes = total_canjes - 1
+        WHERE id_premio = OLD.id_premio;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE')
+       AND NEW.estado NOT IN ('RECHAZADO', 'CANCELADO') THEN
+        UPDATE public.premios SET total_canjes = total_canjes + 1
+        WHERE id_premio = NEW.id_premio;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_canjes_total_premio ON public.canjes;
+CREATE TRIGGER trg_canjes_total_premio
+AFTER INSERT OR DELETE OR UPDATE OF estado, id_premio ON public.canjes
+FOR EACH ROW EXECUTE FUNCTION public.canjes_actualizar_total_premio();
+
+-- Paso 3: Canjes de un premio (valor inicial del contador y borrado en cascada del premio)
+CREATE INDEX IF NOT EXISTS ix_canjes_id_premio
+ON public.canjes(id_premio);
+
+-- Paso 4: Valor inicial a partir de los canjes existentes (recalcula si se vuelve a ejecutar)
+UPDATE public.premios p
+SET total_canjes = (
+    SELECT COUNT(*)
+    FROM public.canjes c
+    WHERE c.id_premio = p.id_premio
+      AND c.estado NOT IN ('RECHAZADO', 'CANCELADO')
+);
+
+-- Paso 5: Índices del catálogo público (solo premios activos) para cada filtro y orden.
+-- premios es una tabla chica: se crean sin CONCURRENTLY dentro de la transacción
+CREATE INDEX IF NOT EXISTS ix_premios_activos_costo
+ON public.premios(costo_puntos, id_premio) WHERE activo;
+
+CREATE INDEX IF NOT EXISTS ix_premios_activos_categoria_costo
+ON public.premios(categoria, costo_puntos) WHERE activo;
+
+CREATE INDEX IF NOT EXISTS ix_premios_activos_tipo_costo
+ON public.premios(tipo, costo_puntos) WHERE activo;
+
+CREATE INDEX IF NOT EXISTS ix_premios_activos_populares
+ON public.premios(total_canjes DESC, id_premio) WHERE activo;
+
+ANALYZE public.premios;
@@ -0,0 +1,28 @@
+-- Migración: Bandeja de salida de correos
+-- Fecha: 2026-10-18
+-- Descripción: los endpoints de autenticación ya no envían correos por SMTP
+-- dentro de la petición; insertan el correo en email_outbox en la misma
+-- transacción y un proceso en segundo plano de cada worker lo envía por un
+-- pool de conexiones SMTP, con reintentos y espera exponencial.
+
+-- Paso 1: Tabla de la bandeja de salida
+CREATE TABLE IF NOT EXISTS public.email_outbox (
+    id_email BIGSERIAL PRIMARY KEY,
+    destinatario VARCHAR(255) NOT NULL,
+    asunto VARCHAR(255) NOT NULL,
+    html TEXT NOT NULL,
+    texto TEXT,
+    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente' CHECK (estado IN ('pendiente', 'enviado', 'fallido')),
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento TIMESTAMP NOT NULL DEFAULT now(),
+    ultimo_error TEXT,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT now(),
+    fecha_envio TIMESTAMP
+);
+
+COMMENT ON TABLE public.email_outbox IS 'Correos pendientes de envío; los envía email_outbox_service en segundo plano';
+
+-- Paso 2: Los pendientes vencidos se reclaman por este índice parcial, que
+-- no crece con los correos ya enviados
+CREATE INDEX IF NOT EXISTS ix_email_outbox_pendientes
+ON public.email_outbox(proximo_intento, id_email) WHERE estado = 'pendiente';
@@ -0,0 +1,57 @@
+-- Migración: Índices para las consultas frecuentes de los routers
+-- Fecha: 2026-10-18
+-- Descripción: Índices sobre las columnas por las que filtran y ordenan los routers,
+-- que hasta ahora solo tenían índice en las claves primarias.
+-- Se crean con CONCURRENTLY para no bloquear escrituras en una base en uso, por lo
+-- que este archivo se ejecuta fuera de una transacción (autocommit en
+-- ejecutar_todas_migraciones.py). participaciones(id_usuario, id_encuesta) ya está
+-- cubierto por uq_participaciones_usuario_encuesta (add_unique_participacion.sql).
+-- idx_respuestas_participacion e idx_token_usuario_tipo conservan el nombre que ya
+-- usaban add_participacion_to_respuestas.sql y add_verification_fields.sql, para no
+-- duplicarlos en las bases donde esas migraciones ya se ejecutaron.
+--
+-- Si una creación CONCURRENTLY se interrumpe, el índice queda marcado como inválido
+-- y IF NOT EXISTS no lo reconstruye. Para encontrarlos y eliminarlos antes de reintentar:
+-- SELECT indexrelid::regclass FROM pg_index WHERE NOT indisvalid;
+-- DROP INDEX CONCURRENTLY <nombre>;
+-- verificar_indices.py comprueba con EXPLAIN que los routers los usan.
+
+-- Exportación de respuestas y recálculo de stats_diarias (join por participación)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_respuestas_participacion
+ON public.respuestas(id_participacion);
+
+-- Estadísticas por encuesta (conteos por pregunta y opción)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_respuestas_pregunta_opcion
+ON public.respuestas(id_pregunta, id_opcion);
+
+-- Historial del usuario y verificación de claves foráneas al borrar usuarios
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_respuestas_id_usuario
+ON public.respuestas(id_usuario);
+
+-- Participaciones de una encuesta, de la más reciente a la más antigua (exportación)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_participaciones_encuesta_fecha
+ON public.participaciones(id_encuesta, fecha_participacion);
+
+-- Preguntas de una encuesta en orden
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_preguntas_encuesta_orden
+ON public.preguntas(id_encuesta, orden);
+
+-- Opciones de una pregunta
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_opciones_id_pregunta
+ON public.opciones(id_pregunta);
+
+-- Canjes de un usuario ordenados por fecha
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_canjes_usuario_fecha
+ON public.canjes(id_usuario, fecha_solicitud);
+
+-- Tokens vigentes de un usuario por tipo (verificación de email, recuperación)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_token_usuario_tipo
+ON public.tokens_verificacion(id_usuario, tipo);
+
+-- Estadísticas actualizadas para que el planificador considere los índices nuevos
+ANALYZE public.respuestas;
+ANALYZE public.participaciones;
+ANALYZE public.preguntas;
+ANALYZE public.opciones;
+ANALYZE public.canjes;
+ANALYZE public.tokens_verificacion;
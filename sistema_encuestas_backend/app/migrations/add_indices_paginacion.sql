@@ -0,0 +1,34 @@
+-- Migración: Índices para la paginación por cursor de los listados
+-- Fecha: 2026-10-18
+-- Descripción: los listados se paginan con WHERE (fecha, id) < (cursor)
+-- ORDER BY fecha DESC, id DESC LIMIT n (app/utils/paginacion.py). Con la clave
+-- primaria al final del índice, PostgreSQL arranca la lectura en el cursor y se
+-- detiene a las n filas, así que cualquier página cuesta lo mismo que la primera.
+-- Los índices de participaciones por encuesta y de canjes por usuario reemplazan
+-- a los de add_indices_consultas.sql, que no tenían la clave primaria.
+-- Como add_indices_consultas.sql, se ejecuta fuera de una transacción
+-- (autocommit en ejecutar_todas_migraciones.py) por los CONCURRENTLY.
+
+-- Participaciones de un usuario (historial, participaciones detalladas)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_participaciones_usuario_fecha
+ON public.participaciones(id_usuario, fecha_participacion, id_participacion);
+
+-- Participaciones de una encuesta (respuestas detalladas y exportación)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_participaciones_encuesta_fecha_id
+ON public.participaciones(id_encuesta, fecha_participacion, id_participacion);
+
+DROP INDEX CONCURRENTLY IF EXISTS public.ix_participaciones_encuesta_fecha;
+
+-- Canjes de un usuario
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_canjes_usuario_fecha_id
+ON public.canjes(id_usuario, fecha_solicitud, id_canje);
+
+DROP INDEX CONCURRENTLY IF EXISTS public.ix_canjes_usuario_fecha;
+
+-- Listado de encuestas del administrador
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_encuestas_fecha_creacion
+ON public.encuestas(fecha_creacion, id_encuesta);
+
+ANALYZE public.participaciones;
+ANALYZE public.canjes;
+ANALYZE public.encuestas;
@@ -0,0 +1,75 @@
+-- Migración: Libro de movimientos de puntos
+-- Fecha: 2026-10-18
+-- Descripción: cada acreditación (participación, perfil completo, bono de
+-- registro) y cada débito (canje) queda como una fila de movimientos_puntos,
+-- que solo admite INSERT. Las columnas puntos_* de usuarios pasan a ser un
+-- agregado del libro que se actualiza en la misma sentencia que inserta el
+-- movimiento y que se puede reconstruir con recalcular_saldos_puntos.py.
+
+-- Paso 1: Tabla del libro
+CREATE TABLE IF NOT EXISTS public.movimientos_puntos (
+    id_movimiento BIGSERIAL PRIMARY KEY,
+    id_usuario INTEGER NOT NULL REFERENCES public.usuarios(id_usuario) ON DELETE CASCADE,
+    tipo VARCHAR(20) NOT NULL CHECK (tipo IN ('registro', 'perfil_completo', 'participacion', 'canje', 'ajuste', 'apertura')),
+    puntos INTEGER NOT NULL CHECK (puntos <> 0),
+    id_participacion INTEGER,
+    id_canje INTEGER,
+    fecha TIMESTAMP NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE public.movimientos_puntos IS 'Movimientos de puntos (solo INSERT); usuarios.puntos_* es su agregado';
+
+-- Paso 2: Movimientos de un usuario en orden y unicidad de cada origen
+CREATE INDEX IF NOT EXISTS ix_movimientos_puntos_usuario
+ON public.movimientos_puntos(id_usuario, id_movimiento);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_movimientos_puntos_participacion
+ON public.movimientos_puntos(id_participacion) WHERE id_participacion IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_movimientos_puntos_canje
+ON public.movimientos_puntos(id_canje) WHERE id_canje IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_movimientos_puntos_bonos
+ON public.movimientos_puntos(id_usuario, tipo) WHERE tipo IN ('registro', 'perfil_completo', 'apertura');
+
+-- Paso 3: El libro no se modifica; una corrección es otro movimiento ('ajuste').
+-- Las filas solo se borran junto con su usuario (ON DELETE CASCADE)
+CREATE OR REPLACE FUNCTION public.movimientos_puntos_solo_insercion() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'movimientos_puntos solo admite INSERT; registre un movimiento de ajuste';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_movimientos_puntos_solo_insercion ON public.movimientos_puntos;
+CREATE TRIGGER trg_movimientos_puntos_solo_insercion
+BEFORE UPDATE ON public.movimientos_puntos
+FOR EACH ROW EXECUTE FUNCTION public.movimientos_puntos_solo_insercion();
+
+-- Paso 4: Historial existente (no duplica si se vuelve a ejecutar)
+INSERT INTO public.movimientos_puntos (id_usuario, tipo, puntos, id_participacion, fecha)
+SELECT p.id_usuario, 'participacion', p.puntaje_obtenido, p.id_participacion, COALESCE(p.fecha_participacion, now())
+FROM public.participaciones p
+WHERE COALESCE(p.puntaje_obtenido, 0) <> 0
+ON CONFLICT (id_participacion) WHERE id_participacion IS NOT NULL DO NOTHING;
+
+INSERT INTO public.movimientos_puntos (id_usuario, tipo, puntos, id_canje, fecha)
+SELECT c.id_usuario, 'canje', -c.puntos_utilizados, c.id_canje, COALESCE(c.fecha_solicitud, now())
+FROM public.canjes c
+WHERE COALESCE(c.puntos_utilizados, 0) <> 0
+ON CONFLICT (id_canje) WHERE id_canje IS NOT NULL DO NOTHING;
+
+-- Paso 5: Apertura por usuario con lo que el historial no explica (bonos de
+-- registro y de perfil, cargas manuales), para que el libro sume exactamente
+-- los puntos_disponibles actuales
+INSERT INTO public.movimientos_puntos (id_usuario, tipo, puntos)
+SELECT u.id_usuario, 'apertura', COALESCE(u.puntos_disponibles, 0) - COALESCE(m.suma, 0)
+FROM public.usuarios u
+LEFT JOIN (
+    SELECT id_usuario, SUM(puntos) AS suma
+    FROM public.movimientos_puntos
+    GROUP BY id_usuario
+) m ON m.id_usuario = u.id_usuario
+WHERE COALESCE(u.puntos_disponibles, 0) <> COALESCE(m.suma, 0)
+ON CONFLICT (id_usuario, tipo) WHERE tipo IN ('registro', 'perfil_completo', 'apertura') DO NOTHING;
+
+ANALYZE public.movimientos_puntos;
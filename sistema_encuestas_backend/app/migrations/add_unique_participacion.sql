@@ -0,0 +1,36 @@
+-- Migración: Restricción única de participación por usuario y encuesta
+-- Fecha: 2026-10-18
+-- Descripción: Garantiza una sola participación por (id_usuario, id_encuesta).
+-- La ingesta de respuestas usa INSERT ... ON CONFLICT sobre este índice en lugar de
+-- consultar primero si el usuario ya participó.
+-- Migración estricta: si algún paso falla, ejecutar_todas_migraciones.py la revierte
+-- completa y termina con error (sin el índice, cada envío de respuestas falla).
+
+-- Paso 1: Participaciones duplicadas a eliminar (se conserva la de menor id_participacion)
+CREATE TEMP TABLE participaciones_duplicadas AS
+SELECT id_participacion
+FROM (
+    SELECT id_participacion,
+           ROW_NUMBER() OVER (PARTITION BY id_usuario, id_encuesta ORDER BY id_participacion) AS orden
+    FROM participaciones
+) p
+WHERE orden > 1;
+
+-- Paso 2: Eliminar las respuestas de los duplicados (re-apuntarlas duplicaría las
+-- respuestas de la participación conservada)
+DELETE FROM respuestas
+WHERE id_participacion IN (SELECT id_participacion FROM participaciones_duplicadas);
+
+-- Los movimientos de puntos de los duplicados (si el libro ya existe) no se tocan:
+-- movimientos_puntos solo admite INSERT y id_participacion no tiene clave foránea,
+-- así que el libro sigue cuadrando con los saldos de usuarios
+
+-- Paso 3: Eliminar las participaciones duplicadas
+DELETE FROM participaciones
+WHERE id_participacion IN (SELECT id_participacion FROM participaciones_duplicadas);
+
+DROP TABLE participaciones_duplicadas;
+
+-- Paso 4: Crear el índice único
+CREATE UNIQUE INDEX IF NOT EXISTS uq_participaciones_usuario_encuesta
+ON participaciones(id_usuario, id_encuesta);
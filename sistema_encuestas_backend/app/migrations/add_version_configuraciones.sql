@@ -0,0 +1,44 @@
+-- Migración: Versión de la configuración y aviso de cambios entre workers
+-- Fecha: 2026-10-18
+-- Descripción: cada worker guarda la configuración activa en memoria.
+-- configuraciones.version sale de una secuencia, así que cada fila nueva o
+-- modificada tiene una versión mayor que todas las anteriores. Cualquier
+-- cambio en la tabla (desde la API o por SQL directo) envía
+-- NOTIFY configuracion_actualizada y los workers descartan su copia.
+
+-- Paso 1: Secuencia y columna de versión
+CREATE SEQUENCE IF NOT EXISTS public.configuraciones_version_seq;
+
+ALTER TABLE public.configuraciones
+ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT nextval('public.configuraciones_version_seq');
+
+-- Paso 2: Toda modificación de una fila le asigna una versión nueva
+CREATE OR REPLACE FUNCTION public.configuraciones_incrementar_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := nextval('public.configuraciones_version_seq');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_configuraciones_version ON public.configuraciones;
+CREATE TRIGGER trg_configuraciones_version
+BEFORE UPDATE ON public.configuraciones
+FOR EACH ROW EXECUTE FUNCTION public.configuraciones_incrementar_version();
+
+-- Paso 3: Aviso a los workers (se entrega al confirmar la transacción).
+-- El payload es la versión de la fila; vacío si la fila se eliminó
+CREATE OR REPLACE FUNCTION public.configuraciones_notificar() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('configuracion_actualizada', '');
+    ELSE
+        PERFORM pg_notify('configuracion_actualizada', NEW.version::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_configuraciones_notificar ON public.configuraciones;
+CREATE TRIGGER trg_configuraciones_notificar
+AFTER INSERT OR UPDATE OR DELETE ON public.configuraciones
+FOR EACH ROW EXECUTE FUNCTION public.configuraciones_notificar();
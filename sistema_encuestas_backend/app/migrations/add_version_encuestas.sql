@@ -0,0 +1,65 @@
+-- Migración: Versión de la definición de cada encuesta
+-- Fecha: 2026-10-18
+-- Descripción: encuestas.version aumenta con cada cambio de la encuesta, de sus
+-- preguntas o de sus opciones. GET /api/encuestas/{id} usa (id_encuesta, version)
+-- como clave de la caché de cada worker, así que un cambio en la base de datos
+-- invalida la definición en todos los workers sin coordinarlos.
+
+-- Paso 1: Agregar la columna
+ALTER TABLE public.encuestas
+ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+-- Paso 2: Cambios directos sobre la encuesta (si quien actualiza no movió la versión)
+CREATE OR REPLACE FUNCTION public.encuestas_incrementar_version() RETURNS trigger AS $$
+BEGIN
+    IF NEW.version IS NOT DISTINCT FROM OLD.version THEN
+        NEW.version := OLD.version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_encuestas_version ON public.encuestas;
+CREATE TRIGGER trg_encuestas_version
+BEFORE UPDATE ON public.encuestas
+FOR EACH ROW EXECUTE FUNCTION public.encuestas_incrementar_version();
+
+-- Paso 3: Cambios en las preguntas de la encuesta
+CREATE OR REPLACE FUNCTION public.preguntas_incrementar_version_encuesta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE public.encuestas SET version = version + 1 WHERE id_encuesta = OLD.id_encuesta;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.id_encuesta IS DISTINCT FROM OLD.id_encuesta THEN
+        UPDATE public.encuestas SET version = version + 1 WHERE id_encuesta = NEW.id_encuesta;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_preguntas_version_encuesta ON public.preguntas;
+CREATE TRIGGER trg_preguntas_version_encuesta
+AFTER INSERT OR UPDATE OR DELETE ON public.preguntas
+FOR EACH ROW EXECUTE FUNCTION public.preguntas_incrementar_version_encuesta();
+
+-- Paso 4: Cambios en las opciones de las preguntas
+CREATE OR REPLACE FUNCTION public.opciones_incrementar_version_encuesta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE public.encuestas e SET version = e.version + 1
+        FROM public.preguntas p
+        WHERE p.id_pregunta = OLD.id_pregunta AND e.id_encuesta = p.id_encuesta;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.id_pregunta IS DISTINCT FROM OLD.id_pregunta THEN
+        UPDATE public.encuestas e SET version = e.version + 1
+        FROM public.preguntas p
+        WHERE p.id_pregunta = NEW.id_pregunta AND e.id_encuesta = p.id_encuesta;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_opciones_version_encuesta ON public.opciones;
+CREATE TRIGGER trg_opciones_version_encuesta
+AFTER INSERT OR UPDATE OR DELETE ON public.opciones
+FOR EACH ROW EXECUTE FUNCTION public.opciones_incrementar_version_encuesta();
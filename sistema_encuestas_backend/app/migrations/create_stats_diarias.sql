@@ -0,0 +1,41 @@
+-- Migración: Resumen diario de participaciones por encuesta
+-- Fecha: 2026-10-18
+-- Descripción: Tabla stats_diarias que leen /dashboard/stats, /dashboard/charts y
+-- /dashboard/export-data. Se actualiza con un upsert en cada participación y se
+-- puede reconstruir con recalcular_stats_diarias.py.
+
+-- Paso 1: Crear la tabla
+CREATE TABLE IF NOT EXISTS public.stats_diarias (
+    fecha DATE NOT NULL,
+    id_encuesta INTEGER NOT NULL REFERENCES public.encuestas(id_encuesta),
+    participaciones INTEGER NOT NULL DEFAULT 0,
+    respuestas INTEGER NOT NULL DEFAULT 0,
+    tiempo_respuesta_total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_encuesta)
+);
+
+-- Paso 1b: Quitar la columna respondentes de versiones anteriores de esta migración
+-- (con una participación por usuario y encuesta era una copia de participaciones)
+ALTER TABLE public.stats_diarias DROP COLUMN IF EXISTS respondentes;
+
+-- Paso 2: Índice para contar usuarios activos por rango de fechas
+CREATE INDEX IF NOT EXISTS ix_participaciones_fecha_participacion
+ON public.participaciones(fecha_participacion);
+
+-- Paso 3: Carga inicial con los datos existentes (no pisa filas ya existentes)
+INSERT INTO public.stats_diarias (fecha, id_encuesta, participaciones, respuestas, tiempo_respuesta_total)
+SELECT
+    p.fecha_participacion::date,
+    p.id_encuesta,
+    COUNT(*),
+    COALESCE(SUM(r.cantidad), 0),
+    COALESCE(SUM(p.tiempo_respuesta_segundos), 0)
+FROM public.participaciones p
+LEFT JOIN (
+    SELECT id_participacion, COUNT(*) AS cantidad
+    FROM public.respuestas
+    GROUP BY id_participacion
+) r ON r.id_participacion = p.id_participacion
+WHERE p.fecha_participacion IS NOT NULL
+GROUP BY p.fecha_participacion::date, p.id_encuesta
+ON CONFLICT (fecha, id_encuesta) DO NOTHING;
@@ -10,9 +10,13 @@ from .asignacion_encuestador import AsignacionEncuestador
 from .premio import Premio
 from .canje import Canje
 from .configuracion import Configuracion
+from .stats_diaria import StatsDiaria
+from .movimiento_puntos import MovimientoPuntos
+from .email_outbox import EmailOutbox
 
 __all__ = [
     "Usuario", "Rol", "Encuesta", "Pregunta", "Opcion", 
     "Respuesta", "Participacion", "SesionUsuario", 
-    "AsignacionEncuestador", "Premio", "Canje", "Configuracion"
+    "AsignacionEncuestador", "Premio", "Canje", "Configuracion",
+    "StatsDiaria", "MovimientoPuntos", "EmailOutbox"
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Enum, Text, Boolean
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Enum, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -14,6 +14,11 @@ class EstadoCanje(enum.Enum):
 class Canje(Base):
     __tablename__ = "canjes"
 
+    __table_args__ = (
+        Index("ix_canjes_usuario_fecha_id", "id_usuario", "fecha_solicitud", "id_canje"),
+        Index("ix_canjes_id_premio", "id_premio"),
+    )
+
     id_canje = Column(Integer, primary_key=True, index=True)
     
     # Relaciones principales
@@ -1,5 +1,5 @@
 # app/models/configuracion.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Text, JSON, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -29,6 +29,8 @@ class Configuracion(Base):
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
     fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     activa = Column(Boolean, default=True)
+    # La asigna la secuencia y la incrementa un trigger en cada UPDATE (add_version_configuraciones.sql)
+    version = Column(BigInteger, nullable=False, server_default=text("nextval('configuraciones_version_seq')"))
     
     def __repr__(self):
         return f"<Configuracion(id={self.id_configuracion}, puntos_perfil={self.puntos_completar_perfil}, puntos_registro={self.puntos_registro_inicial})>"
@@ -0,0 +1,44 @@
+# app/models/email_outbox.py
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Index, func, text
+from app.database import Base
+
+
+class EstadoEmail:
+    """Estado de un correo de la bandeja de salida (columna VARCHAR con CHECK en la base)"""
+    PENDIENTE = "pendiente"
+    ENVIADO = "enviado"
+    # Agotó los reintentos o el servidor lo rechazó de forma permanente (5xx)
+    FALLIDO = "fallido"
+
+
+class EmailOutbox(Base):
+    """
+    Bandeja de salida de correos. Los endpoints insertan el correo ya armado en
+    la misma transacción que el dato que lo origina (token de verificación,
+    usuario nuevo) y el envío lo hace en segundo plano email_outbox_service.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # Solo los pendientes, en el orden en que se reclaman
+        Index(
+            "ix_email_outbox_pendientes", "proximo_intento", "id_email",
+            postgresql_where=text("estado = 'pendiente'")
+        ),
+    )
+
+    id_email = Column(BigInteger, primary_key=True)
+    destinatario = Column(String(255), nullable=False)
+    asunto = Column(String(255), nullable=False)
+    html = Column(Text, nullable=False)
+    texto = Column(Text, nullable=True)
+    estado = Column(String(20), nullable=False, default=EstadoEmail.PENDIENTE)
+    intentos = Column(Integer, nullable=False, default=0)
+    # Hora de la base (now()), igual que las comparaciones del envío. Un envío en
+    # curso corre este valor hacia adelante: si el worker se cae, se reintenta al vencer
+    proximo_intento = Column(DateTime, nullable=False, server_default=func.now())
+    ultimo_error = Column(Text, nullable=True)
+    fecha_creacion = Column(DateTime, nullable=False, server_default=func.now())
+    fecha_envio = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<EmailOutbox(id={self.id_email}, destinatario='{self.destinatario}', estado='{self.estado}')>"
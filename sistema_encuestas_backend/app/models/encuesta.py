@@ -1,10 +1,14 @@
 # app/models/encuesta.py
-from sqlalchemy import Column, Integer, String, Text, Date, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, String, Text, Date, Boolean, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Encuesta(Base):
     __tablename__ = "encuestas"
+    __table_args__ = (
+        # Listado del administrador paginado por cursor (add_indices_paginacion.sql)
+        Index("ix_encuestas_fecha_creacion", "fecha_creacion", "id_encuesta"),
+    )
 
     id_encuesta = Column(Integer, primary_key=True, index=True)
     fecha_fin = Column(Date)
@@ -18,6 +22,8 @@ class Encuesta(Base):
     tiempo_estimado = Column(String)
     visible_para = Column(String)
     imagen = Column(Text)
+    # Aumenta con cada cambio de la encuesta, sus preguntas u opciones (triggers en add_version_encuestas.sql)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     preguntas = relationship("Pregunta", back_populates="encuesta")
     
@@ -0,0 +1,53 @@
+# app/models/movimiento_puntos.py
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Index, text
+from datetime import datetime
+from app.database import Base
+
+
+class TipoMovimiento:
+    """Origen de un movimiento de puntos (columna VARCHAR con CHECK en la base)"""
+    REGISTRO = "registro"
+    PERFIL_COMPLETO = "perfil_completo"
+    PARTICIPACION = "participacion"
+    CANJE = "canje"
+    AJUSTE = "ajuste"
+    # Saldo anterior al libro, cargado por add_movimientos_puntos.sql
+    APERTURA = "apertura"
+
+
+class MovimientoPuntos(Base):
+    """
+    Libro de movimientos de puntos: solo se insertan filas (un trigger rechaza
+    UPDATE). Los saldos de usuarios son un agregado de este libro:
+    puntos_canjeados = -(suma de los canjes), puntos_totales = suma del resto y
+    puntos_disponibles = suma de todo.
+    """
+    __tablename__ = "movimientos_puntos"
+    __table_args__ = (
+        Index("ix_movimientos_puntos_usuario", "id_usuario", "id_movimiento"),
+        # Un movimiento por participación y por canje, y un solo bono por usuario
+        Index(
+            "uq_movimientos_puntos_participacion", "id_participacion", unique=True,
+            postgresql_where=text("id_participacion IS NOT NULL")
+        ),
+        Index(
+            "uq_movimientos_puntos_canje", "id_canje", unique=True,
+            postgresql_where=text("id_canje IS NOT NULL")
+        ),
+        Index(
+            "uq_movimientos_puntos_bonos", "id_usuario", "tipo", unique=True,
+            postgresql_where=text("tipo IN ('registro', 'perfil_completo', 'apertura')")
+        ),
+    )
+
+    id_movimiento = Column(BigInteger, primary_key=True)
+    id_usuario = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), nullable=False)
+    tipo = Column(String(20), nullable=False)
+    # Positivo acredita, negativo debita
+    puntos = Column(Integer, nullable=False)
+    id_participacion = Column(Integer, nullable=True)
+    id_canje = Column(Integer, nullable=True)
+    fecha = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<MovimientoPuntos(id={self.id_movimiento}, usuario={self.id_usuario}, tipo='{self.tipo}', puntos={self.puntos})>"
@@ -1,11 +1,15 @@
 # app/models/opcion.py
-from sqlalchemy import Column, Integer, Text, ForeignKey
+from sqlalchemy import Column, Integer, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Opcion(Base):
     __tablename__ = "opciones"
 
+    __table_args__ = (
+        Index("ix_opciones_id_pregunta", "id_pregunta"),
+    )
+
     id_opcion = Column(Integer, primary_key=True, index=True)
     id_pregunta = Column(Integer, ForeignKey("preguntas.id_pregunta"))
     texto_opcion = Column(Text)
@@ -1,11 +1,19 @@
 # app/models/participacion.py
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
 
 class Participacion(Base):
     __tablename__ = "participaciones"
+    __table_args__ = (
+        # Una sola participación por usuario y encuesta (usada por ON CONFLICT al guardar respuestas)
+        Index("uq_participaciones_usuario_encuesta", "id_usuario", "id_encuesta", unique=True),
+        # Paginación por cursor (add_indices_paginacion.sql)
+        Index("ix_participaciones_encuesta_fecha_id", "id_encuesta", "fecha_participacion", "id_participacion"),
+        Index("ix_participaciones_usuario_fecha", "id_usuario", "fecha_participacion", "id_participacion"),
+        Index("ix_participaciones_fecha_participacion", "fecha_participacion"),
+    )
 
     id_participacion = Column(Integer, primary_key=True, index=True)
     id_usuario = Column(Integer, ForeignKey("usuarios.id_usuario"), nullable=False)
@@ -1,11 +1,15 @@
 # app/models/pregunta.py
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Pregunta(Base):
     __tablename__ = "preguntas"
 
+    __table_args__ = (
+        Index("ix_preguntas_encuesta_orden", "id_encuesta", "orden"),
+    )
+
     id_pregunta = Column(Integer, primary_key=True, index=True)
     id_encuesta = Column(Integer, ForeignKey("encuestas.id_encuesta"))
     orden = Column(Integer)
@@ -1,5 +1,5 @@
 # app/models/premio.py
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Enum
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Enum, Index, text, and_, or_
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -20,6 +20,14 @@ class EstadoPremio(enum.Enum):
 class Premio(Base):
     __tablename__ = "premios"
 
+    # Índices del catálogo público (add_catalogo_premios.sql)
+    __table_args__ = (
+        Index("ix_premios_activos_costo", "costo_puntos", "id_premio", postgresql_where=text("activo")),
+        Index("ix_premios_activos_categoria_costo", "categoria", "costo_puntos", postgresql_where=text("activo")),
+        Index("ix_premios_activos_tipo_costo", "tipo", "costo_puntos", postgresql_where=text("activo")),
+        Index("ix_premios_activos_populares", text("total_canjes DESC"), "id_premio", postgresql_where=text("activo")),
+    )
+
     id_premio = Column(Integer, primary_key=True, index=True)
     
     # Información básica
@@ -39,6 +47,8 @@ class Premio(Base):
     # Estado
     estado = Column(Enum(EstadoPremio), default=EstadoPremio.DISPONIBLE)
     activo = Column(Boolean, default=True)
+    # Canjes no rechazados ni cancelados; lo mantiene un trigger sobre canjes (add_catalogo_premios.sql)
+    total_canjes = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Metadatos
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
@@ -63,6 +73,15 @@ class Premio(Base):
             return False
         return True
     
+    @classmethod
+    def condicion_disponible(cls):
+        """Mismo criterio que esta_disponible(), como condición SQL"""
+        return and_(
+            cls.activo == True,
+            cls.estado == EstadoPremio.DISPONIBLE,
+            or_(cls.stock_disponible.is_(None), cls.stock_disponible > 0)
+        )
+
     def decrementar_stock(self):
         """Decrementa el stock disponible"""
         if self.stock_disponible is not None:
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -7,6 +7,13 @@ from app.database import Base
 class Respuesta(Base):
     __tablename__ = "respuestas"
 
+    __table_args__ = (
+        # Índices de add_indices_consultas.sql
+        Index("idx_respuestas_participacion", "id_participacion"),
+        Index("ix_respuestas_pregunta_opcion", "id_pregunta", "id_opcion"),
+        Index("ix_respuestas_id_usuario", "id_usuario"),
+    )
+
     id_respuesta = Column(Integer, primary_key=True, index=True, autoincrement=True)
     id_pregunta = Column(Integer, ForeignKey("preguntas.id_pregunta"), nullable=False)
     id_usuario = Column(Integer, ForeignKey("usuarios.id_usuario"), nullable=False)
@@ -0,0 +1,13 @@
+# app/models/stats_diaria.py
+from sqlalchemy import Column, Integer, BigInteger, Date, ForeignKey
+from app.database import Base
+
+class StatsDiaria(Base):
+    """Resumen diario por encuesta, mantenido al registrar cada participación"""
+    __tablename__ = "stats_diarias"
+
+    fecha = Column(Date, primary_key=True)
+    id_encuesta = Column(Integer, ForeignKey("encuestas.id_encuesta"), primary_key=True)
+    participaciones = Column(Integer, nullable=False, default=0)
+    respuestas = Column(Integer, nullable=False, default=0)
+    tiempo_respuesta_total = Column(BigInteger, nullable=False, default=0)
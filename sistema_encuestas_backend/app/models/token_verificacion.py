@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
 import uuid
@@ -8,6 +8,10 @@ from app.database import Base
 class TokenVerificacion(Base):
     __tablename__ = "tokens_verificacion"
     
+    __table_args__ = (
+        Index("idx_token_usuario_tipo", "id_usuario", "tipo"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     id_usuario = Column(Integer, ForeignKey("usuarios.id_usuario"), nullable=False)
     token = Column(String(255), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
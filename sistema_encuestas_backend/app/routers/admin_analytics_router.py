@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, distinct
-from typing import List, Dict, Any
+from sqlalchemy import select, func, distinct, and_, true
+from typing import List, Dict, Any, Optional
+from urllib.parse import quote
 from app.database import get_db
 from app.models.usuario import Usuario
 from app.models.participacion import Participacion
@@ -10,6 +13,9 @@ from app.models.pregunta import Pregunta
 from app.models.respuesta import Respuesta
 from app.models.opcion import Opcion
 from app.middleware.auth_middleware import get_current_user
+from app.services.respuestas_detalladas_service import respuestas_detalladas_service
+from app.utils.paginacion import LIMITE_MAXIMO, LIMITE_POR_DEFECTO, Paginacion
+from app.utils.presupuesto_consultas import presupuesto_consultas
 
 router = APIRouter(
     prefix="/admin",
@@ -22,14 +28,62 @@ async def admin_required(current_user: Usuario = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Acceso denegado: Se requiere rol de administrador")
     return current_user
 
+async def _muestras_texto(
+    db: AsyncSession,
+    id_encuesta: int,
+    limite: int,
+    offset: int,
+    id_pregunta: Optional[int] = None
+) -> Dict[int, List[str]]:
+    """
+    Devuelve una página de respuestas de texto por pregunta en una sola consulta.
+    Usa un LATERAL con LIMIT por pregunta para no leer todas las respuestas.
+    """
+    if limite <= 0:
+        return {}
+
+    muestra = (
+        select(Respuesta.id_respuesta, Respuesta.respuesta_texto)
+        .where(
+            Respuesta.id_pregunta == Pregunta.id_pregunta,
+            Respuesta.respuesta_texto.is_not(None)
+        )
+        .order_by(Respuesta.id_respuesta)
+        .offset(offset)
+        .limit(limite)
+        .lateral("muestra")
+    )
+    query = (
+        select(Pregunta.id_pregunta, muestra.c.respuesta_texto)
+        .select_from(Pregunta)
+        .join(muestra, true())
+        .where(Pregunta.id_encuesta == id_encuesta, Pregunta.tipo == "texto_libre")
+        .order_by(Pregunta.id_pregunta, muestra.c.id_respuesta)
+    )
+    if id_pregunta is not None:
+        query = query.where(Pregunta.id_pregunta == id_pregunta)
+
+    muestras: Dict[int, List[str]] = {}
+    for fila in await db.execute(query):
+        muestras.setdefault(fila.id_pregunta, []).append(fila.respuesta_texto)
+    return muestras
+
 @router.get("/estadisticas-por-encuesta/{id_encuesta}")
+@presupuesto_consultas(4)
 async def obtener_estadisticas_encuesta(
     id_encuesta: int,
+    limite_texto: int = Query(50, ge=0, le=500, description="Respuestas de texto por pregunta"),
+    offset_texto: int = Query(0, ge=0),
     db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(admin_required)
 ):
     """
-    Obtiene estadísticas agregadas de respuestas para una encuesta específica
+    Obtiene estadísticas agregadas de respuestas para una encuesta específica.
+
+    Usa un número fijo de consultas sin importar la cantidad de preguntas:
+    los conteos por opción (incluidas las opciones sin votos) y el total de
+    respuestas de texto salen de una sola agregación, y las respuestas de
+    texto se devuelven como una muestra paginada.
     """
     
     # Verificar que la encuesta existe
@@ -41,59 +95,78 @@ async def obtener_estadisticas_encuesta(
     if not encuesta:
         raise HTTPException(status_code=404, detail="Encuesta no encontrada")
     
-    # Obtener todas las preguntas de la encuesta
+    # Conteos de toda la encuesta en una sola pasada sobre respuestas
+    conteos = (
+        select(
+            Respuesta.id_pregunta,
+            Respuesta.id_opcion,
+            func.count().label("cantidad"),
+            func.count(Respuesta.respuesta_texto).label("cantidad_texto")
+        )
+        .join(Pregunta, Pregunta.id_pregunta == Respuesta.id_pregunta)
+        .where(Pregunta.id_encuesta == id_encuesta)
+        .group_by(Respuesta.id_pregunta, Respuesta.id_opcion)
+        .cte("conteos")
+    )
+    conteo_opcion = conteos.alias("conteo_opcion")
+    conteo_texto = conteos.alias("conteo_texto")
+    
+    # Preguntas con sus opciones; LEFT JOIN para conservar las opciones sin votos
     query_preguntas = await db.execute(
-        select(Pregunta).where(Pregunta.id_encuesta == id_encuesta).order_by(Pregunta.orden)
+        select(
+            Pregunta.id_pregunta,
+            Pregunta.tipo,
+            Pregunta.texto,
+            Opcion.id_opcion,
+            Opcion.texto_opcion,
+            func.coalesce(conteo_opcion.c.cantidad, 0).label("cantidad"),
+            func.coalesce(conteo_texto.c.cantidad_texto, 0).label("total_texto")
+        )
+        .outerjoin(Opcion, Opcion.id_pregunta == Pregunta.id_pregunta)
+        .outerjoin(conteo_opcion, conteo_opcion.c.id_opcion == Opcion.id_opcion)
+        .outerjoin(
+            conteo_texto,
+            and_(
+                conteo_texto.c.id_pregunta == Pregunta.id_pregunta,
+                conteo_texto.c.id_opcion.is_(None)
+            )
+        )
+        .where(Pregunta.id_encuesta == id_encuesta)
+        .order_by(Pregunta.orden, Pregunta.id_pregunta, Opcion.id_opcion)
     )
-    preguntas = query_preguntas.scalars().all()
     
     resultado_preguntas = []
+    por_id: Dict[int, Dict[str, Any]] = {}
     
-    for pregunta in preguntas:
-        tipo_pregunta = str(pregunta.tipo)
-        if tipo_pregunta == "opcion_multiple":
-            # Contar respuestas por opción
-            query_opciones = await db.execute(
-                select(
-                    Opcion.texto_opcion,
-                    func.count(Respuesta.id_respuesta).label('cantidad')
-                )
-                .join(Respuesta, Respuesta.id_opcion == Opcion.id_opcion)
-                .where(Opcion.id_pregunta == pregunta.id_pregunta)
-                .group_by(Opcion.id_opcion, Opcion.texto_opcion)
-                .order_by(Opcion.id_opcion)
-            )
-            opciones_estadisticas = query_opciones.all()
-            
-            estadisticas = {}
-            for opcion in opciones_estadisticas:
-                estadisticas[opcion.texto_opcion] = opcion.cantidad
-            
-            resultado_preguntas.append({
-                "id": pregunta.id_pregunta,
-                "tipo": pregunta.tipo,
-                "pregunta": pregunta.texto,
-                "estadisticas": estadisticas
-            })
-            
-        elif tipo_pregunta == "texto_libre":
-            # Obtener todas las respuestas de texto
-            query_respuestas = await db.execute(
-                select(Respuesta.respuesta_texto)
-                .where(
-                    Respuesta.id_pregunta == pregunta.id_pregunta,
-                    Respuesta.respuesta_texto.is_not(None)
-                )
-            )
-            respuestas_texto_raw = query_respuestas.scalars().all()
-            respuestas_texto = [r for r in respuestas_texto_raw if r is not None]
-            
-            resultado_preguntas.append({
-                "id": pregunta.id_pregunta,
-                "tipo": pregunta.tipo,
-                "pregunta": pregunta.texto,
-                "respuestas_texto": respuestas_texto
-            })
+    for fila in query_preguntas:
+        tipo_pregunta = str(fila.tipo)
+        pregunta = por_id.get(fila.id_pregunta)
+        
+        if pregunta is None:
+            if tipo_pregunta not in ("opcion_multiple", "texto_libre"):
+                continue
+            pregunta = {
+                "id": fila.id_pregunta,
+                "tipo": fila.tipo,
+                "pregunta": fila.texto
+            }
+            if tipo_pregunta == "opcion_multiple":
+                pregunta["estadisticas"] = {}
+            else:
+                pregunta["respuestas_texto"] = []
+                pregunta["total_respuestas_texto"] = fila.total_texto
+            por_id[fila.id_pregunta] = pregunta
+            resultado_preguntas.append(pregunta)
+        
+        if tipo_pregunta == "opcion_multiple" and fila.id_opcion is not None:
+            estadisticas = pregunta["estadisticas"]
+            estadisticas[fila.texto_opcion] = estadisticas.get(fila.texto_opcion, 0) + fila.cantidad
+    
+    # Muestra paginada de respuestas de texto de todas las preguntas
+    muestras = await _muestras_texto(db, id_encuesta, limite_texto, offset_texto)
+    for id_pregunta, textos in muestras.items():
+        if id_pregunta in por_id:
+            por_id[id_pregunta]["respuestas_texto"] = textos
     
     return {
         "encuesta": {
@@ -103,9 +176,48 @@ async def obtener_estadisticas_encuesta(
         "preguntas": resultado_preguntas
     }
 
+@router.get("/estadisticas-por-encuesta/{id_encuesta}/preguntas/{id_pregunta}/respuestas-texto")
+@presupuesto_consultas(3)
+async def obtener_respuestas_texto_pregunta(
+    id_encuesta: int,
+    id_pregunta: int,
+    limite: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+    current_user: Usuario = Depends(admin_required)
+):
+    """
+    Obtiene una página de respuestas de texto de una pregunta de texto libre
+    """
+    query_total = await db.execute(
+        select(func.count(Respuesta.id_respuesta))
+        .join(Pregunta, Pregunta.id_pregunta == Respuesta.id_pregunta)
+        .where(
+            Pregunta.id_encuesta == id_encuesta,
+            Pregunta.id_pregunta == id_pregunta,
+            Respuesta.respuesta_texto.is_not(None)
+        )
+    )
+    total = query_total.scalar()
+    
+    muestras = await _muestras_texto(db, id_encuesta, limite, offset, id_pregunta=id_pregunta)
+    
+    return {
+        "id": id_pregunta,
+        "total_respuestas_texto": total,
+        "limite": limite,
+        "offset": offset,
+        "respuestas_texto": muestras.get(id_pregunta, [])
+    }
+
 @router.get("/respuestas-detalladas/{id_encuesta}")
+@presupuesto_consultas(5)
 async def obtener_respuestas_detalladas(
     id_encuesta: int,
+    response: Response,
+    formato: str = Query("json", pattern="^(json|ndjson)$", description="json (arreglo) o ndjson"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+    limite: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO, description="Participaciones por página"),
     db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(admin_required)
 ):
@@ -113,98 +225,91 @@ async def obtener_respuestas_detalladas(
     Obtiene el detalle de todas las respuestas individuales de una encuesta
     🔐 Los datos personales están anonimizados (sin nombre ni cédula)
     ✅ Muestra el texto real de las preguntas como encabezados de columna
+    📦 Se envía en streaming, una participación por elemento, con memoria constante
+    📄 Con `limite` o `cursor` devuelve una página de participaciones y el
+       cursor de la siguiente en X-Next-Cursor; sin ellos, la encuesta completa
     """
     
-    # Verificar que la encuesta existe
-    query_encuesta = await db.execute(
-        select(Encuesta).where(Encuesta.id_encuesta == id_encuesta)
-    )
-    encuesta = query_encuesta.scalar_one_or_none()
+    # Verificar que la encuesta existe y resolver preguntas y opciones
+    encabezados = await respuestas_detalladas_service.obtener_encabezados(db, id_encuesta)
     
-    if not encuesta:
+    if not encabezados:
         raise HTTPException(status_code=404, detail="Encuesta no encontrada")
     
-    # Obtener todas las participaciones con datos del usuario
-    query_participaciones = await db.execute(
-        select(
-            Participacion,
-            Usuario
+    ids = None
+    if cursor is not None or limite is not None:
+        pagina = Paginacion(cursor, limite or LIMITE_POR_DEFECTO)
+        ids = await respuestas_detalladas_service.ids_pagina(db, id_encuesta, pagina, response)
+    
+    if formato == "ndjson":
+        return StreamingResponse(
+            respuestas_detalladas_service.generar_ndjson(encabezados, ids),
+            media_type="application/x-ndjson",
+            headers=dict(response.headers)
         )
-        .join(Usuario, Usuario.id_usuario == Participacion.id_usuario)
-        .where(Participacion.id_encuesta == id_encuesta)
-        .order_by(Participacion.fecha_participacion.desc())
-    )
-    participaciones = query_participaciones.all()
     
-    # Obtener todas las preguntas ordenadas
-    query_preguntas = await db.execute(
-        select(Pregunta)
-        .where(Pregunta.id_encuesta == id_encuesta)
-        .order_by(Pregunta.orden)
+    return StreamingResponse(
+        respuestas_detalladas_service.generar_json(encabezados, ids),
+        media_type="application/json",
+        headers=dict(response.headers)
     )
-    preguntas = query_preguntas.scalars().all()
+
+@router.get("/encuestas/{id_encuesta}/export")
+@presupuesto_consultas(6)
+async def exportar_respuestas_encuesta(
+    id_encuesta: int,
+    formato: str = Query("csv", alias="format", pattern="^(csv|xlsx|parquet)$", description="csv, xlsx o parquet"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Usuario = Depends(admin_required)
+):
+    """
+    Exporta las respuestas individuales de una encuesta como CSV, XLSX o Parquet
+    🔐 Mismas columnas anonimizadas que /respuestas-detalladas
+    📦 Se genera en el servidor mientras se recorren las participaciones con un
+       cursor, con memoria constante, y se envía en bloques (chunked)
+    🧮 Parquet: columnas tipadas para análisis, cacheado en disco hasta la
+       próxima participación
+    """
+    encabezados = await respuestas_detalladas_service.obtener_encabezados(db, id_encuesta)
     
-    resultado = []
+    if not encabezados:
+        raise HTTPException(status_code=404, detail="Encuesta no encontrada")
     
-    for participacion, usuario in participaciones:
-        # Obtener todas las respuestas de esta participación
-        respuestas_dict = {}
-        
-        for pregunta in preguntas:
-            # Buscar la respuesta para esta pregunta
-            tipo_pregunta = str(pregunta.tipo)
-            if tipo_pregunta == "opcion_multiple":
-                query_respuesta = await db.execute(
-                    select(Opcion.texto_opcion)
-                    .join(Respuesta, Respuesta.id_opcion == Opcion.id_opcion)
-                    .where(
-                        Respuesta.id_participacion == participacion.id_participacion,
-                        Respuesta.id_pregunta == pregunta.id_pregunta
-                    )
-                )
-                opciones = query_respuesta.scalars().all()
-                # ✅ Usar el texto real de la pregunta como clave
-                respuestas_dict[pregunta.texto] = ", ".join(opciones) if opciones else "Sin respuesta"
-                
-            elif tipo_pregunta == "texto_libre":
-                query_respuesta = await db.execute(
-                    select(Respuesta.respuesta_texto)
-                    .where(
-                        Respuesta.id_participacion == participacion.id_participacion,
-                        Respuesta.id_pregunta == pregunta.id_pregunta
-                    )
-                )
-                texto = query_respuesta.scalar()
-                # ✅ Usar el texto real de la pregunta como clave
-                respuestas_dict[pregunta.texto] = texto or "Sin respuesta"
-        
-        # Calcular edad si hay fecha de nacimiento
-        edad = None
-        if hasattr(usuario, 'fecha_nacimiento') and usuario.fecha_nacimiento:
-            from datetime import date
-            hoy = date.today()
-            edad = hoy.year - usuario.fecha_nacimiento.year
-            if (hoy.month, hoy.day) < (usuario.fecha_nacimiento.month, usuario.fecha_nacimiento.day):
-                edad -= 1
-        
-        # Obtener datos demográficos anonimizados
-        sexo = getattr(usuario, 'sexo', 'No especificado') or 'No especificado'
-        localizacion = getattr(usuario, 'localizacion', 'No especificada') or 'No especificada'
-        
-        resultado.append({
-            "participante_id": f"P{participacion.id_participacion:06d}",  # ID anonimizado
-            "edad": edad if edad else "No especificada",
-            "sexo": sexo,
-            "localizacion": localizacion,
-            "fecha": participacion.fecha_participacion.strftime("%Y-%m-%d %H:%M"),
-            "encuesta_id": encuesta.id_encuesta,
-            "encuesta_nom": encuesta.titulo,
-            "respuestas": respuestas_dict
-        })
-    
-    return resultado
+    nombre = f"respuestas_{encabezados.titulo}.{formato}".replace(" ", "_")
+    headers = {
+        "Content-Disposition": (
+            f'attachment; filename="respuestas_encuesta_{id_encuesta}.{formato}"; '
+            f"filename*=UTF-8''{quote(nombre)}"
+        )
+    }
+    
+    if formato == "parquet":
+        try:
+            archivo = await respuestas_detalladas_service.abrir_parquet(db, encabezados)
+        except ImportError:
+            raise HTTPException(status_code=503, detail="Exportación Parquet no disponible (falta pyarrow)")
+        headers["Content-Length"] = str(os.fstat(archivo.fileno()).st_size)
+        return StreamingResponse(
+            respuestas_detalladas_service.enviar_archivo(archivo),
+            media_type="application/vnd.apache.parquet",
+            headers=headers
+        )
+    
+    if formato == "csv":
+        return StreamingResponse(
+            respuestas_detalladas_service.generar_csv(encabezados),
+            media_type="text/csv",
+            headers=headers
+        )
+    
+    return StreamingResponse(
+        respuestas_detalladas_service.generar_xlsx(encabezados),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers=headers
+    )
 
 @router.get("/encuestas-resumen")
+@presupuesto_consultas(2)
 async def obtener_resumen_encuestas(
     db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(admin_required)
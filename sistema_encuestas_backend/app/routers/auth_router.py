@@ -2,7 +2,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from passlib.context import CryptContext
 from app.utils.jwt_manager import crear_token
 from app.schemas.auth_schema import (
     LoginRequest, LoginResponse, RegistroRequest, GoogleAuthRequest, 
@@ -16,15 +15,19 @@ import logging
 from app.database import SessionLocal
 from app.models.usuario import Usuario
 from app.models.token_verificacion import TokenVerificacion
+from app.models.movimiento_puntos import TipoMovimiento
 from app.services.email_service import email_service
+from app.services.email_outbox_service import email_outbox_service
 from app.services.google_auth_service import google_auth_service
 from app.services.configuracion_service import configuracion_service
+from app.services.password_service import password_service
+from app.services.puntos_service import puntos_service
+from app.middleware.auth_middleware import invalidar_usuario_cache
+from app.utils.logs import campos
 
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
 logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 async def get_db():
     async with SessionLocal() as session:
         yield session
@@ -38,7 +41,7 @@ async def login(datos: LoginRequest, db: AsyncSession = Depends(get_db)):
     if not usuario:
         raise HTTPException(status_code=401, detail="Usuario no encontrado")
 
-    if not pwd_context.verify(datos.password, usuario.password_hash):
+    if not await password_service.verify(datos.password, usuario.password_hash):
         raise HTTPException(status_code=401, detail="Contraseña incorrecta")
     
     # 🔧 VERIFICACIÓN DE EMAIL DESHABILITADA TEMPORALMENTE
@@ -88,7 +91,7 @@ async def registro(datos: RegistroRequest, db: AsyncSession = Depends(get_db)):
 
     # Obtener puntos iniciales de la configuración
     puntos_iniciales = await configuracion_service.obtener_puntos_registro_inicial(db)
-    print(f"🎁 Asignando {puntos_iniciales} puntos iniciales al nuevo usuario")
+    logger.info("Puntos iniciales asignados", extra=campos(puntos=puntos_iniciales))
     
     # Crear nuevo usuario
     nuevo_usuario = Usuario(
@@ -98,16 +101,20 @@ async def registro(datos: RegistroRequest, db: AsyncSession = Depends(get_db)):
         celular_numero=datos.celular_numero,
         email=datos.email,
         metodo_registro="local",
-        password_hash=pwd_context.hash(datos.password),
+        password_hash=await password_service.hash(datos.password),
         estado=True,
         rol_id=3,  # Usuario normal
         email_verificado=False,  # No verificado por defecto
-        proveedor_auth="local",
-        puntos_totales=puntos_iniciales,
-        puntos_disponibles=puntos_iniciales
+        proveedor_auth="local"
     )
 
     db.add(nuevo_usuario)
+    if puntos_iniciales:
+        # El bono de registro entra por el libro de puntos, en la misma transacción
+        await db.flush()
+        await puntos_service.registrar_movimiento(
+            db, nuevo_usuario.id_usuario, TipoMovimiento.REGISTRO, puntos_iniciales
+        )
     await db.commit()
     await db.refresh(nuevo_usuario)
     
@@ -119,27 +126,18 @@ async def registro(datos: RegistroRequest, db: AsyncSession = Depends(get_db)):
     )
     
     db.add(token_verificacion)
+    await db.flush()
+    
+    # El correo queda en la bandeja de salida en la misma transacción que el
+    # token; se envía en segundo plano (email_outbox_service) sin bloquear la respuesta
+    email_service.encolar_correo_verificacion(
+        db,
+        email=nuevo_usuario.email,
+        nombre=nuevo_usuario.nombre,
+        token=token_verificacion.token
+    )
     await db.commit()
-    await db.refresh(token_verificacion)
-    
-    # 🔧 NO BLOQUEAR EL REGISTRO CON EL EMAIL
-    # El email se enviará en segundo plano sin bloquear la respuesta
-    email_enviado = False
-    import asyncio
-    
-    async def enviar_email_async():
-        try:
-            await email_service.enviar_correo_verificacion(
-                email=nuevo_usuario.email,
-                nombre=nuevo_usuario.nombre,
-                token=token_verificacion.token
-            )
-            logger.info(f"Email enviado a {nuevo_usuario.email}")
-        except Exception as e:
-            logger.error(f"Error enviando email: {str(e)}")
-    
-    # Programar el envío del email sin esperar
-    asyncio.create_task(enviar_email_async())
+    email_outbox_service.despertar()
 
     return JSONResponse(content={
         "mensaje": "Usuario registrado exitosamente. Te enviaremos un correo de verificación.",
@@ -226,6 +224,7 @@ async def verificar_correo(
     token_obj.marcar_usado()
     
     await db.commit()
+    invalidar_usuario_cache(usuario.id_usuario)
     
     return JSONResponse(
         status_code=200,
@@ -277,15 +276,17 @@ async def reenviar_verificacion(
     )
     
     db.add(token_verificacion)
-    await db.commit()
-    await db.refresh(token_verificacion)
+    await db.flush()
     
-    # Enviar correo
-    email_enviado = await email_service.enviar_correo_verificacion(
+    # Encolar correo (se envía en segundo plano)
+    email_enviado = email_service.encolar_correo_verificacion(
+        db,
         email=usuario.email,
         nombre=usuario.nombre,
         token=token_verificacion.token
     )
+    await db.commit()
+    email_outbox_service.despertar()
     
     return JSONResponse(content={
         "mensaje": "Si el email existe en nuestro sistema, recibirás un nuevo correo de verificación.",
@@ -333,6 +334,7 @@ async def google_auth(
             usuario.fecha_verificacion = datetime.utcnow()
         
         await db.commit()
+        invalidar_usuario_cache(usuario.id_usuario)
         
     else:
         # Crear nuevo usuario
@@ -361,14 +363,16 @@ async def google_auth(
         )
         
         db.add(usuario)
-        await db.commit()
-        await db.refresh(usuario)
         
-        # Enviar correo de bienvenida
-        await email_service.enviar_correo_bienvenida_google(
+        # Correo de bienvenida a la bandeja de salida: el login no espera al SMTP
+        email_service.encolar_correo_bienvenida_google(
+            db,
             email=usuario.email,
             nombre=usuario.nombre
         )
+        await db.commit()
+        await db.refresh(usuario)
+        email_outbox_service.despertar()
     
     # Generar token JWT
     token_data = {
@@ -416,7 +420,7 @@ async def forgot_password(
     db: AsyncSession = Depends(get_db)
 ):
     """Solicita recuperación de contraseña por email"""
-    logger.info(f"Solicitud de recuperación de contraseña para: {datos.email}")
+    logger.info("Solicitud de recuperación de contraseña", extra=campos(email=datos.email))
     
     # Buscar usuario por email
     query = await db.execute(
@@ -446,19 +450,17 @@ async def forgot_password(
         )
         
         db.add(token_recuperacion)
-        await db.commit()
-        await db.refresh(token_recuperacion)
+        await db.flush()
         
-        # Enviar correo con el token
-        try:
-            await email_service.enviar_correo_recuperacion(
-                email=usuario.email,
-                nombre=usuario.nombre,
-                token=token_recuperacion.token
-            )
-            logger.info(f"Correo de recuperación enviado a: {usuario.email}")
-        except Exception as e:
-            logger.error(f"Error enviando correo de recuperación: {e}")
+        # Encolar el correo con el token en la misma transacción
+        email_service.encolar_correo_recuperacion(
+            db,
+            email=usuario.email,
+            nombre=usuario.nombre,
+            token=token_recuperacion.token
+        )
+        await db.commit()
+        email_outbox_service.despertar()
     
     return JSONResponse(content={
         "mensaje": mensaje_respuesta,
@@ -472,7 +474,7 @@ async def reset_password(
     db: AsyncSession = Depends(get_db)
 ):
     """Restablece la contraseña usando el token de recuperación"""
-    logger.info(f"Intento de restablecimiento de contraseña con token")
+    logger.info("Intento de restablecimiento de contraseña con token")
     
     # Buscar el token de recuperación
     query = await db.execute(
@@ -509,15 +511,16 @@ async def reset_password(
         )
     
     # Actualizar la contraseña
-    usuario.password_hash = pwd_context.hash(datos.nueva_password)
+    usuario.password_hash = await password_service.hash(datos.nueva_password)
     
     # Marcar el token como usado
     token_verificacion.marcar_usado()
     
     # Guardar cambios
     await db.commit()
+    invalidar_usuario_cache(usuario.id_usuario)
     
-    logger.info(f"Contraseña actualizada exitosamente para usuario: {usuario.email}")
+    logger.info("Contraseña actualizada exitosamente", extra=campos(email=usuario.email))
     
     return PasswordResetResponse(
         mensaje="Tu contraseña ha sido actualizada exitosamente. Ya puedes iniciar sesión con tu nueva contraseña.",
@@ -2,6 +2,7 @@
 """
 Router de autenticación simplificado compatible con la BD actual
 """
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
@@ -13,8 +14,10 @@ from typing import Optional
 from app.database import get_db
 from app.utils.jwt_manager import crear_token
 from app.config import settings
+from app.utils.logs import campos
 
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -48,7 +51,7 @@ async def login_simple(datos: LoginRequestSimple, db: AsyncSession = Depends(get
         # Normalizar email
         email = datos.email.lower().strip()
         
-        print(f"🔍 Buscando usuario: {email}")
+        logger.debug("Buscando usuario", extra=campos(email=email))
         
         # Buscar usuario usando SQL directo
         result = await db.execute(text("""
@@ -62,17 +65,17 @@ async def login_simple(datos: LoginRequestSimple, db: AsyncSession = Depends(get
         usuario_row = result.fetchone()
         
         if not usuario_row:
-            print(f"❌ Usuario no encontrado: {email}")
+            logger.info("Usuario no encontrado", extra=campos(email=email))
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, 
                 detail="Email o contraseña incorrectos"
             )
 
-        print(f"✅ Usuario encontrado: ID {usuario_row[0]}")
+        logger.debug("Usuario encontrado", extra=campos(id_usuario=usuario_row[0]))
         
         # Verificar si el usuario está activo
         if not usuario_row[8]:  # estado
-            print(f"❌ Usuario inactivo: {email}")
+            logger.info("Usuario inactivo", extra=campos(email=email))
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Tu cuenta ha sido desactivada. Contacta al administrador."
@@ -80,17 +83,14 @@ async def login_simple(datos: LoginRequestSimple, db: AsyncSession = Depends(get
 
         # Verificar contraseña
         password_hash = usuario_row[7]
-        print(f"🔐 Verificando password...")
         
         if not pwd_context.verify(datos.password, password_hash):
-            print(f"❌ Password incorrecto para: {email}")
+            logger.info("Password incorrecto", extra=campos(email=email))
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, 
                 detail="Email o contraseña incorrectos"
             )
 
-        print(f"✅ Password correcto")
-
         # Crear token
         token_data = {
             "sub": usuario_row[3],  # email
@@ -102,7 +102,6 @@ async def login_simple(datos: LoginRequestSimple, db: AsyncSession = Depends(get
         }
 
         access_token = crear_token(token_data)
-        print(f"✅ Token creado")
 
         # Crear response
         usuario_response = UsuarioSimple(
@@ -118,7 +117,7 @@ async def login_simple(datos: LoginRequestSimple, db: AsyncSession = Depends(get
             metodo_registro=usuario_row[6]
         )
 
-        print(f"✅ Login exitoso para: {email}")
+        logger.info("Login exitoso", extra=campos(email=email))
         
         return LoginResponseSimple(
             access_token=access_token,
@@ -129,10 +128,8 @@ async def login_simple(datos: LoginRequestSimple, db: AsyncSession = Depends(get
 
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"❌ Error interno: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error interno en login")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno del servidor"
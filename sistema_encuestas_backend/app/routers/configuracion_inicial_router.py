@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
@@ -8,8 +9,10 @@ from app.database import get_db
 from app.middleware.auth_middleware import get_current_user
 from app.models.usuario import Usuario
 from app.services.configuracion_service import configuracion_service
+from app.utils.presupuesto_consultas import presupuesto_consultas
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # Modelos Pydantic
 class CamposActivos(BaseModel):
@@ -36,6 +39,7 @@ def get_admin_user(current_user: Usuario = Depends(get_current_user)):
     return current_user
 
 @router.get("/admin/configuracion-inicial", response_model=ConfiguracionInicial)
+@presupuesto_consultas(2)
 async def obtener_configuracion_admin(
     db: AsyncSession = Depends(get_db),
     admin_user: Usuario = Depends(get_admin_user)
@@ -53,8 +57,8 @@ async def obtener_configuracion_admin(
         else:
             # Configuración por defecto si no existe
             return ConfiguracionInicial()
-    except Exception as e:
-        print(f"Error obteniendo configuración: {e}")
+    except Exception:
+        logger.exception("Error obteniendo configuración")
         return ConfiguracionInicial()
 
 @router.post("/admin/configuracion-inicial", response_model=ConfiguracionInicial)
@@ -111,14 +115,15 @@ async def guardar_configuracion_admin(
             
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"Error guardando configuración: {e}")
+    except Exception:
+        logger.exception("Error guardando configuración")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno del servidor"
         )
 
 @router.get("/perfil/configuracion-inicial", response_model=ConfiguracionInicial)
+@presupuesto_consultas(1)
 async def obtener_configuracion_usuario(
     db: AsyncSession = Depends(get_db)
 ):
@@ -134,6 +139,6 @@ async def obtener_configuracion_usuario(
             )
         else:
             return ConfiguracionInicial()
-    except Exception as e:
-        print(f"Error obteniendo configuración: {e}")
+    except Exception:
+        logger.exception("Error obteniendo configuración")
         return ConfiguracionInicial() 
\ No newline at end of file
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, literal, distinct
+from sqlalchemy import select, func, desc, literal
 from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from app.database import get_db
 from app.models.usuario import Usuario
 from app.models.participacion import Participacion
 from app.models.encuesta import Encuesta
-from app.models.respuesta import Respuesta
+from app.models.stats_diaria import StatsDiaria
 from app.middleware.auth_middleware import get_current_user
+from app.services.stats_service import stats_service
+from app.utils.presupuesto_consultas import presupuesto_consultas
 
 router = APIRouter(
     prefix="/dashboard",
@@ -23,41 +25,32 @@ async def admin_required(current_user: Usuario = Depends(get_current_user)):
     return current_user
 
 @router.get("/stats")
+@presupuesto_consultas(4)
 async def get_dashboard_stats(
     db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(admin_required)
 ):
-    """Obtiene las estadísticas principales del dashboard"""
+    """Obtiene las estadísticas principales del dashboard (desde stats_diarias)"""
     
-    # Total respuestas
-    total_stmt = select(func.count(Respuesta.id_respuesta))
-    total_res = await db.execute(total_stmt)
-    total_respuestas = total_res.scalar() or 0
-    
-    # Usuarios activos (que han participado en los últimos 30 días)
-    fecha_limite = datetime.utcnow() - timedelta(days=30)
-    activos_stmt = select(func.count(distinct(Participacion.id_usuario))).where(
-        Participacion.fecha_participacion >= fecha_limite
+    # Totales acumulados: respuestas, participaciones y tiempo de respuesta
+    totales_stmt = select(
+        func.coalesce(func.sum(StatsDiaria.respuestas), 0).label("respuestas"),
+        func.coalesce(func.sum(StatsDiaria.participaciones), 0).label("participaciones"),
+        func.coalesce(func.sum(StatsDiaria.tiempo_respuesta_total), 0).label("tiempo_total")
     )
-    activos_res = await db.execute(activos_stmt)
-    usuarios_activos = activos_res.scalar() or 0
+    totales = (await db.execute(totales_stmt)).one()
+    total_respuestas = totales.respuestas
+    
+    # Usuarios activos (que han participado en los últimos 30 días), cacheado por worker
+    usuarios_activos = await stats_service.usuarios_activos(db, dias=30)
     
     # Encuestas más respondidas
-    pop_stmt = (
-        select(
-            Encuesta.titulo.label("titulo"),
-            func.count(Participacion.id_participacion).label("respuestas")
-        )
-        .join(Participacion, Participacion.id_encuesta == Encuesta.id_encuesta)
-        .group_by(Encuesta.id_encuesta, Encuesta.titulo)
-        .order_by(desc("respuestas"))
-        .limit(3)
-    )
-    pop_res = await db.execute(pop_stmt)
-    encuestas_populares = pop_res.all()
+    encuestas_populares = await _encuestas_mas_respondidas(db, limite=3)
     
-    # Tiempo promedio de respuesta (simulado por ahora)
-    tiempo_promedio = 5.2
+    # Tiempo promedio de respuesta en minutos
+    tiempo_promedio = 0.0
+    if totales.participaciones:
+        tiempo_promedio = round(totales.tiempo_total / totales.participaciones / 60, 1)
     
     return {
         "totalRespuestas": total_respuestas,
@@ -66,7 +59,23 @@ async def get_dashboard_stats(
         "tiempoPromedioRespuesta": tiempo_promedio,
     }
 
+async def _encuestas_mas_respondidas(db: AsyncSession, limite: int):
+    """Encuestas con más participaciones según stats_diarias"""
+    stmt = (
+        select(
+            Encuesta.titulo.label("titulo"),
+            func.sum(StatsDiaria.participaciones).label("respuestas")
+        )
+        .join(StatsDiaria, StatsDiaria.id_encuesta == Encuesta.id_encuesta)
+        .group_by(Encuesta.id_encuesta, Encuesta.titulo)
+        .order_by(desc("respuestas"))
+        .limit(limite)
+    )
+    res = await db.execute(stmt)
+    return res.all()
+
 @router.get("/charts")
+@presupuesto_consultas(3)
 async def get_chart_data(
     db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(admin_required)
@@ -74,18 +83,7 @@ async def get_chart_data(
     """Obtiene los datos para los gráficos del dashboard"""
     
     # Respuestas por encuesta
-    enc_stmt = (
-        select(
-            Encuesta.titulo.label("encuesta"),
-            func.count(Participacion.id_participacion).label("respuestas")
-        )
-        .join(Participacion, Participacion.id_encuesta == Encuesta.id_encuesta)
-        .group_by(Encuesta.id_encuesta, Encuesta.titulo)
-        .order_by(desc("respuestas"))
-        .limit(5)
-    )
-    enc_res = await db.execute(enc_stmt)
-    respuestas_encuesta = enc_res.all()
+    respuestas_encuesta = await _encuestas_mas_respondidas(db, limite=5)
     
     # Distribución demográfica (simulada por ahora)
     distribucion_demografica = [
@@ -96,23 +94,28 @@ async def get_chart_data(
         {"name": "55+ años", "value": 5},
     ]
     
-    # Respuestas por día de la semana
+    # Respuestas por día de la semana: una sola consulta por rango sobre stats_diarias
+    dias = stats_service.rango_dias(7)
+    dia_stmt = (
+        select(StatsDiaria.fecha, func.sum(StatsDiaria.participaciones).label("respuestas"))
+        .where(StatsDiaria.fecha >= dias[0], StatsDiaria.fecha <= dias[-1])
+        .group_by(StatsDiaria.fecha)
+    )
+    por_fecha = {r.fecha: r.respuestas for r in (await db.execute(dia_stmt)).all()}
+    
     respuestas_dia = []
-    for i in range(6, -1, -1):
-        fecha = datetime.utcnow() - timedelta(days=i)
-        dia_stmt = select(func.count(Participacion.id_participacion)).where(func.date(Participacion.fecha_participacion) == fecha.date())
-        dia_res = await db.execute(dia_stmt)
-        count = dia_res.scalar() or 0
+    for fecha in dias:
         dia_nombre = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"][fecha.weekday()]
-        respuestas_dia.append({"fecha": dia_nombre, "respuestas": count})
+        respuestas_dia.append({"fecha": dia_nombre, "respuestas": por_fecha.get(fecha, 0)})
 
     return {
-        "respuestasPorEncuesta": [{"encuesta": r.encuesta, "respuestas": r.respuestas} for r in respuestas_encuesta],
+        "respuestasPorEncuesta": [{"encuesta": r.titulo, "respuestas": r.respuestas} for r in respuestas_encuesta],
         "distribucionDemografica": distribucion_demografica,
         "respuestasPorDia": respuestas_dia,
     }
 
 @router.get("/participaciones")
+@presupuesto_consultas(2)
 async def get_participaciones_recientes(
     limit: int = 10,
     db: AsyncSession = Depends(get_db),
@@ -148,6 +151,7 @@ async def get_participaciones_recientes(
     ]
 
 @router.get("/export-data")
+@presupuesto_consultas(5)
 async def get_export_data(
     db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(admin_required)
@@ -1,7 +1,7 @@
 # 🔧 SOLUCIÓN ACTUALIZADA PARA TU ERROR
 
 # app/routers/encuestas_router.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
@@ -13,6 +13,9 @@ from app.database import get_db
 from app.models.encuesta import Encuesta
 from app.models.pregunta import Pregunta
 from app.models.opcion import Opcion
+from app.services.definiciones_encuesta_service import definiciones_encuesta_service
+from app.utils.paginacion import Paginacion, paginacion
+from app.utils.presupuesto_consultas import presupuesto_consultas
 
 router = APIRouter(prefix="/encuestas", tags=["Encuestas"])
 
@@ -84,6 +87,7 @@ async def crear_encuesta(data: CrearEncuestaSchema, db: AsyncSession = Depends(g
     
     
 @router.get("/activas")
+@presupuesto_consultas(1)
 async def obtener_encuestas_activas(db: AsyncSession = Depends(get_db)):
     try:
         result = await db.execute(select(Encuesta).where(Encuesta.estado == True))
@@ -106,52 +110,48 @@ async def obtener_encuestas_activas(db: AsyncSession = Depends(get_db)):
 
 #Ruta para que al responder me traigan todo
 @router.get("/{encuesta_id}", response_model=dict)
-async def obtener_encuesta_completa(encuesta_id: int, db: AsyncSession = Depends(get_db)):
+@presupuesto_consultas(2)
+async def obtener_encuesta_completa(
+    encuesta_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Devuelve la encuesta con sus preguntas y opciones.
+
+    La definición se cachea en cada worker por (id_encuesta, version) y se sirve
+    con un ETag fuerte; si el cliente envía If-None-Match con ese ETag se responde 304.
+    """
     try:
-        query_encuesta = await db.execute(
-            select(Encuesta).where(Encuesta.id_encuesta == encuesta_id)
-        )
-        encuesta = query_encuesta.scalar_one_or_none()
-        if not encuesta:
+        definicion = await definiciones_encuesta_service.obtener(db, encuesta_id)
+        if not definicion:
             raise HTTPException(status_code=404, detail="Encuesta no encontrada")
 
-        query_preguntas = await db.execute(
-            select(Pregunta).where(Pregunta.id_encuesta == encuesta_id)
-        )
-        preguntas = query_preguntas.scalars().all()
-
-        preguntas_con_opciones = []
-        for p in preguntas:
-            query_opciones = await db.execute(
-                select(Opcion).where(Opcion.id_pregunta == p.id_pregunta)
-            )
-            opciones = query_opciones.scalars().all()
-            preguntas_con_opciones.append({
-                "id_pregunta": p.id_pregunta,
-                "texto": p.texto,
-                "tipo": p.tipo,
-                "orden": p.orden,
-                "opciones": [{"id_opcion": o.id_opcion, "texto_opcion": o.texto_opcion} for o in opciones]
-            })
+        headers = {"ETag": definicion.etag, "Cache-Control": "no-cache"}
+        if definicion.coincide_etag(if_none_match):
+            return Response(status_code=304, headers=headers)
 
-        return {
-            "id_encuesta": encuesta.id_encuesta,
-            "titulo": encuesta.titulo,
-            "descripcion": encuesta.descripcion,
-            "fecha_inicio": encuesta.fecha_inicio,
-            "fecha_fin": encuesta.fecha_fin,
-            "tiempo_estimado": encuesta.tiempo_estimado,
-            "preguntas": preguntas_con_opciones
-        }
+        return Response(content=definicion.contenido, media_type="application/json", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 # Endpoint para obtener TODAS las encuestas (para el administrador)
 @router.get("/")
-async def obtener_todas_encuestas(db: AsyncSession = Depends(get_db)):
+@presupuesto_consultas(1)
+async def obtener_todas_encuestas(
+    response: Response,
+    pagina: Paginacion = Depends(paginacion),
+    db: AsyncSession = Depends(get_db)
+):
     try:
-        result = await db.execute(select(Encuesta).order_by(Encuesta.fecha_creacion.desc()))
-        encuestas = result.scalars().all()
+        result = await db.execute(
+            pagina.aplicar(select(Encuesta), Encuesta.fecha_creacion, Encuesta.id_encuesta)
+        )
+        encuestas = pagina.cerrar(
+            result.scalars().all(), response, lambda e: (e.fecha_creacion, e.id_encuesta)
+        )
         return [
             {
                 "id_encuesta": e.id_encuesta,
@@ -168,6 +168,8 @@ async def obtener_todas_encuestas(db: AsyncSession = Depends(get_db)):
             }
             for e in encuestas
         ]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo encuestas: {str(e)}")
 
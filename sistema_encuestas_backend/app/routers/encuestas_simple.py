@@ -2,7 +2,8 @@
 """
 Router de encuestas simplificado compatible con la BD actual
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from typing import List, Optional
@@ -11,8 +12,11 @@ from pydantic import BaseModel
 
 from app.database import get_db
 from app.middleware.auth_middleware import get_current_user
+from app.utils.logs import campos
+from app.utils.paginacion import ENCABEZADO_CURSOR, codificar_cursor, decodificar_cursor
 
 router = APIRouter(prefix="/api/encuestas", tags=["Encuestas"])
+logger = logging.getLogger(__name__)
 
 # Esquemas simplificados
 class EncuestaSimple(BaseModel):
@@ -42,55 +46,61 @@ class ParticipacionRequest(BaseModel):
 
 @router.get("/", response_model=List[EncuestaSimple])
 async def obtener_encuestas_disponibles(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
     limit: int = Query(20, ge=1, le=100),
     db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """Obtener encuestas disponibles para el usuario actual"""
+    """Obtener encuestas disponibles para el usuario actual, paginadas por cursor (X-Next-Cursor)"""
+    # Página siguiente a la última encuesta entregada (keyset en lugar de OFFSET)
+    desde_cursor = ""
+    parametros = {"limit": limit + 1, "user_id": current_user.id_usuario}
+    if cursor:
+        fecha_cursor, id_cursor = decodificar_cursor(cursor, (datetime, int))
+        parametros["id_cursor"] = id_cursor
+        if fecha_cursor is None:
+            desde_cursor = "AND ((e.fecha_creacion IS NULL AND e.id_encuesta < :id_cursor) OR e.fecha_creacion IS NOT NULL)"
+        else:
+            desde_cursor = "AND (e.fecha_creacion, e.id_encuesta) < (:fecha_cursor, :id_cursor)"
+            parametros["fecha_cursor"] = fecha_cursor
+
     try:
-        print(f"🔍 Obteniendo encuestas para usuario ID: {current_user.id_usuario}")
+        logger.debug("Obteniendo encuestas", extra=campos(id_usuario=current_user.id_usuario))
         
-        # Consulta básica para obtener encuestas activas
+        # Encuestas activas con su cantidad de preguntas y si el usuario ya participó,
+        # en una sola consulta (antes se consultaba la participación por cada encuesta)
         result = await db.execute(text("""
             SELECT e.id_encuesta, e.titulo, e.descripcion, e.tiempo_estimado,
                    e.imagen, e.fecha_inicio, e.fecha_fin, e.estado,
                    e.puntos_otorga, e.fecha_creacion,
-                   COUNT(p.id_pregunta) as total_preguntas,
-                   COUNT(part.id_participacion) as participaciones_actuales
+                   (SELECT COUNT(*) FROM preguntas p WHERE p.id_encuesta = e.id_encuesta) as total_preguntas,
+                   EXISTS (
+                       SELECT 1 FROM participaciones part
+                       WHERE part.id_encuesta = e.id_encuesta
+                           AND part.id_usuario = :user_id
+                           AND part.completada = true
+                   ) as ya_participada
             FROM encuestas e
-            LEFT JOIN preguntas p ON e.id_encuesta = p.id_encuesta
-            LEFT JOIN participaciones part ON e.id_encuesta = part.id_encuesta 
-                AND part.completada = true
             WHERE e.estado = true
                 AND (e.fecha_inicio IS NULL OR e.fecha_inicio <= CURRENT_DATE)
                 AND (e.fecha_fin IS NULL OR e.fecha_fin >= CURRENT_DATE)
-            GROUP BY e.id_encuesta, e.titulo, e.descripcion, e.tiempo_estimado,
-                     e.imagen, e.fecha_inicio, e.fecha_fin, e.estado,
-                     e.puntos_otorga, e.fecha_creacion
-            ORDER BY e.fecha_creacion DESC
-            LIMIT :limit OFFSET :skip
-        """), {"limit": limit, "skip": skip})
+                {desde_cursor}
+            ORDER BY e.fecha_creacion DESC, e.id_encuesta DESC
+            LIMIT :limit
+        """.format(desde_cursor=desde_cursor)), parametros)
         
         encuestas_raw = result.fetchall()
-        print(f"✅ Encontradas {len(encuestas_raw)} encuestas")
+        if len(encuestas_raw) > limit:
+            encuestas_raw = encuestas_raw[:limit]
+            ultima = encuestas_raw[-1]
+            response.headers[ENCABEZADO_CURSOR] = codificar_cursor((ultima[9], ultima[0]))
+        logger.debug("Encuestas encontradas", extra=campos(cantidad=len(encuestas_raw)))
         
         encuestas_response = []
         
         for encuesta_row in encuestas_raw:
-            # Verificar si el usuario ya participó
-            participacion_result = await db.execute(text("""
-                SELECT COUNT(*) 
-                FROM participaciones 
-                WHERE id_usuario = :user_id 
-                    AND id_encuesta = :encuesta_id 
-                    AND completada = true
-            """), {
-                "user_id": current_user.id_usuario,
-                "encuesta_id": encuesta_row[0]
-            })
-            
-            ya_participada = (participacion_result.scalar() or 0) > 0
+            ya_participada = bool(encuesta_row[11])
             
             # Determinar si puede participar
             puede_participar = (
@@ -117,13 +127,11 @@ async def obtener_encuestas_disponibles(
             
             encuestas_response.append(encuesta)
         
-        print(f"📊 Retornando {len(encuestas_response)} encuestas")
+        logger.debug("Retornando encuestas", extra=campos(cantidad=len(encuestas_response)))
         return encuestas_response
         
-    except Exception as e:
-        print(f"❌ Error obteniendo encuestas: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error obteniendo encuestas")
         raise HTTPException(
             status_code=500,
             detail="Error obteniendo encuestas disponibles"
@@ -197,8 +205,8 @@ async def obtener_encuesta_detalle(
         
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"❌ Error obteniendo detalle: {e}")
+    except Exception:
+        logger.exception("Error obteniendo detalle")
         raise HTTPException(
             status_code=500,
             detail="Error obteniendo detalle de encuesta"
@@ -282,9 +290,9 @@ async def participar_en_encuesta(
         
     except HTTPException:
         raise
-    except Exception as e:
+    except Exception:
         await db.rollback()
-        print(f"❌ Error en participación: {e}")
+        logger.exception("Error en participación")
         raise HTTPException(
             status_code=500,
             detail="Error al iniciar participación"
@@ -338,8 +346,8 @@ async def obtener_mis_participaciones(
         
         return participaciones_response
         
-    except Exception as e:
-        print(f"❌ Error obteniendo participaciones: {e}")
+    except Exception:
+        logger.exception("Error obteniendo participaciones")
         raise HTTPException(
             status_code=500,
             detail="Error obteniendo historial de participaciones"
@@ -0,0 +1,46 @@
+# app/routers/metricas_router.py
+from fastapi import APIRouter, Depends
+
+from app.database import obtener_metricas_pool
+from app.middleware.auth_middleware import get_admin_user, UsuarioAutenticado
+from app.middleware.rate_limiter import rate_limiter
+from app.services.canje_service import canje_service
+from app.services.configuracion_service import configuracion_service
+from app.services.definiciones_encuesta_service import definiciones_encuesta_service
+from app.services.email_outbox_service import email_outbox_service
+from app.services.password_service import password_service
+from app.services.puntos_service import puntos_service
+from app.utils import logs
+from app.utils.presupuesto_consultas import presupuesto_consultas
+
+router = APIRouter(prefix="/admin/metricas", tags=["Métricas"])
+
+
+@router.get("/")
+@presupuesto_consultas(1)
+async def obtener_metricas(admin: UsuarioAutenticado = Depends(get_admin_user)):
+    """
+    Métricas internas del worker que atiende la petición.
+    Con varios workers de uvicorn cada uno reporta sus propios valores.
+    """
+    return {
+        "password_hash": password_service.obtener_metricas(),
+        "cache_encuestas": definiciones_encuesta_service.obtener_metricas(),
+        "configuracion": configuracion_service.obtener_metricas(),
+        "canjes": canje_service.obtener_metricas(),
+        "puntos": puntos_service.obtener_metricas(),
+        "email_outbox": email_outbox_service.obtener_metricas(),
+        "pool_db": obtener_metricas_pool(),
+        "rate_limit": rate_limiter.obtener_metricas(),
+        "logs": logs.obtener_metricas(),
+    }
+
+
+@router.get("/db")
+@presupuesto_consultas(1)
+async def obtener_metricas_db(admin: UsuarioAutenticado = Depends(get_admin_user)):
+    """
+    Estado del pool de conexiones de este worker: conexiones en uso, overflow,
+    espera para obtener una conexión y timeouts acumulados.
+    """
+    return obtener_metricas_pool()
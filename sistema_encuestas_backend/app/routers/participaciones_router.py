@@ -1,7 +1,8 @@
 # app/routers/participaciones_router.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.database import get_db
 from app.models.participacion import Participacion
 from app.models.encuesta import Encuesta
@@ -9,10 +10,15 @@ from app.models.pregunta import Pregunta
 from app.models.opcion import Opcion
 from app.models.respuesta import Respuesta
 from app.models.usuario import Usuario
+from app.services.stats_service import stats_service
+from app.utils.paginacion import Paginacion, paginacion
+from app.utils.presupuesto_consultas import presupuesto_consultas
+from datetime import datetime
 
 router = APIRouter(prefix="/participaciones", tags=["Participaciones"])
 
 @router.get("/{id_participacion}/detalle")
+@presupuesto_consultas(2)
 async def detalle_participacion(id_participacion: int, db: AsyncSession = Depends(get_db)):
     # 1. Buscar la participación con encuesta
     participacion_query = (
@@ -70,11 +76,15 @@ async def detalle_participacion(id_participacion: int, db: AsyncSession = Depend
     }
 
 @router.get("/participaciones/{id_usuario}")
-async def obtener_participaciones(id_usuario: int, db: AsyncSession = Depends(get_db)):
-    from sqlalchemy import select
-    from app.models.encuesta import Encuesta
-
-    query = (
+@presupuesto_consultas(1)
+async def obtener_participaciones(
+    id_usuario: int,
+    response: Response,
+    pagina: Paginacion = Depends(paginacion),
+    db: AsyncSession = Depends(get_db)
+):
+    """Participaciones del usuario, paginadas por cursor (X-Next-Cursor)"""
+    query = pagina.aplicar(
         select(
             Participacion.id_participacion,
             Participacion.fecha_participacion,
@@ -84,12 +94,15 @@ async def obtener_participaciones(id_usuario: int, db: AsyncSession = Depends(ge
             Encuesta.titulo
         )
         .join(Encuesta, Encuesta.id_encuesta == Participacion.id_encuesta)
-        .where(Participacion.id_usuario == id_usuario)
-        .order_by(Participacion.fecha_participacion.desc())
+        .where(Participacion.id_usuario == id_usuario),
+        Participacion.fecha_participacion,
+        Participacion.id_participacion
     )
 
     result = await db.execute(query)
-    participaciones = result.fetchall()
+    participaciones = pagina.cerrar(
+        result.fetchall(), response, lambda r: (r.fecha_participacion, r.id_participacion)
+    )
 
     return [
         {
@@ -113,21 +126,36 @@ async def completar_participacion(
 ):
     """Marcar una participación como completada y otorgar puntos"""
     try:
-        # Crear la participación
-        participacion = Participacion(
-            id_usuario=id_usuario,
-            id_encuesta=id_encuesta,
-            puntaje_obtenido=puntaje_obtenido,
-            tiempo_respuesta_segundos=tiempo_respuesta_segundos
+        # Crear la participación; el índice único (id_usuario, id_encuesta) descarta los duplicados
+        fecha_participacion = datetime.now()
+        id_participacion = await db.scalar(
+            pg_insert(Participacion)
+            .values(
+                id_usuario=id_usuario,
+                id_encuesta=id_encuesta,
+                fecha_participacion=fecha_participacion,
+                puntaje_obtenido=puntaje_obtenido,
+                tiempo_respuesta_segundos=tiempo_respuesta_segundos
+            )
+            .on_conflict_do_nothing(index_elements=["id_usuario", "id_encuesta"])
+            .returning(Participacion.id_participacion)
+        )
+        if id_participacion is None:
+            raise HTTPException(status_code=400, detail="Ya has respondido esta encuesta")
+
+        await stats_service.registrar_participacion(
+            db, fecha_participacion, id_encuesta, 0, tiempo_respuesta_segundos
         )
-        db.add(participacion)
         await db.commit()
         
         return {
-            "id_participacion": participacion.id_participacion,
+            "id_participacion": id_participacion,
             "mensaje": "Participación completada exitosamente"
         }
         
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al completar participación: {str(e)}")
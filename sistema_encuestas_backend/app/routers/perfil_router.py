@@ -6,8 +6,15 @@ from app.database import get_db
 from app.models.usuario import Usuario
 from app.models.participacion import Participacion
 from app.models.encuesta import Encuesta
-from app.middleware.auth_middleware import get_current_user
+from app.models.movimiento_puntos import TipoMovimiento
+from app.middleware.auth_middleware import (
+    get_current_user, get_current_user_db, invalidar_usuario_cache, UsuarioAutenticado
+)
 from app.services.configuracion_service import configuracion_service
+from app.services.puntos_service import puntos_service
+from app.services.stats_service import stats_service
+from app.utils.logs import campos
+from app.utils.presupuesto_consultas import presupuesto_consultas
 from pydantic import BaseModel
 from datetime import datetime, date
 from typing import Optional
@@ -43,9 +50,10 @@ class ActualizarPerfilResponse(BaseModel):
     perfil_completo: bool
 
 @router.get("/estado")
+@presupuesto_consultas(1)
 async def verificar_estado_perfil(
     db: AsyncSession = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     """
     Verifica si el usuario tiene su perfil completo.
@@ -88,7 +96,7 @@ async def verificar_estado_perfil(
         )
         
     except Exception as e:
-        logger.error(f"Error verificando estado de perfil: {e}")
+        logger.error("Error verificando estado de perfil", extra=campos(error=str(e)))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al verificar el estado del perfil"
@@ -98,7 +106,7 @@ async def verificar_estado_perfil(
 async def completar_perfil(
     datos: ActualizarPerfilRequest,
     db: AsyncSession = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
+    current_user: Usuario = Depends(get_current_user_db)
 ):
     """
     Completa el perfil del usuario por primera vez.
@@ -125,10 +133,8 @@ async def completar_perfil(
         # Si es la primera vez, otorgar puntos según configuración
         if es_primera_vez:
             puntos_otorgados = await configuracion_service.obtener_puntos_completar_perfil(db)
-            print(f"🎁 Otorgando {puntos_otorgados} puntos por completar perfil")
-            current_user.puntos_totales += puntos_otorgados
-            current_user.puntos_disponibles += puntos_otorgados
-            
+            logger.info("Puntos por completar perfil", extra=campos(id_usuario=current_user.id_usuario, puntos=puntos_otorgados))
+
             # Crear una "participación" especial para la encuesta de perfil
             # Primero verificar si existe una encuesta de perfil
             query = await db.execute(
@@ -159,9 +165,20 @@ async def completar_perfil(
                 tiempo_respuesta_segundos=0
             )
             db.add(participacion)
+            await db.flush()
+            if puntos_otorgados:
+                # El índice único del bono impide acreditarlo dos veces al mismo usuario
+                await puntos_service.registrar_movimiento(
+                    db, current_user.id_usuario, TipoMovimiento.PERFIL_COMPLETO, puntos_otorgados,
+                    id_participacion=participacion.id_participacion
+                )
+            await stats_service.registrar_participacion(
+                db, participacion.fecha_participacion, encuesta_perfil.id_encuesta, 0, 0
+            )
         
         # Guardar cambios
         await db.commit()
+        invalidar_usuario_cache(current_user.id_usuario)
         
         return ActualizarPerfilResponse(
             mensaje="¡Perfil completado exitosamente!" if es_primera_vez else "Perfil actualizado",
@@ -174,7 +191,7 @@ async def completar_perfil(
         raise
     except Exception as e:
         await db.rollback()
-        logger.error(f"Error completando perfil: {e}")
+        logger.error("Error completando perfil", extra=campos(error=str(e)))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al completar el perfil"
@@ -184,7 +201,7 @@ async def completar_perfil(
 async def actualizar_perfil(
     datos: ActualizarPerfilRequest,
     db: AsyncSession = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
+    current_user: Usuario = Depends(get_current_user_db)
 ):
     """
     Actualiza el perfil del usuario (sin otorgar puntos adicionales).
@@ -197,6 +214,7 @@ async def actualizar_perfil(
         current_user.localizacion = datos.localizacion
         
         await db.commit()
+        invalidar_usuario_cache(current_user.id_usuario)
         
         return {
             "mensaje": "Perfil actualizado correctamente",
@@ -205,7 +223,7 @@ async def actualizar_perfil(
         
     except Exception as e:
         await db.rollback()
-        logger.error(f"Error actualizando perfil: {e}")
+        logger.error("Error actualizando perfil", extra=campos(error=str(e)))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al actualizar el perfil"
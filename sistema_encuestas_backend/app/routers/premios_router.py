@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.database import get_db
@@ -9,115 +10,193 @@ from app.schemas.premio_schema import (
     PremioListSchema, 
     CanjeCreateSchema, 
     CanjeResponseSchema,
-    CanjeListSchema
+    CanjeListSchema,
+    TipoPremioEnum
+)
+from typing import List, Optional
+from app.middleware.auth_middleware import (
+    get_current_user, get_current_user_opcional, invalidar_usuario_cache, UsuarioAutenticado
 )
-from typing import List
-from app.middleware.auth_middleware import get_current_user
 from app.middleware.verification_middleware import get_current_user_verified
+from app.middleware.rate_limiter import limite_por_usuario, REGLA_CANJES
 from datetime import datetime
 from app.models.premio import TipoPremio, EstadoPremio
+from app.services.canje_service import canje_service
+from app.utils.paginacion import Paginacion, paginacion
+from app.utils.presupuesto_consultas import presupuesto_consultas
 
 router = APIRouter(prefix="/premios", tags=["Premios y Canjes"])
 
-@router.get("/", response_model=List[PremioListSchema])
-async def listar_premios(db: AsyncSession = Depends(get_db)):
-    """Lista todos los premios disponibles"""
-    # Filtrar solo premios activos
-    query = select(Premio).where(Premio.activo == True)
-    result = await db.execute(query)
-    premios = result.scalars().all()
-    
-    premios_lista = []
-    for p in premios:
-        premio_dict = {
-            "id_premio": p.id_premio,
-            "nombre": p.nombre,
-            "descripcion": p.descripcion,
-            "imagen_url": p.imagen_url,
-            "costo_puntos": p.costo_puntos,
-            "stock_disponible": p.stock_disponible,
-            "tipo": p.tipo.value if hasattr(p.tipo, 'value') else p.tipo,
-            "categoria": p.categoria,
-            "estado": p.estado.value if hasattr(p.estado, 'value') else p.estado,
-            "esta_disponible": p.esta_disponible(),
-            "total_canjes": 0
+# Órdenes del catálogo; id_premio desempata para que las páginas sean estables
+ORDENES_CATALOGO = {
+    "costo": (Premio.costo_puntos.asc(), Premio.id_premio.asc()),
+    "-costo": (Premio.costo_puntos.desc(), Premio.id_premio.desc()),
+    "populares": (Premio.total_canjes.desc(), Premio.id_premio.asc()),
+    "recientes": (Premio.id_premio.desc(),),
+    "nombre": (Premio.nombre.asc(), Premio.id_premio.asc()),
+}
+
+
+
+async def _catalogo(
+    db: AsyncSession,
+    response: Response,
+    *,
+    solo_activos: bool,
+    categoria: Optional[str],
+    tipo: Optional[TipoPremioEnum],
+    costo_min: Optional[int],
+    costo_max: Optional[int],
+    solo_disponibles: bool,
+    id_usuario_alcanzable: Optional[int],
+    orden: str,
+    limite: int,
+    offset: int
+) -> List[dict]:
+    """
+    Una página del catálogo filtrada y ordenada en la base, con el total de
+    premios que cumplen los filtros en el encabezado X-Total-Count.
+    """
+    if costo_min is not None and costo_max is not None and costo_max < costo_min:
+        raise HTTPException(status_code=400, detail="costo_max debe ser mayor o igual que costo_min")
+
+    condiciones = []
+    if solo_activos:
+        condiciones.append(Premio.activo == True)
+    if categoria is not None:
+        condiciones.append(Premio.categoria == categoria)
+    if tipo is not None:
+        condiciones.append(Premio.tipo == TipoPremio(tipo.value))
+    if costo_min is not None:
+        condiciones.append(Premio.costo_puntos >= costo_min)
+    if costo_max is not None:
+        condiciones.append(Premio.costo_puntos <= costo_max)
+    if solo_disponibles:
+        condiciones.append(Premio.condicion_disponible())
+    if id_usuario_alcanzable is not None:
+        # Saldo leído en la misma consulta (el usuario cacheado puede tener unos segundos)
+        condiciones.append(
+            Premio.costo_puntos <= select(func.coalesce(Usuario.puntos_disponibles, 0))
+            .where(Usuario.id_usuario == id_usuario_alcanzable)
+            .scalar_subquery()
+        )
+
+    query = await db.execute(
+        select(
+            Premio.id_premio,
+            Premio.nombre,
+            Premio.descripcion,
+            Premio.imagen_url,
+            Premio.costo_puntos,
+            Premio.stock_disponible,
+            Premio.tipo,
+            Premio.categoria,
+            Premio.estado,
+            Premio.total_canjes,
+            Premio.condicion_disponible().label("esta_disponible"),
+            func.count().over().label("total")
+        )
+        .where(*condiciones)
+        .order_by(*ORDENES_CATALOGO[orden])
+        .offset(offset)
+        .limit(limite)
+    )
+    filas = query.all()
+
+    if filas:
+        total = filas[0].total
+    elif offset > 0:
+        # Página vacía más allá del final: el total sale de otra consulta
+        total = await db.scalar(select(func.count(Premio.id_premio)).where(*condiciones))
+    else:
+        total = 0
+    response.headers["X-Total-Count"] = str(total)
+
+    return [
+        {
+            "id_premio": f.id_premio,
+            "nombre": f.nombre,
+            "descripcion": f.descripcion,
+            "imagen_url": f.imagen_url,
+            "costo_puntos": f.costo_puntos,
+            "stock_disponible": f.stock_disponible,
+            "tipo": f.tipo.value,
+            "categoria": f.categoria,
+            "estado": f.estado.value if f.estado is not None else None,
+            "esta_disponible": bool(f.esta_disponible),
+            "total_canjes": f.total_canjes
         }
-        premios_lista.append(PremioListSchema(**premio_dict))
-    
-    return premios_lista
+        for f in filas
+    ]
+
+
+@router.get("/", response_model=List[PremioListSchema])
+@presupuesto_consultas(3)
+async def listar_premios(
+    response: Response,
+    categoria: Optional[str] = Query(None, max_length=100),
+    tipo: Optional[TipoPremioEnum] = None,
+    costo_min: Optional[int] = Query(None, ge=0),
+    costo_max: Optional[int] = Query(None, ge=0),
+    solo_disponibles: bool = False,
+    solo_alcanzables: bool = Query(False, description="Solo premios que el usuario autenticado puede pagar"),
+    orden: str = Query("costo", pattern="^(costo|-costo|populares|recientes|nombre)$"),
+    limite: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+    usuario: Optional[UsuarioAutenticado] = Depends(get_current_user_opcional)
+):
+    """
+    Lista los premios activos, filtrados, ordenados y paginados en la base.
+    El total de premios que cumplen los filtros va en el encabezado X-Total-Count.
+    """
+    if solo_alcanzables and usuario is None:
+        raise HTTPException(status_code=401, detail="solo_alcanzables requiere iniciar sesión")
+
+    return await _catalogo(
+        db, response,
+        solo_activos=True,
+        categoria=categoria,
+        tipo=tipo,
+        costo_min=costo_min,
+        costo_max=costo_max,
+        solo_disponibles=solo_disponibles,
+        id_usuario_alcanzable=usuario.id_usuario if solo_alcanzables else None,
+        orden=orden,
+        limite=limite,
+        offset=offset
+    )
 
 @router.post("/canjear", response_model=CanjeResponseSchema)
 async def canjear_premio(
     canje_data: CanjeCreateSchema,
     db: AsyncSession = Depends(get_db),
-    current_user: dict = Depends(get_current_user_verified)  # 🔐 Requiere usuario verificado
+    current_user: dict = Depends(limite_por_usuario(REGLA_CANJES, get_current_user_verified))  # 🔐 Requiere usuario verificado
 ):
     """
     Canjea un premio por puntos.
     
     ⚠️ Requiere que el usuario tenga el email verificado.
+    Puntos, stock y canje se registran en una sola transacción (ver canje_service).
     """
     usuario_id = current_user.get("usuario_id")
     
-    # Obtener usuario
-    query = await db.execute(select(Usuario).where(Usuario.id_usuario == usuario_id))
-    usuario = query.scalars().first()
-    
-    if not usuario:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    
-    # Verificar premio
-    query = await db.execute(select(Premio).where(Premio.id_premio == canje_data.id_premio))
-    premio = query.scalars().first()
-    
-    if not premio:
-        raise HTTPException(status_code=404, detail="Premio no encontrado")
-    
-    # Validaciones del premio
-    if premio.estado != "disponible":
-        raise HTTPException(status_code=400, detail="El premio no está disponible")
-    
-    if premio.stock_disponible is not None and premio.stock_disponible <= 0:
-        raise HTTPException(status_code=400, detail="El premio está agotado")
-    
-    # Verificar puntos del usuario
-    if not usuario.puede_canjear(premio.costo_puntos):
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Puntos insuficientes. Necesitas {premio.costo_puntos} puntos, pero tienes {usuario.puntos_disponibles}"
-        )
-    
-    # Crear el canje
-    nuevo_canje = Canje(
+    nuevo_canje = await canje_service.canjear(
+        db,
         id_usuario=usuario_id,
-        id_premio=premio.id_premio,
-        puntos_utilizados=premio.costo_puntos,
-        estado="solicitado",
+        id_premio=canje_data.id_premio,
         direccion_entrega=canje_data.direccion_entrega,
         telefono_contacto=canje_data.telefono_contacto,
-        observaciones_usuario=canje_data.observaciones_usuario,
-        requiere_recogida=premio.tipo == "fisico"
+        observaciones_usuario=canje_data.observaciones_usuario
     )
-    
-    # Descontar puntos al usuario
-    if not usuario.descontar_puntos(premio.costo_puntos):
-        raise HTTPException(status_code=400, detail="Error al descontar puntos")
-    
-    # Descontar stock si aplica
-    if premio.stock_disponible is not None:
-        premio.stock_disponible -= 1
-    
-    # Guardar en base de datos
-    db.add(nuevo_canje)
-    await db.commit()
-    await db.refresh(nuevo_canje)
+    invalidar_usuario_cache(usuario_id)
     
     return CanjeResponseSchema(
         id_canje=nuevo_canje.id_canje,
         id_usuario=nuevo_canje.id_usuario,
         id_premio=nuevo_canje.id_premio,
         puntos_utilizados=nuevo_canje.puntos_utilizados,
-        estado=nuevo_canje.estado,
+        estado=nuevo_canje.estado.value,
         fecha_solicitud=nuevo_canje.fecha_solicitud,
         fecha_aprobacion=nuevo_canje.fecha_aprobacion,
         fecha_entrega=nuevo_canje.fecha_entrega,
@@ -125,21 +204,29 @@ async def canjear_premio(
     )
 
 @router.get("/canjes", response_model=List[CanjeListSchema])
+@presupuesto_consultas(2)
 async def historial_canjes(
+    response: Response,
+    pagina: Paginacion = Depends(paginacion),
     db: AsyncSession = Depends(get_db), 
     usuario: Usuario = Depends(get_current_user)
 ):
-    """Obtiene el historial de canjes del usuario autenticado"""
+    """Obtiene el historial de canjes del usuario autenticado, paginado por cursor (X-Next-Cursor)"""
     usuario_id = usuario.id_usuario
     
     # Consultar canjes del usuario con información del premio
     query = await db.execute(
-        select(Canje, Premio)
-        .join(Premio, Canje.id_premio == Premio.id_premio)
-        .where(Canje.id_usuario == usuario_id)
-        .order_by(Canje.fecha_solicitud.desc())
+        pagina.aplicar(
+            select(Canje, Premio)
+            .join(Premio, Canje.id_premio == Premio.id_premio)
+            .where(Canje.id_usuario == usuario_id),
+            Canje.fecha_solicitud,
+            Canje.id_canje
+        )
+    )
+    results = pagina.cerrar(
+        query.all(), response, lambda fila: (fila.Canje.fecha_solicitud, fila.Canje.id_canje)
     )
-    results = query.all()
     
     canjes_lista = []
     for canje, premio in results:
@@ -156,6 +243,7 @@ async def historial_canjes(
     return canjes_lista
 
 @router.get("/verificar-disponibilidad/{premio_id}")
+@presupuesto_consultas(2)
 async def verificar_disponibilidad_premio(
     premio_id: int,
     db: AsyncSession = Depends(get_db),
@@ -178,54 +266,47 @@ async def verificar_disponibilidad_premio(
     if not premio:
         raise HTTPException(status_code=404, detail="Premio no encontrado")
     
-    puede_canjear = (
-        premio.estado == "disponible" and
-        (premio.stock_disponible is None or premio.stock_disponible > 0) and
-        usuario.puede_canjear(premio.costo_puntos)
-    )
+    premio_disponible = premio.esta_disponible()
+    puede_canjear = premio_disponible and usuario.puede_canjear(premio.costo_puntos)
     
     return {
         "puede_canjear": puede_canjear,
         "puntos_usuario": usuario.puntos_disponibles,
         "puntos_requeridos": premio.costo_puntos,
         "stock_disponible": premio.stock_disponible,
-        "premio_disponible": premio.estado == "disponible"
+        "premio_disponible": premio_disponible
     } 
 
 # Endpoint para obtener todos los premios (admin)
 @router.get("/admin", response_model=List[PremioListSchema])
+@presupuesto_consultas(3)
 async def listar_todos_premios(
+    response: Response,
+    categoria: Optional[str] = Query(None, max_length=100),
+    tipo: Optional[TipoPremioEnum] = None,
+    costo_min: Optional[int] = Query(None, ge=0),
+    costo_max: Optional[int] = Query(None, ge=0),
+    solo_disponibles: bool = False,
+    orden: str = Query("recientes", pattern="^(costo|-costo|populares|recientes|nombre)$"),
+    limite: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)  # Requiere autenticación
 ):
-    """Lista TODOS los premios, activos e inactivos (para admin)"""
-    query = select(Premio)
-    result = await db.execute(query)
-    premios = result.scalars().all()
-    
-    premios_lista = []
-    for p in premios:
-        premio_dict = {
-            "id_premio": p.id_premio,
-            "nombre": p.nombre,
-            "descripcion": p.descripcion,
-            "imagen_url": p.imagen_url,
-            "costo_puntos": p.costo_puntos,
-            "stock_disponible": p.stock_disponible,
-            "stock_original": p.stock_original,
-            "tipo": p.tipo.value if hasattr(p.tipo, 'value') else p.tipo,
-            "categoria": p.categoria,
-            "estado": p.estado.value if hasattr(p.estado, 'value') else p.estado,
-            "activo": p.activo,
-            "requiere_aprobacion": p.requiere_aprobacion,
-            "instrucciones_canje": p.instrucciones_canje,
-            "terminos_condiciones": p.terminos_condiciones,
-            "esta_disponible": p.esta_disponible(),
-            "total_canjes": 0
-        }
-        premios_lista.append(PremioListSchema(**premio_dict))
-    
-    return premios_lista
+    """Lista TODOS los premios, activos e inactivos (para admin), con los mismos filtros que el catálogo"""
+    return await _catalogo(
+        db, response,
+        solo_activos=False,
+        categoria=categoria,
+        tipo=tipo,
+        costo_min=costo_min,
+        costo_max=costo_max,
+        solo_disponibles=solo_disponibles,
+        id_usuario_alcanzable=None,
+        orden=orden,
+        limite=limite,
+        offset=offset
+    )
 
 # Endpoint para crear un premio
 @router.post("/", response_model=dict)
@@ -337,6 +418,7 @@ async def eliminar_premio(
 
 # Endpoint para obtener un premio específico
 @router.get("/{premio_id}")
+@presupuesto_consultas(1)
 async def obtener_premio(
     premio_id: int,
     db: AsyncSession = Depends(get_db)
@@ -364,6 +446,7 @@ async def obtener_premio(
         "instrucciones_canje": premio.instrucciones_canje,
         "terminos_condiciones": premio.terminos_condiciones,
         "esta_disponible": premio.esta_disponible(),
+        "total_canjes": premio.total_canjes,
         "fecha_creacion": premio.fecha_creacion,
         "fecha_actualizacion": premio.fecha_actualizacion
     } 
\ No newline at end of file
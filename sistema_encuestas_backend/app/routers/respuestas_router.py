@@ -1,20 +1,22 @@
 # app/routers/respuestas_router.py
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
 
 from app.database import get_db
-from app.models.respuesta import Respuesta
-from app.models.participacion import Participacion
-from app.models.pregunta import Pregunta
-from app.models.usuario import Usuario
-from app.models.encuesta import Encuesta
-from app.middleware.auth_middleware import get_current_user
+from app.middleware.auth_middleware import get_current_user, invalidar_usuario_cache, UsuarioAutenticado
+from app.middleware.rate_limiter import limite_por_usuario, REGLA_RESPUESTAS
+from app.services.definiciones_encuesta_service import definiciones_encuesta_service
+from app.services.respuestas_service import respuestas_service
+from app.utils.logs import campos
+from app.utils.paginacion import Paginacion, paginacion
+from app.utils.presupuesto_consultas import presupuesto_consultas
 from sqlalchemy import select
 
 router = APIRouter(prefix="/respuestas", tags=["Respuestas"])
+logger = logging.getLogger(__name__)
 
 class RespuestaSchema(BaseModel):
     id_pregunta: int    
@@ -31,7 +33,7 @@ class RespuestasEnvio(BaseModel):
 async def guardar_respuestas(
     data: RespuestasEnvio, 
     db: AsyncSession = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)  # ✅ Cambiado a Usuario
+    current_user: UsuarioAutenticado = Depends(limite_por_usuario(REGLA_RESPUESTAS))
 ):
     """
     Guarda las respuestas de una encuesta.
@@ -39,65 +41,30 @@ async def guardar_respuestas(
     ✅ No requiere verificación de email.
     """
     try:
-        print(f"📝 Recibiendo respuestas para encuesta {data.id_encuesta}")
-        print(f"👤 Usuario: {current_user.email}")
-        print(f"📊 Datos recibidos: {data}")
-        
-        # ✅ current_user ya es un objeto Usuario, no un diccionario
-        usuario_id = current_user.id_usuario
-        
-        # Obtener el usuario (ya lo tenemos, pero verificamos)
-        usuario = current_user
-        
-        # Verificar que la encuesta existe
-        encuesta = await db.get(Encuesta, data.id_encuesta)
-        if not encuesta:
-            raise HTTPException(status_code=404, detail="Encuesta no encontrada")
-
-        # Verificar si el usuario ya participó
-        query_participacion = select(Participacion).where(
-            Participacion.id_usuario == usuario.id_usuario,
-            Participacion.id_encuesta == data.id_encuesta
+        logger.debug(
+            "Recibiendo respuestas",
+            extra=campos(id_encuesta=data.id_encuesta, id_usuario=current_user.id_usuario, respuestas=len(data.respuestas))
         )
-        result = await db.execute(query_participacion)
-        participacion_existente = result.scalar_one_or_none()
         
-        if participacion_existente:
-            raise HTTPException(status_code=400, detail="Ya has respondido esta encuesta")
+        # ✅ Definición cacheada por versión en lugar de leer la encuesta en cada envío
+        definicion = await definiciones_encuesta_service.obtener(db, data.id_encuesta)
+        if not definicion:
+            raise HTTPException(status_code=404, detail="Encuesta no encontrada")
 
-        # Crear la participación
-        nueva_participacion = Participacion(
-            id_usuario=usuario.id_usuario,
-            id_encuesta=data.id_encuesta,
-            fecha_participacion=datetime.now(),
-            puntaje_obtenido=encuesta.puntos_otorga,  # Dar los puntos de la encuesta
-            tiempo_respuesta_segundos=data.tiempo_total or 0
+        # ✅ Participación, respuestas y puntos en un número fijo de sentencias
+        resultado = await respuestas_service.registrar_respuestas(
+            db,
+            id_usuario=current_user.id_usuario,
+            definicion=definicion,
+            respuestas=[r.dict() for r in data.respuestas],
+            tiempo_total=data.tiempo_total
         )
-        db.add(nueva_participacion)
-        await db.flush()  # Para obtener el ID de la participación
-
-        # Guardar cada respuesta con el id_participacion
-        for r in data.respuestas:
-            nueva_respuesta = Respuesta(
-                id_pregunta=r.id_pregunta,
-                id_usuario=usuario.id_usuario,
-                id_participacion=nueva_participacion.id_participacion,  # ✅ Agregar id_participacion
-                id_opcion=r.id_opcion,
-                respuesta_texto=r.respuesta_texto,
-                fecha_respuesta=datetime.now()
-            )
-            db.add(nueva_respuesta)
-
-        # Agregar puntos al usuario manualmente
-        usuario.puntos_totales += encuesta.puntos_otorga
-        usuario.puntos_disponibles += encuesta.puntos_otorga
-
-        await db.commit()
+        invalidar_usuario_cache(current_user.id_usuario)
         
         return {
             "mensaje": "Respuestas registradas correctamente",
-            "puntos_obtenidos": encuesta.puntos_otorga,
-            "puntos_totales": usuario.puntos_totales
+            "puntos_obtenidos": resultado["puntos_obtenidos"],
+            "puntos_totales": resultado["puntos_totales"]
         }
         
     except HTTPException:
@@ -105,17 +72,21 @@ async def guardar_respuestas(
         raise
     except Exception as e:
         await db.rollback()
-        print(f"Error en guardar_respuestas: {e}")
+        logger.exception("Error en guardar_respuestas", extra=campos(id_encuesta=data.id_encuesta))
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
 @router.get("/historial/{id_usuario}")
+@presupuesto_consultas(2)
 async def obtener_historial(
     id_usuario: int, 
+    response: Response,
+    pagina: Paginacion = Depends(paginacion),
     db: AsyncSession = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)  # ✅ Cambiado a Usuario
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     """
-    Obtiene el historial de respuestas del usuario.
+    Obtiene el historial de respuestas del usuario, paginado por cursor
+    (X-Next-Cursor), de la encuesta respondida más recientemente a la más antigua.
     
     ✅ No requiere verificación de email.
     """
@@ -124,46 +95,62 @@ async def obtener_historial(
     if current_user.id_usuario != id_usuario and user_rol != 1:
         raise HTTPException(status_code=403, detail="No tienes permiso para ver este historial")
     
-    from sqlalchemy import select, func
+    from sqlalchemy import exists, func
     from app.models.encuesta import Encuesta
-    from app.models.pregunta import Pregunta
+    from app.models.participacion import Participacion
     from app.models.respuesta import Respuesta
 
-    query = (
+    # Una participación por encuesta respondida: se pagina por el índice del
+    # usuario y las respuestas se cuentan solo para las filas de la página
+    cantidad_respuestas = (
+        select(func.count(Respuesta.id_respuesta))
+        .where(Respuesta.id_participacion == Participacion.id_participacion)
+        .scalar_subquery()
+    )
+    query = pagina.aplicar(
         select(
+            Participacion.id_participacion,
             Encuesta.id_encuesta,
             Encuesta.titulo,
-            func.min(Respuesta.fecha_respuesta).label("fecha_primera_respuesta"),
-            func.count(Respuesta.id_respuesta).label("cantidad_respuestas")
+            Participacion.fecha_participacion,
+            cantidad_respuestas.label("cantidad_respuestas")
         )
-        .join(Pregunta, Encuesta.id_encuesta == Pregunta.id_encuesta)
-        .join(Respuesta, Pregunta.id_pregunta == Respuesta.id_pregunta)
-        .where(Respuesta.id_usuario == id_usuario)
-        .group_by(Encuesta.id_encuesta, Encuesta.titulo)
-        .order_by(func.min(Respuesta.fecha_respuesta).desc())
+        .join(Encuesta, Encuesta.id_encuesta == Participacion.id_encuesta)
+        .where(
+            Participacion.id_usuario == id_usuario,
+            exists().where(Respuesta.id_participacion == Participacion.id_participacion)
+        ),
+        Participacion.fecha_participacion,
+        Participacion.id_participacion
     )
 
     result = await db.execute(query)
-    historial = result.fetchall()
+    historial = pagina.cerrar(
+        result.fetchall(), response, lambda r: (r.fecha_participacion, r.id_participacion)
+    )
 
     return [
         {
             "id_encuesta": r.id_encuesta,
             "titulo": r.titulo,
-            "fecha_respuesta": r.fecha_primera_respuesta,
+            "fecha_respuesta": r.fecha_participacion,
             "cantidad_respuestas": r.cantidad_respuestas,
         }
         for r in historial
     ]
 
 @router.get("/participaciones/{id_usuario}")
+@presupuesto_consultas(2)
 async def obtener_participaciones_detalladas(
     id_usuario: int, 
+    response: Response,
+    pagina: Paginacion = Depends(paginacion),
     db: AsyncSession = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)  # ✅ Cambiado a Usuario
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     """
-    Obtiene las participaciones detalladas del usuario.
+    Obtiene las participaciones detalladas del usuario, paginadas por cursor
+    (X-Next-Cursor).
     
     ✅ No requiere verificación de email.
     """
@@ -172,11 +159,10 @@ async def obtener_participaciones_detalladas(
     if current_user.id_usuario != id_usuario and user_rol != 1:
         raise HTTPException(status_code=403, detail="No tienes permiso para ver estas participaciones")
     
-    from sqlalchemy import select
     from app.models.encuesta import Encuesta
     from app.models.participacion import Participacion
 
-    query = (
+    query = pagina.aplicar(
         select(
             Participacion.id_participacion,
             Participacion.id_encuesta,
@@ -186,12 +172,15 @@ async def obtener_participaciones_detalladas(
             Participacion.tiempo_respuesta_segundos
         )
         .join(Encuesta, Encuesta.id_encuesta == Participacion.id_encuesta)
-        .where(Participacion.id_usuario == id_usuario)
-        .order_by(Participacion.fecha_participacion.desc())
+        .where(Participacion.id_usuario == id_usuario),
+        Participacion.fecha_participacion,
+        Participacion.id_participacion
     )
 
     result = await db.execute(query)
-    participaciones = result.fetchall()
+    participaciones = pagina.cerrar(
+        result.fetchall(), response, lambda p: (p.fecha_participacion, p.id_participacion)
+    )
 
     return [
         {
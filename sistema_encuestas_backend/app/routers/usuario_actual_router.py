@@ -3,17 +3,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models.usuario import Usuario
 from app.schemas.usuario_actual_schema import UsuarioResponseActual
-from app.middleware.auth_middleware import get_current_user
+from app.middleware.auth_middleware import (
+    get_current_user, get_current_user_db, invalidar_usuario_cache, UsuarioAutenticado
+)
 from pydantic import BaseModel, validator
 from typing import Optional
-from passlib.context import CryptContext
+from app.services.password_service import password_service
+from app.utils.presupuesto_consultas import presupuesto_consultas
 import re
 
 router = APIRouter(prefix="/usuario", tags=["Usuario Actual"])
 
-# Contexto de encriptación para contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class UsuarioUpdateSchema(BaseModel):
     nombre: Optional[str] = None
     apellido: Optional[str] = None
@@ -47,7 +47,8 @@ class CambiarContrasenaSchema(BaseModel):
         return v
 
 @router.get("/me", response_model=UsuarioResponseActual)
-async def obtener_mis_datos(db: AsyncSession = Depends(get_db), usuario: Usuario = Depends(get_current_user)):
+@presupuesto_consultas(1)
+async def obtener_mis_datos(db: AsyncSession = Depends(get_db), usuario: UsuarioAutenticado = Depends(get_current_user)):
     """Obtiene los datos del usuario autenticado"""
     return UsuarioResponseActual.from_orm(usuario)
 
@@ -55,7 +56,7 @@ async def obtener_mis_datos(db: AsyncSession = Depends(get_db), usuario: Usuario
 async def actualizar_mis_datos(
     datos: UsuarioUpdateSchema, 
     db: AsyncSession = Depends(get_db), 
-    usuario: Usuario = Depends(get_current_user)
+    usuario: Usuario = Depends(get_current_user_db)
 ):
     """Actualiza los datos del usuario autenticado"""
     # Actualizar solo los campos proporcionados
@@ -63,12 +64,18 @@ async def actualizar_mis_datos(
         setattr(usuario, campo, valor)
     
     await db.commit()
+    invalidar_usuario_cache(usuario.id_usuario)
     await db.refresh(usuario)
     return UsuarioResponseActual.from_orm(usuario)
 
 @router.get("/me/puntos", response_model=PuntosResponseSchema)
-async def obtener_mis_puntos(usuario: Usuario = Depends(get_current_user)):
-    """Obtiene el resumen de puntos del usuario"""
+@presupuesto_consultas(1)
+async def obtener_mis_puntos(usuario: UsuarioAutenticado = Depends(get_current_user)):
+    """
+    Obtiene el resumen de puntos del usuario. Sale del saldo en caché
+    (usuarios.puntos_*, agregado de movimientos_puntos) del usuario ya
+    autenticado, sin sumar el libro.
+    """
     return PuntosResponseSchema(
         puntos_totales=getattr(usuario, 'puntos_totales', 0),
         puntos_disponibles=getattr(usuario, 'puntos_disponibles', 0),
@@ -79,7 +86,7 @@ async def obtener_mis_puntos(usuario: Usuario = Depends(get_current_user)):
 async def cambiar_contrasena(
     datos: CambiarContrasenaSchema,
     db: AsyncSession = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
+    current_user: Usuario = Depends(get_current_user_db)
 ):
     """
     Cambia la contraseña del usuario actual
@@ -90,24 +97,26 @@ async def cambiar_contrasena(
         current_password_hash = getattr(current_user, 'password_hash', '')
         
         # Verificar que la contraseña actual sea correcta
-        if not pwd_context.verify(datos.contrasena_actual, current_password_hash):
+        if not await password_service.verify(datos.contrasena_actual, current_password_hash):
             raise HTTPException(
                 status_code=400,
                 detail="La contraseña actual es incorrecta"
             )
         
         # Verificar que la nueva contraseña sea diferente a la actual
-        if pwd_context.verify(datos.nueva_contrasena, current_password_hash):
+        # (la actual ya fue verificada contra el hash, basta con compararlas)
+        if datos.nueva_contrasena == datos.contrasena_actual:
             raise HTTPException(
                 status_code=400,
                 detail="La nueva contraseña debe ser diferente a la actual"
             )
         
         # Actualizar la contraseña
-        setattr(current_user, 'password_hash', pwd_context.hash(datos.nueva_contrasena))
+        setattr(current_user, 'password_hash', await password_service.hash(datos.nueva_contrasena))
         
         # Guardar cambios
         await db.commit()
+        invalidar_usuario_cache(current_user.id_usuario)
         
         return {
             "mensaje": "Contraseña actualizada exitosamente",
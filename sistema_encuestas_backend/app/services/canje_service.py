@@ -0,0 +1,168 @@
+# app/services/canje_service.py
+import logging
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import case, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.canje import Canje, EstadoCanje
+from app.models.movimiento_puntos import TipoMovimiento
+from app.models.premio import EstadoPremio, Premio, TipoPremio
+from app.models.usuario import Usuario
+from app.services.puntos_service import puntos_service
+
+logger = logging.getLogger(__name__)
+
+
+class CanjeService:
+    """
+    Canje de premios en una sola transacción, sin leer-modificar-escribir en Python.
+
+    Los puntos (débito en movimientos_puntos, ver PuntosService) y el stock
+    se descuentan con UPDATE condicionales (puntos_disponibles >= costo,
+    stock_disponible > 0): si dos canjes compiten por la última unidad,
+    PostgreSQL reevalúa la condición del segundo después de que el primero
+    confirma y no actualiza nada. Las filas se bloquean
+    siempre en el mismo orden, primero el usuario y después el premio, y el
+    premio (la fila más disputada) queda bloqueado lo menos posible.
+    """
+
+    def __init__(self):
+        self.resultados = Counter()
+
+    async def canjear(
+        self,
+        db: AsyncSession,
+        id_usuario: int,
+        id_premio: int,
+        direccion_entrega: Optional[str] = None,
+        telefono_contacto: Optional[str] = None,
+        observaciones_usuario: Optional[str] = None
+    ) -> Canje:
+        """
+        Descuenta los puntos, descuenta el stock (el premio pasa a AGOTADO con
+        la última unidad) y registra el canje. Lanza HTTPException si no se
+        puede canjear; en ese caso no queda ningún cambio.
+        """
+        # 1. Costo y tipo del premio (lectura sin bloqueo). Si ya está agotado se
+        # responde sin tocar al usuario; si no, decide el UPDATE del paso 3
+        premio = (await db.execute(
+            select(
+                Premio.costo_puntos, Premio.tipo, Premio.stock_disponible, Premio.activo, Premio.estado
+            ).where(Premio.id_premio == id_premio)
+        )).first()
+        if premio is None:
+            self.resultados["premio_inexistente"] += 1
+            raise HTTPException(status_code=404, detail="Premio no encontrado")
+        error = self._error_disponibilidad(premio)
+        if error is not None:
+            await db.rollback()
+            raise error
+        costo = premio.costo_puntos
+
+        try:
+            # 2. Débito en el libro de puntos, solo si le alcanzan. El id del canje
+            # se reserva aquí para que el movimiento lo referencie
+            debito = await puntos_service.registrar_movimiento(
+                db, id_usuario, TipoMovimiento.CANJE, -costo,
+                id_canje=func.nextval(func.pg_get_serial_sequence("canjes", "id_canje"))
+            )
+            if debito is None:
+                await db.rollback()
+                raise await self._error_usuario(db, id_usuario, costo)
+
+            # 3. Stock del premio, solo si sigue disponible y con el mismo costo
+            stock_restante = await db.execute(
+                update(Premio)
+                .where(
+                    Premio.id_premio == id_premio,
+                    Premio.costo_puntos == costo,
+                    Premio.condicion_disponible()
+                )
+                .values(
+                    # NULL (sin límite) sigue siendo NULL
+                    stock_disponible=Premio.stock_disponible - 1,
+                    estado=case(
+                        (Premio.stock_disponible == 1, literal(EstadoPremio.AGOTADO, Premio.estado.type)),
+                        else_=Premio.estado
+                    ),
+                )
+                .returning(Premio.stock_disponible)
+                .execution_options(synchronize_session=False)
+            )
+            if stock_restante.first() is None:
+                await db.rollback()
+                raise await self._error_premio(db, id_premio, costo)
+
+            # 4. Registro del canje (el trigger de canjes suma premios.total_canjes)
+            canje = Canje(
+                id_canje=debito.id_canje,
+                id_usuario=id_usuario,
+                id_premio=id_premio,
+                puntos_utilizados=costo,
+                estado=EstadoCanje.SOLICITADO,
+                direccion_entrega=direccion_entrega,
+                telefono_contacto=telefono_contacto,
+                observaciones_usuario=observaciones_usuario,
+                requiere_recogida=premio.tipo == TipoPremio.FISICO
+            )
+            db.add(canje)
+            await db.commit()
+        except HTTPException:
+            raise
+        except Exception:
+            await db.rollback()
+            self.resultados["error"] += 1
+            raise
+
+        self.resultados["canjeado"] += 1
+        logger.debug(
+            "Canje registrado: canje=%s usuario=%s premio=%s puntos=%s",
+            canje.id_canje, id_usuario, id_premio, costo
+        )
+        return canje
+
+    async def _error_usuario(self, db: AsyncSession, id_usuario: int, costo: int) -> HTTPException:
+        usuario = (await db.execute(
+            select(Usuario.puntos_disponibles).where(Usuario.id_usuario == id_usuario)
+        )).first()
+        if usuario is None:
+            self.resultados["usuario_inexistente"] += 1
+            return HTTPException(status_code=404, detail="Usuario no encontrado")
+        self.resultados["puntos_insuficientes"] += 1
+        return HTTPException(
+            status_code=400,
+            detail=f"Puntos insuficientes. Necesitas {costo} puntos, pero tienes {usuario.puntos_disponibles or 0}"
+        )
+
+    def _error_disponibilidad(self, premio) -> Optional[HTTPException]:
+        """Motivo por el que el premio no se puede canjear, o None (mismo criterio que Premio.esta_disponible)"""
+        if premio.stock_disponible is not None and premio.stock_disponible <= 0:
+            self.resultados["agotado"] += 1
+            return HTTPException(status_code=400, detail="El premio está agotado")
+        if not premio.activo or premio.estado != EstadoPremio.DISPONIBLE:
+            self.resultados["no_disponible"] += 1
+            return HTTPException(status_code=400, detail="El premio no está disponible")
+        return None
+
+    async def _error_premio(self, db: AsyncSession, id_premio: int, costo: int) -> HTTPException:
+        premio = await db.get(Premio, id_premio)
+        if premio is None:
+            self.resultados["premio_inexistente"] += 1
+            return HTTPException(status_code=404, detail="Premio no encontrado")
+        error = self._error_disponibilidad(premio)
+        if error is not None:
+            return error
+        # Un administrador cambió el costo entre la lectura y el descuento
+        self.resultados["costo_modificado"] += 1
+        return HTTPException(status_code=409, detail="El costo del premio cambió, volvé a intentarlo")
+
+    def obtener_metricas(self) -> Dict[str, Any]:
+        """Canjes registrados y rechazados por motivo en este worker"""
+        return dict(self.resultados)
+
+
+# Instancia global del servicio
+canje_service = CanjeService()
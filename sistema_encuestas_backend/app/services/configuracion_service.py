@@ -1,122 +1,347 @@
 # app/services/configuracion_service.py
+import asyncio
+import logging
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Optional
+
+import asyncpg
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+
+from app.config import settings
 from app.models.configuracion import Configuracion
-from typing import Optional, Dict, Any
-import logging
+from app.utils.logs import campos
 
 logger = logging.getLogger(__name__)
 
+# Canal que notifica el trigger de add_version_configuraciones.sql
+CANAL_CONFIGURACION = "configuracion_actualizada"
+
+CAMPOS_ACTIVOS_DEFECTO = {
+    "fecha_nacimiento": True,
+    "sexo": True,
+    "localizacion": True
+}
+VALORES_DEFECTO = {
+    "opciones_sexo": ["M", "F", "Otro", "Prefiero no decir"]
+}
+
+
+def _congelar(valor: Any) -> Any:
+    """Copia de solo lectura: dict -> MappingProxyType y list -> tuple"""
+    if isinstance(valor, dict):
+        return MappingProxyType({k: _congelar(v) for k, v in valor.items()})
+    if isinstance(valor, (list, tuple)):
+        return tuple(_congelar(v) for v in valor)
+    return valor
+
+
+def _descongelar(valor: Any) -> Any:
+    if isinstance(valor, MappingProxyType):
+        return {k: _descongelar(v) for k, v in valor.items()}
+    if isinstance(valor, tuple):
+        return [_descongelar(v) for v in valor]
+    return valor
+
+
+class ConfiguracionVigente:
+    """
+    Copia inmutable de la configuración activa en una versión concreta.
+    Se comparte entre todas las peticiones del worker; si la configuración
+    cambia se arma otra y esta se descarta.
+    """
+
+    __slots__ = (
+        "version", "id_configuracion", "campos_activos",
+        "puntos_completar_perfil", "puntos_registro_inicial", "valores_defecto",
+    )
+
+    def __init__(self, configuracion: Configuracion):
+        asignar = super().__setattr__
+        asignar("version", configuracion.version)
+        asignar("id_configuracion", configuracion.id_configuracion)
+        asignar("campos_activos", _congelar(configuracion.campos_activos or CAMPOS_ACTIVOS_DEFECTO))
+        asignar("puntos_completar_perfil", configuracion.puntos_completar_perfil)
+        asignar("puntos_registro_inicial", configuracion.puntos_registro_inicial)
+        asignar("valores_defecto", _congelar(configuracion.valores_defecto or VALORES_DEFECTO))
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("ConfiguracionVigente es de solo lectura")
+
+    def __repr__(self):
+        return f"<ConfiguracionVigente(version={self.version}, puntos_perfil={self.puntos_completar_perfil}, puntos_registro={self.puntos_registro_inicial})>"
+
+    def to_dict(self):
+        """Convierte la configuración a diccionario (copia modificable)"""
+        return {
+            "campos_activos": _descongelar(self.campos_activos),
+            "puntos_completar_perfil": self.puntos_completar_perfil,
+            "puntos_registro_inicial": self.puntos_registro_inicial,
+            "valores_defecto": _descongelar(self.valores_defecto)
+        }
+
+
 class ConfiguracionService:
-    """Servicio para manejar la configuración del sistema"""
-    
-    @staticmethod
-    async def obtener_configuracion_activa(db: AsyncSession) -> Optional[Configuracion]:
+    """
+    Servicio para manejar la configuración del sistema.
+
+    Cada worker guarda la configuración activa en memoria y la devuelve sin
+    consultar la base. Un cambio (desde cualquier worker o por SQL directo)
+    llega por LISTEN/NOTIFY y descarta la copia; además, cada
+    `revalidar_segundos` se compara la versión guardada con la de la base, por
+    si se perdió un aviso o no hay conexión de escucha.
+    """
+
+    def __init__(self, revalidar_segundos: float, escuchar: bool):
+        self.revalidar_segundos = revalidar_segundos
+        self.escuchar = escuchar
+        self._vigente: Optional[ConfiguracionVigente] = None
+        self._revalidada_en = 0.0
+        self._invalidada = True
+        # Cambia con cada aviso: una recarga que empezó antes no guarda su resultado
+        self._generacion = 0
+        # Mayor versión recibida por aviso
+        self._version_avisada = 0
+        self._conexion: Optional[asyncpg.Connection] = None
+        self._tarea_reconexion: Optional[asyncio.Task] = None
+        self._detenido = False
+        self.aciertos = 0
+        self.recargas = 0
+        self.avisos = 0
+
+    # --- Lectura ---
+
+    def _es_valida(self) -> bool:
+        return (
+            self._vigente is not None
+            and not self._invalidada
+            and time.monotonic() - self._revalidada_en < self.revalidar_segundos
+        )
+
+    def _guardar(self, vigente: ConfiguracionVigente, generacion: Optional[int] = None) -> None:
+        """
+        Guarda la copia salvo que haya llegado un aviso después de empezar a
+        leerla (generacion) o, sin generación, un aviso de una versión más nueva
+        """
+        if generacion is not None:
+            if generacion != self._generacion:
+                return
+        elif vigente.version < self._version_avisada:
+            return
+        self._vigente = vigente
+        self._invalidada = False
+        self._revalidada_en = time.monotonic()
+
+    def invalidar(self) -> None:
+        """Descarta la copia en memoria; la próxima lectura vuelve a la base"""
+        self._generacion += 1
+        self._invalidada = True
+
+    async def obtener_configuracion_activa(self, db: AsyncSession) -> Optional[ConfiguracionVigente]:
         """Obtiene la configuración activa del sistema"""
+        if self._es_valida():
+            self.aciertos += 1
+            return self._vigente
         try:
-            query = select(Configuracion).where(Configuracion.activa == True)
-            result = await db.execute(query)
-            configuracion = result.scalar_one_or_none()
-            
-            if not configuracion:
-                logger.info("No se encontró configuración activa, creando configuración por defecto")
-                configuracion = await ConfiguracionService.crear_configuracion_por_defecto(db)
-            
-            return configuracion
-        except Exception as e:
-            logger.error(f"Error obteniendo configuración: {e}")
-            return None
-    
-    @staticmethod
-    async def crear_configuracion_por_defecto(db: AsyncSession) -> Configuracion:
+            return await self._recargar(db)
+        except Exception:
+            logger.exception("Error obteniendo configuración")
+            # Mejor la última versión conocida que ninguna
+            return self._vigente
+
+    async def _recargar(self, db: AsyncSession) -> ConfiguracionVigente:
+        generacion = self._generacion
+        vigente = self._vigente
+
+        if vigente is not None and not self._invalidada:
+            # Venció el plazo sin avisos: basta con comparar la versión
+            version = await db.scalar(
+                select(Configuracion.version)
+                .where(Configuracion.activa == True)
+                .order_by(Configuracion.id_configuracion.desc())
+                .limit(1)
+            )
+            if version == vigente.version:
+                self._guardar(vigente, generacion)
+                return vigente
+
+        result = await db.execute(
+            select(Configuracion)
+            .where(Configuracion.activa == True)
+            .order_by(Configuracion.id_configuracion.desc())
+            .limit(1)
+        )
+        configuracion = result.scalar_one_or_none()
+
+        if not configuracion:
+            logger.info("No se encontró configuración activa, creando configuración por defecto")
+            configuracion = await self.crear_configuracion_por_defecto(db)
+
+        vigente = ConfiguracionVigente(configuracion)
+        self.recargas += 1
+        self._guardar(vigente, generacion)
+        logger.debug("Configuración cargada (versión %s)", vigente.version)
+        return vigente
+
+    async def crear_configuracion_por_defecto(self, db: AsyncSession) -> Configuracion:
         """Crea una configuración por defecto"""
         configuracion = Configuracion(
-            campos_activos={
-                "fecha_nacimiento": True,
-                "sexo": True,
-                "localizacion": True
-            },
+            campos_activos=dict(CAMPOS_ACTIVOS_DEFECTO),
             puntos_completar_perfil=5,
             puntos_registro_inicial=0,
-            valores_defecto={
-                "opciones_sexo": ["M", "F", "Otro", "Prefiero no decir"]
-            },
+            valores_defecto={k: list(v) for k, v in VALORES_DEFECTO.items()},
             activa=True
         )
-        
+
         db.add(configuracion)
         await db.commit()
         await db.refresh(configuracion)
-        
+
         logger.info("Configuración por defecto creada")
         return configuracion
-    
-    @staticmethod
+
     async def actualizar_configuracion(
-        db: AsyncSession, 
+        self,
+        db: AsyncSession,
         datos: Dict[str, Any]
-    ) -> Optional[Configuracion]:
-        """Actualiza la configuración del sistema"""
+    ) -> Optional[ConfiguracionVigente]:
+        """
+        Actualiza la configuración del sistema. Desactivar la anterior y crear la
+        nueva ocurre en una sola transacción; el resto de los workers se entera
+        por el aviso que envía el trigger al confirmar.
+        """
         try:
-            # Desactivar configuración anterior
-            query = select(Configuracion).where(Configuracion.activa == True)
-            result = await db.execute(query)
-            config_anterior = result.scalar_one_or_none()
-            
-            if config_anterior:
-                config_anterior.activa = False
-                await db.commit()
-            
-            # Crear nueva configuración
+            await db.execute(
+                update(Configuracion)
+                .where(Configuracion.activa == True)
+                .values(activa=False)
+            )
+
             nueva_config = Configuracion(
-                campos_activos=datos.get("campos_activos", {
-                    "fecha_nacimiento": True,
-                    "sexo": True,
-                    "localizacion": True
-                }),
+                campos_activos=datos.get("campos_activos", dict(CAMPOS_ACTIVOS_DEFECTO)),
                 puntos_completar_perfil=datos.get("puntos_completar_perfil", 5),
                 puntos_registro_inicial=datos.get("puntos_registro_inicial", 0),
-                valores_defecto=datos.get("valores_defecto", {
-                    "opciones_sexo": ["M", "F", "Otro", "Prefiero no decir"]
-                }),
+                valores_defecto=datos.get("valores_defecto", {k: list(v) for k, v in VALORES_DEFECTO.items()}),
                 activa=True
             )
-            
+
             db.add(nueva_config)
             await db.commit()
             await db.refresh(nueva_config)
-            
-            logger.info(f"Configuración actualizada: puntos_perfil={nueva_config.puntos_completar_perfil}, puntos_registro={nueva_config.puntos_registro_inicial}")
-            return nueva_config
-            
-        except Exception as e:
-            logger.error(f"Error actualizando configuración: {e}")
+
+            vigente = ConfiguracionVigente(nueva_config)
+            # Este worker no espera su propio aviso (los avisos de la transacción
+            # pueden llegar antes que el refresh y se descartan por versión)
+            self._guardar(vigente)
+            logger.info(
+                "Configuración actualizada",
+                extra=campos(
+                    version=vigente.version,
+                    puntos_perfil=vigente.puntos_completar_perfil,
+                    puntos_registro=vigente.puntos_registro_inicial,
+                ),
+            )
+            return vigente
+
+        except Exception:
+            logger.exception("Error actualizando configuración")
             await db.rollback()
             return None
-    
-    @staticmethod
-    async def obtener_puntos_registro_inicial(db: AsyncSession) -> int:
+
+    async def obtener_puntos_registro_inicial(self, db: AsyncSession) -> int:
         """Obtiene los puntos que se otorgan al registrarse"""
-        try:
-            configuracion = await ConfiguracionService.obtener_configuracion_activa(db)
-            if configuracion:
-                return configuracion.puntos_registro_inicial
-            return 0
-        except Exception as e:
-            logger.error(f"Error obteniendo puntos de registro inicial: {e}")
-            return 0
-    
-    @staticmethod
-    async def obtener_puntos_completar_perfil(db: AsyncSession) -> int:
+        configuracion = await self.obtener_configuracion_activa(db)
+        if configuracion:
+            return configuracion.puntos_registro_inicial
+        return 0
+
+    async def obtener_puntos_completar_perfil(self, db: AsyncSession) -> int:
         """Obtiene los puntos que se otorgan por completar el perfil"""
+        configuracion = await self.obtener_configuracion_activa(db)
+        if configuracion:
+            return configuracion.puntos_completar_perfil
+        return 5
+
+    # --- Avisos entre workers (LISTEN/NOTIFY) ---
+
+    def _al_recibir_aviso(self, conexion, pid, canal, payload) -> None:
+        self.avisos += 1
+        if payload.isdigit():
+            self._version_avisada = max(self._version_avisada, int(payload))
+        vigente = self._vigente
+        # El payload es la versión de la fila modificada. Una versión que no es
+        # más nueva que la guardada (por ejemplo, la fila que este worker acaba
+        # de desactivar) no cambia nada
+        if vigente is not None and payload.isdigit() and int(payload) <= vigente.version:
+            return
+        self.invalidar()
+
+    def _al_cerrarse_conexion(self, conexion) -> None:
+        self._conexion = None
+        if self._detenido:
+            return
+        logger.warning("Se perdió la conexión LISTEN de configuración; reconectando")
+        # Pudo haber cambios sin aviso mientras no se escuchaba
+        self.invalidar()
+        self._programar_reconexion()
+
+    async def _conectar(self) -> None:
+        conexion = await asyncpg.connect(settings.database_url)
+        conexion.add_termination_listener(self._al_cerrarse_conexion)
+        await conexion.add_listener(CANAL_CONFIGURACION, self._al_recibir_aviso)
+        self._conexion = conexion
+        self.invalidar()
+
+    def _programar_reconexion(self) -> None:
+        if self._tarea_reconexion is None or self._tarea_reconexion.done():
+            self._tarea_reconexion = asyncio.create_task(self._reconectar())
+
+    async def _reconectar(self) -> None:
+        espera = 1.0
+        while not self._detenido and self._conexion is None:
+            await asyncio.sleep(espera)
+            try:
+                await self._conectar()
+                logger.info("Conexión LISTEN de configuración restablecida")
+            except Exception as e:
+                logger.warning("No se pudo reconectar LISTEN de configuración: %s", e)
+                espera = min(espera * 2, 30.0)
+
+    async def iniciar_escucha(self) -> None:
+        """Abre una conexión dedicada (fuera del pool) que escucha los cambios de configuración"""
+        if not self.escuchar:
+            return
+        self._detenido = False
         try:
-            configuracion = await ConfiguracionService.obtener_configuracion_activa(db)
-            if configuracion:
-                return configuracion.puntos_completar_perfil
-            return 5
+            await self._conectar()
         except Exception as e:
-            logger.error(f"Error obteniendo puntos por completar perfil: {e}")
-            return 5
+            # Sin escucha se sigue revalidando por tiempo
+            logger.warning("No se pudo iniciar LISTEN de configuración: %s", e)
+            self._programar_reconexion()
+
+    async def detener_escucha(self) -> None:
+        self._detenido = True
+        if self._tarea_reconexion is not None:
+            self._tarea_reconexion.cancel()
+            self._tarea_reconexion = None
+        conexion, self._conexion = self._conexion, None
+        if conexion is not None and not conexion.is_closed():
+            await conexion.close()
+
+    def obtener_metricas(self) -> Dict[str, Any]:
+        """Versión en memoria y lecturas resueltas sin consultar la base en este worker"""
+        return {
+            "version": self._vigente.version if self._vigente is not None else None,
+            "aciertos": self.aciertos,
+            "recargas": self.recargas,
+            "avisos": self.avisos,
+            "escuchando": self._conexion is not None,
+        }
 
 # Instancia global del servicio
-configuracion_service = ConfiguracionService() 
\ No newline at end of file
+configuracion_service = ConfiguracionService(
+    revalidar_segundos=settings.configuracion_revalidar_segundos,
+    escuchar=settings.configuracion_listen,
+)
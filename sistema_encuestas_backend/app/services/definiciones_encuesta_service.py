@@ -0,0 +1,149 @@
+# app/services/definiciones_encuesta_service.py
+import hashlib
+import json
+import logging
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from app.config import settings
+from app.models.encuesta import Encuesta
+from app.models.pregunta import Pregunta
+from app.utils.cache import CacheTTL
+from app.utils.logs import campos
+
+logger = logging.getLogger(__name__)
+
+
+class DefinicionEncuesta:
+    """
+    Definición de una encuesta (preguntas y opciones) en una versión concreta.
+    Es inmutable: si la encuesta cambia, cambia su versión y se arma otra.
+    """
+
+    def __init__(self, encuesta: Encuesta):
+        self.id_encuesta = encuesta.id_encuesta
+        self.version = encuesta.version
+        self.puntos_otorga = encuesta.puntos_otorga or 0
+
+        preguntas = sorted(encuesta.preguntas, key=lambda p: (p.orden is None, p.orden, p.id_pregunta))
+        # id_pregunta -> ids de sus opciones, para validar los envíos sin ir a la base
+        self.opciones_por_pregunta: Dict[int, FrozenSet[int]] = {
+            p.id_pregunta: frozenset(o.id_opcion for o in p.opciones) for p in preguntas
+        }
+
+        cuerpo = {
+            "id_encuesta": encuesta.id_encuesta,
+            "titulo": encuesta.titulo,
+            "descripcion": encuesta.descripcion,
+            "fecha_inicio": encuesta.fecha_inicio,
+            "fecha_fin": encuesta.fecha_fin,
+            "tiempo_estimado": encuesta.tiempo_estimado,
+            "preguntas": [
+                {
+                    "id_pregunta": p.id_pregunta,
+                    "texto": p.texto,
+                    "tipo": p.tipo,
+                    "orden": p.orden,
+                    "opciones": [
+                        {"id_opcion": o.id_opcion, "texto_opcion": o.texto_opcion}
+                        for o in sorted(p.opciones, key=lambda o: o.id_opcion)
+                    ]
+                }
+                for p in preguntas
+            ]
+        }
+        # Se serializa una sola vez; todas las peticiones reciben los mismos bytes
+        self.contenido: bytes = json.dumps(
+            jsonable_encoder(cuerpo), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        self.etag = f'"{hashlib.sha1(self.contenido).hexdigest()}"'
+
+    def coincide_etag(self, if_none_match: Optional[str]) -> bool:
+        """True si el encabezado If-None-Match incluye el ETag actual"""
+        if not if_none_match:
+            return False
+        etiquetas = [e.strip() for e in if_none_match.split(",")]
+        # If-None-Match usa comparación débil: W/"x" equivale a "x"
+        return "*" in etiquetas or any(e.removeprefix("W/") == self.etag for e in etiquetas)
+
+    def validar_respuestas(self, respuestas: List[Dict[str, Any]]) -> None:
+        """Rechaza preguntas que no son de la encuesta u opciones que no son de la pregunta"""
+        for r in respuestas:
+            opciones = self.opciones_por_pregunta.get(r["id_pregunta"])
+            if opciones is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"La pregunta {r['id_pregunta']} no pertenece a la encuesta"
+                )
+            if r.get("id_opcion") is not None and r["id_opcion"] not in opciones:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"La opción {r['id_opcion']} no pertenece a la pregunta {r['id_pregunta']}"
+                )
+
+
+class DefinicionesEncuestaService:
+    """Caché por worker de las definiciones de encuestas, con clave (id_encuesta, version)"""
+
+    def __init__(self, max_entradas: int, ttl_segundos: float):
+        self.cache = CacheTTL(max_entradas=max_entradas, ttl_segundos=ttl_segundos)
+
+    @staticmethod
+    def consulta_definicion(id_encuesta: int):
+        """Encuesta con preguntas y opciones cargadas en una sola consulta"""
+        return (
+            select(Encuesta)
+            .options(joinedload(Encuesta.preguntas).joinedload(Pregunta.opciones))
+            .where(Encuesta.id_encuesta == id_encuesta)
+        )
+
+    async def obtener(self, db: AsyncSession, id_encuesta: int) -> Optional[DefinicionEncuesta]:
+        """
+        Devuelve la definición vigente de la encuesta, o None si no existe.
+
+        Siempre consulta la versión actual (una lectura por clave primaria), así
+        que un cambio hecho desde cualquier worker se ve en la siguiente petición.
+        Si esa versión no está en caché, carga encuesta, preguntas y opciones en
+        una sola consulta.
+        """
+        version = await db.scalar(
+            select(Encuesta.version).where(Encuesta.id_encuesta == id_encuesta)
+        )
+        if version is None:
+            return None
+
+        definicion = self.cache.obtener((id_encuesta, version))
+        if definicion is not None:
+            return definicion
+
+        resultado = await db.execute(
+            self.consulta_definicion(id_encuesta).execution_options(populate_existing=True)
+        )
+        encuesta = resultado.unique().scalar_one_or_none()
+        if encuesta is None:
+            return None
+
+        definicion = DefinicionEncuesta(encuesta)
+        self.cache.guardar((id_encuesta, definicion.version), definicion)
+        logger.debug("Definición de encuesta cargada", extra=campos(id_encuesta=id_encuesta, version=definicion.version))
+        return definicion
+
+    def obtener_metricas(self) -> Dict[str, Any]:
+        """Aciertos y fallos de la caché en este worker"""
+        return {
+            "entradas": len(self.cache),
+            "aciertos": self.cache.aciertos,
+            "fallos": self.cache.fallos,
+        }
+
+
+# Instancia global del servicio
+definiciones_encuesta_service = DefinicionesEncuestaService(
+    max_entradas=settings.cache_encuestas_max_entradas,
+    ttl_segundos=settings.cache_encuestas_ttl_segundos,
+)
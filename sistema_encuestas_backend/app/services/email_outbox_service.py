@@ -0,0 +1,284 @@
+# app/services/email_outbox_service.py
+"""
+Envío en segundo plano de la bandeja de salida (email_outbox)
+
+Cada worker corre un ciclo que reclama un lote de correos pendientes vencidos
+(UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED), así dos workers
+nunca toman el mismo correo), los envía por un pool de conexiones SMTP ya
+autenticadas y registra el resultado. Un correo que falla se reintenta con
+espera exponencial hasta EMAIL_OUTBOX_MAX_INTENTOS; un rechazo permanente del
+servidor (5xx) lo marca como fallido de inmediato.
+
+Al reclamar un correo su proximo_intento se corre ARRIENDO_SEGUNDOS hacia
+adelante: si el worker se cae durante el envío, otro lo reintenta al vencer
+(el envío es "al menos una vez").
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiosmtplib
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.engine import Row
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.email_outbox import EmailOutbox, EstadoEmail
+from app.services.email_service import email_service
+from app.utils.logs import campos
+
+logger = logging.getLogger(__name__)
+
+# Tiempo que un correo reclamado queda reservado para el worker que lo envía
+ARRIENDO_SEGUNDOS = 300
+# Espera antes del reintento n: ESPERA_BASE * 2^(n-1), como máximo ESPERA_MAXIMA
+ESPERA_BASE_SEGUNDOS = 30
+ESPERA_MAXIMA_SEGUNDOS = 3600
+
+
+class PoolSMTP:
+    """
+    Conexiones SMTP abiertas y autenticadas que se reutilizan entre correos:
+    el saludo, STARTTLS y el login se pagan una vez por conexión y no por
+    mensaje. Una conexión que falla se descarta; las inactivas se cierran
+    antes de que el servidor las corte.
+    """
+
+    def __init__(self, tamano: int, inactividad_segundos: float = 60):
+        self.tamano = tamano
+        self.inactividad_segundos = inactividad_segundos
+        self._semaforo = asyncio.Semaphore(tamano)
+        self._libres: List[Tuple[aiosmtplib.SMTP, float]] = []
+        self.conexiones_abiertas = 0
+
+    async def _abrir(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=email_service.smtp_host,
+            port=email_service.smtp_port,
+            start_tls=email_service.smtp_use_tls,
+            timeout=30,
+        )
+        await smtp.connect()
+        try:
+            if email_service.smtp_user and email_service.smtp_password:
+                await smtp.login(email_service.smtp_user, email_service.smtp_password)
+        except BaseException:
+            smtp.close()
+            raise
+        self.conexiones_abiertas += 1
+        return smtp
+
+    async def _cerrar(self, smtp: aiosmtplib.SMTP) -> None:
+        self.conexiones_abiertas -= 1
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    @asynccontextmanager
+    async def conexion(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        """Conexión lista para enviar; a lo sumo `tamano` en uso a la vez"""
+        async with self._semaforo:
+            smtp = None
+            while self._libres and smtp is None:
+                candidata, ultimo_uso = self._libres.pop()
+                if candidata.is_connected and time.monotonic() - ultimo_uso < self.inactividad_segundos:
+                    smtp = candidata
+                else:
+                    await self._cerrar(candidata)
+            if smtp is None:
+                smtp = await self._abrir()
+            try:
+                yield smtp
+            except BaseException:
+                # Estado de la sesión SMTP desconocido: no se reutiliza
+                await self._cerrar(smtp)
+                raise
+            self._libres.append((smtp, time.monotonic()))
+
+    async def cerrar_inactivas(self) -> None:
+        ahora = time.monotonic()
+        vigentes = []
+        for smtp, ultimo_uso in self._libres:
+            if ahora - ultimo_uso < self.inactividad_segundos:
+                vigentes.append((smtp, ultimo_uso))
+            else:
+                await self._cerrar(smtp)
+        self._libres = vigentes
+
+    async def cerrar(self) -> None:
+        libres, self._libres = self._libres, []
+        for smtp, _ in libres:
+            await self._cerrar(smtp)
+
+
+class EmailOutboxService:
+    """Ciclo de envío de la bandeja de salida en cada worker"""
+
+    def __init__(self, activo: bool, intervalo_segundos: float, tamano_lote: int, conexiones: int, max_intentos: int):
+        self.activo = activo
+        self.intervalo_segundos = intervalo_segundos
+        self.tamano_lote = tamano_lote
+        self.max_intentos = max_intentos
+        self.pool = PoolSMTP(conexiones)
+        self._tarea: Optional[asyncio.Task] = None
+        self._despertar = asyncio.Event()
+        self.enviados = 0
+        self.reintentos = 0
+        self.fallidos = 0
+        self.lotes = 0
+
+    def despertar(self) -> None:
+        """Adelanta el próximo lote (llamar después del commit que encoló un correo)"""
+        self._despertar.set()
+
+    async def _reclamar(self) -> List[Row]:
+        """Reserva hasta tamano_lote correos vencidos y devuelve sus datos"""
+        vencidos = (
+            select(EmailOutbox.id_email)
+            .where(and_(EmailOutbox.estado == EstadoEmail.PENDIENTE, EmailOutbox.proximo_intento <= func.now()))
+            .order_by(EmailOutbox.proximo_intento, EmailOutbox.id_email)
+            .limit(self.tamano_lote)
+            .with_for_update(skip_locked=True)
+        )
+        async with SessionLocal() as db:
+            resultado = await db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id_email.in_(vencidos.scalar_subquery()))
+                .values(
+                    intentos=EmailOutbox.intentos + 1,
+                    proximo_intento=func.now() + timedelta(seconds=ARRIENDO_SEGUNDOS),
+                )
+                .returning(
+                    EmailOutbox.id_email, EmailOutbox.destinatario, EmailOutbox.asunto,
+                    EmailOutbox.html, EmailOutbox.texto, EmailOutbox.intentos
+                )
+                .execution_options(synchronize_session=False)
+            )
+            correos = resultado.all()
+            await db.commit()
+        return correos
+
+    async def _enviar(self, correo: Row) -> Optional[Tuple[str, bool]]:
+        """None si se envió; si no, (error, es_permanente)"""
+        mensaje = email_service.armar_mensaje(correo.destinatario, correo.asunto, correo.html, correo.texto)
+        # Una conexión reutilizada pudo haberla cerrado el servidor: un reintento con una nueva
+        for intento in range(2):
+            try:
+                async with self.pool.conexion() as smtp:
+                    await smtp.send_message(mensaje)
+                return None
+            except aiosmtplib.SMTPServerDisconnected as e:
+                if intento == 1:
+                    return str(e), False
+            except aiosmtplib.SMTPAuthenticationError as e:
+                # Problema de configuración, no del correo
+                return str(e), False
+            except aiosmtplib.SMTPRecipientsRefused as e:
+                # 4xx (buzón lleno, greylisting) se reintenta; 5xx no
+                return str(e), all(r.code >= 500 for r in e.recipients)
+            except aiosmtplib.SMTPResponseException as e:
+                return str(e), 500 <= e.code < 600
+            except Exception as e:
+                return str(e) or type(e).__name__, False
+
+    async def procesar_lote(self) -> int:
+        """Envía un lote de pendientes y registra el resultado; devuelve cuántos reclamó"""
+        correos = await self._reclamar()
+        if not correos:
+            return 0
+        resultados = await asyncio.gather(*(self._enviar(c) for c in correos))
+
+        enviados = [c.id_email for c, error in zip(correos, resultados) if error is None]
+        async with SessionLocal() as db:
+            if enviados:
+                await db.execute(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id_email.in_(enviados))
+                    .values(estado=EstadoEmail.ENVIADO, fecha_envio=func.now(), ultimo_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+            for correo, error in zip(correos, resultados):
+                if error is None:
+                    continue
+                texto_error, permanente = error
+                valores: Dict[str, Any] = {"ultimo_error": texto_error[:1000]}
+                if permanente or correo.intentos >= self.max_intentos:
+                    valores["estado"] = EstadoEmail.FALLIDO
+                    self.fallidos += 1
+                    logger.error("Correo %s a %s descartado: %s", correo.id_email, correo.destinatario, texto_error)
+                else:
+                    espera = min(ESPERA_BASE_SEGUNDOS * 2 ** (correo.intentos - 1), ESPERA_MAXIMA_SEGUNDOS)
+                    valores["proximo_intento"] = func.now() + timedelta(seconds=espera)
+                    self.reintentos += 1
+                    logger.warning("Correo %s a %s: reintento en %ss (%s)", correo.id_email, correo.destinatario, espera, texto_error)
+                await db.execute(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id_email == correo.id_email)
+                    .values(**valores)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+
+        self.enviados += len(enviados)
+        self.lotes += 1
+        return len(correos)
+
+    async def _ciclo(self) -> None:
+        while True:
+            try:
+                procesados = await self.procesar_lote()
+            except Exception as e:
+                logger.warning("Error procesando la bandeja de salida", extra=campos(error=str(e)))
+                procesados = 0
+            # Con un lote completo puede haber más pendientes: se sigue sin esperar
+            if procesados < self.tamano_lote:
+                await self.pool.cerrar_inactivas()
+                try:
+                    await asyncio.wait_for(self._despertar.wait(), self.intervalo_segundos)
+                except asyncio.TimeoutError:
+                    pass
+                self._despertar.clear()
+
+    async def iniciar(self) -> None:
+        """Arranca el ciclo de envío de este worker (EMAIL_OUTBOX_ACTIVO)"""
+        if not self.activo or self._tarea is not None:
+            return
+        self._despertar = asyncio.Event()
+        self._tarea = asyncio.create_task(self._ciclo())
+
+    async def detener(self) -> None:
+        tarea, self._tarea = self._tarea, None
+        if tarea is not None:
+            tarea.cancel()
+            try:
+                await tarea
+            except asyncio.CancelledError:
+                pass
+        await self.pool.cerrar()
+
+    def obtener_metricas(self) -> Dict[str, Any]:
+        """Resultados de envío y conexiones SMTP abiertas por este worker"""
+        return {
+            "activo": self._tarea is not None,
+            "enviados": self.enviados,
+            "reintentos": self.reintentos,
+            "fallidos": self.fallidos,
+            "lotes": self.lotes,
+            "conexiones_abiertas": self.pool.conexiones_abiertas,
+            "conexiones_libres": len(self.pool._libres),
+        }
+
+
+# Instancia global del servicio
+email_outbox_service = EmailOutboxService(
+    activo=settings.email_outbox_activo,
+    intervalo_segundos=settings.email_outbox_intervalo_segundos,
+    tamano_lote=settings.email_outbox_lote,
+    conexiones=settings.email_outbox_conexiones,
+    max_intentos=settings.email_outbox_max_intentos,
+)
@@ -2,6 +2,7 @@ import httpx
 import logging
 from typing import Optional, Dict, Any
 from app.config import settings
+from app.utils.logs import campos
 
 logger = logging.getLogger(__name__)
 
@@ -16,11 +17,11 @@ class GoogleAuthService:
             async with httpx.AsyncClient() as client:
                 response = await client.get(self.verify_url, params={"id_token": id_token})
                 if response.status_code != 200:
-                    logger.error(f"Error verificando token: {response.status_code} - {response.text}")
+                    logger.error("Error verificando token", extra=campos(status=response.status_code, respuesta=response.text))
                     return None
                 token_data = response.json()
                 if token_data.get('aud') != self.client_id:
-                    logger.error(f"Token no es para nuestra app. Esperado: {self.client_id}, Recibido: {token_data.get('aud')}")
+                    logger.error("Token no es para nuestra app", extra=campos(esperado=self.client_id, recibido=token_data.get('aud')))
                     return None
                 import time
                 if int(token_data.get('exp', 0)) < time.time():
@@ -38,7 +39,7 @@ class GoogleAuthService:
                 }
                 return user_info
         except Exception as e:
-            logger.error(f"Error verificando token de Google: {e}")
+            logger.error("Error verificando token de Google", extra=campos(error=str(e)))
             return None
 
 # Instancia global
@@ -0,0 +1,122 @@
+# app/services/password_service.py
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.config import settings
+from app.utils.logs import campos
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordService:
+    """
+    Servicio para hashear y verificar contraseñas con bcrypt.
+
+    bcrypt tarda decenas de milisegundos por operación, así que se ejecuta en un
+    pool de hilos propio y acotado para no bloquear el event loop. Si hay más de
+    `max_cola` operaciones pendientes la petición se rechaza con 503.
+    """
+
+    def __init__(self, hilos: int, max_cola: int):
+        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.hilos = hilos
+        self.max_cola = max_cola
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pendientes = 0
+        self._lock = threading.Lock()
+        self._metricas = {
+            "operaciones": 0,
+            "rechazos": 0,
+            "espera_cola_ms_total": 0.0,
+            "espera_cola_ms_max": 0.0,
+            "bcrypt_ms_total": 0.0,
+            "bcrypt_ms_max": 0.0,
+        }
+
+    def _obtener_executor(self) -> ThreadPoolExecutor:
+        # Se crea en el primer uso para que cada worker de uvicorn tenga el suyo
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _ejecutar(self, funcion: Callable[..., Any], *args) -> Any:
+        """Ejecuta la función de passlib en el pool, midiendo espera y duración"""
+        with self._lock:
+            if self._pendientes >= self.max_cola:
+                self._metricas["rechazos"] += 1
+                logger.warning("⚠️ Cola de bcrypt llena, petición rechazada", extra=campos(pendientes=self._pendientes))
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="El servidor está ocupado, intenta nuevamente en unos segundos",
+                    headers={"Retry-After": "1"},
+                )
+            self._pendientes += 1
+
+        encolado = time.perf_counter()
+
+        def tarea():
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args)
+            finally:
+                fin = time.perf_counter()
+                self._registrar((inicio - encolado) * 1000, (fin - inicio) * 1000)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._obtener_executor(), tarea)
+        finally:
+            with self._lock:
+                self._pendientes -= 1
+
+    def _registrar(self, espera_ms: float, bcrypt_ms: float) -> None:
+        with self._lock:
+            m = self._metricas
+            m["operaciones"] += 1
+            m["espera_cola_ms_total"] += espera_ms
+            m["espera_cola_ms_max"] = max(m["espera_cola_ms_max"], espera_ms)
+            m["bcrypt_ms_total"] += bcrypt_ms
+            m["bcrypt_ms_max"] = max(m["bcrypt_ms_max"], bcrypt_ms)
+
+    async def hash(self, password: str) -> str:
+        """Genera el hash bcrypt de una contraseña"""
+        return await self._ejecutar(self.pwd_context.hash, password)
+
+    async def verify(self, password: str, password_hash: Optional[str]) -> bool:
+        """Verifica una contraseña contra su hash (False si el usuario no tiene hash)"""
+        if not password_hash:
+            return False
+        return await self._ejecutar(self.pwd_context.verify, password, password_hash)
+
+    def obtener_metricas(self) -> Dict[str, Any]:
+        """Devuelve las métricas acumuladas de este worker"""
+        with self._lock:
+            m = dict(self._metricas)
+            pendientes = self._pendientes
+
+        operaciones = m["operaciones"]
+        return {
+            "hilos": self.hilos,
+            "max_cola": self.max_cola,
+            "pendientes": pendientes,
+            "operaciones": operaciones,
+            "rechazos": m["rechazos"],
+            "espera_cola_ms_promedio": round(m["espera_cola_ms_total"] / operaciones, 2) if operaciones else 0.0,
+            "espera_cola_ms_max": round(m["espera_cola_ms_max"], 2),
+            "bcrypt_ms_promedio": round(m["bcrypt_ms_total"] / operaciones, 2) if operaciones else 0.0,
+            "bcrypt_ms_max": round(m["bcrypt_ms_max"], 2),
+        }
+
+
+# Instancia global del servicio
+password_service = PasswordService(
+    hilos=settings.password_hash_hilos,
+    max_cola=settings.password_hash_max_cola,
+)
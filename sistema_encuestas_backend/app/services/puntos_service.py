@@ -0,0 +1,168 @@
+# app/services/puntos_service.py
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Union
+
+from sqlalchemy import func, literal, select, text, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.movimiento_puntos import MovimientoPuntos, TipoMovimiento
+from app.models.usuario import Usuario
+
+logger = logging.getLogger(__name__)
+
+
+class PuntosService:
+    """
+    Movimientos de puntos sobre el libro movimientos_puntos.
+
+    Cada movimiento inserta una fila en el libro y ajusta el saldo en caché
+    del usuario (usuarios.puntos_*) en una sola sentencia: el UPDATE del
+    saldo va primero y el INSERT del movimiento toma su resultado, así que un
+    débito sin saldo suficiente no deja ni el movimiento ni el descuento.
+    Nunca se lee el saldo en Python para después escribirlo.
+    """
+
+    def __init__(self):
+        self.movimientos = Counter()
+
+    async def registrar_movimiento(
+        self,
+        db: AsyncSession,
+        id_usuario: int,
+        tipo: str,
+        puntos: int,
+        id_participacion: Optional[int] = None,
+        id_canje: Union[int, ColumnElement, None] = None
+    ) -> Optional[Row]:
+        """
+        Registra el movimiento y devuelve el saldo resultante (puntos_totales,
+        puntos_disponibles, puntos_canjeados) junto con id_movimiento e
+        id_canje. Devuelve None si el usuario no existe o si es un débito y no
+        le alcanzan los puntos. `id_canje` puede ser una expresión SQL (el
+        canje usa nextval para conocer su id antes de insertarse). No hace commit.
+        """
+        if puntos == 0:
+            raise ValueError("Un movimiento de puntos no puede ser de 0 puntos")
+
+        valores = {"puntos_disponibles": func.coalesce(Usuario.puntos_disponibles, 0) + puntos}
+        if tipo == TipoMovimiento.CANJE:
+            valores["puntos_canjeados"] = func.coalesce(Usuario.puntos_canjeados, 0) - puntos
+        else:
+            valores["puntos_totales"] = func.coalesce(Usuario.puntos_totales, 0) + puntos
+
+        condiciones = [Usuario.id_usuario == id_usuario]
+        if puntos < 0:
+            condiciones.append(func.coalesce(Usuario.puntos_disponibles, 0) + puntos >= 0)
+
+        saldo = (
+            update(Usuario)
+            .where(*condiciones)
+            .values(**valores)
+            .returning(
+                Usuario.id_usuario, Usuario.puntos_totales,
+                Usuario.puntos_disponibles, Usuario.puntos_canjeados
+            )
+            .cte("saldo")
+        )
+        movimiento = (
+            pg_insert(MovimientoPuntos)
+            .from_select(
+                ["id_usuario", "tipo", "puntos", "id_participacion", "id_canje"],
+                select(
+                    saldo.c.id_usuario,
+                    literal(tipo, MovimientoPuntos.tipo.type),
+                    literal(puntos, MovimientoPuntos.puntos.type),
+                    literal(id_participacion, MovimientoPuntos.id_participacion.type),
+                    id_canje if isinstance(id_canje, ColumnElement) else literal(id_canje, MovimientoPuntos.id_canje.type),
+                )
+            )
+            .returning(MovimientoPuntos.id_movimiento, MovimientoPuntos.id_canje)
+            .cte("movimiento")
+        )
+        fila = (await db.execute(
+            select(
+                saldo.c.puntos_totales, saldo.c.puntos_disponibles, saldo.c.puntos_canjeados,
+                movimiento.c.id_movimiento, movimiento.c.id_canje
+            ).select_from(saldo.join(movimiento, true()))
+        )).first()
+
+        self.movimientos[tipo if fila is not None else "rechazados"] += 1
+        return fila
+
+    async def recalcular_saldos(self, db: AsyncSession, aplicar: bool = True) -> List[Row]:
+        """
+        Compara usuarios.puntos_* con el agregado del libro en una sola pasada
+        (GROUP BY sobre movimientos_puntos) y, con `aplicar`, corrige los
+        usuarios descuadrados en la misma sentencia. Devuelve los descuadres
+        (id_usuario, valores en caché y valores del libro). No hace commit.
+        """
+        es_canje = MovimientoPuntos.tipo == TipoMovimiento.CANJE
+        libro = (
+            select(
+                MovimientoPuntos.id_usuario,
+                func.coalesce(func.sum(MovimientoPuntos.puntos).filter(~es_canje), 0).label("totales"),
+                func.coalesce(func.sum(MovimientoPuntos.puntos), 0).label("disponibles"),
+                func.coalesce(-func.sum(MovimientoPuntos.puntos).filter(es_canje), 0).label("canjeados"),
+            )
+            .group_by(MovimientoPuntos.id_usuario)
+            .subquery("libro")
+        )
+        # Usuarios sin movimientos: saldo 0
+        totales = func.coalesce(libro.c.totales, 0)
+        disponibles = func.coalesce(libro.c.disponibles, 0)
+        canjeados = func.coalesce(libro.c.canjeados, 0)
+        calculado = (
+            select(
+                Usuario.id_usuario,
+                Usuario.puntos_totales, Usuario.puntos_disponibles, Usuario.puntos_canjeados,
+                totales.label("totales"), disponibles.label("disponibles"), canjeados.label("canjeados"),
+            )
+            .outerjoin(libro, libro.c.id_usuario == Usuario.id_usuario)
+            .where(
+                # NULL en usuarios equivale a 0 (columnas anteriores al libro)
+                func.row(
+                    func.coalesce(Usuario.puntos_totales, 0),
+                    func.coalesce(Usuario.puntos_disponibles, 0),
+                    func.coalesce(Usuario.puntos_canjeados, 0),
+                ) != func.row(totales, disponibles, canjeados)
+            )
+        )
+
+        if not aplicar:
+            return (await db.execute(calculado)).all()
+
+        # Un movimiento que se confirme durante la pasada quedaría fuera del agregado:
+        # se bloquean las inserciones del libro hasta el commit
+        await db.execute(text("LOCK TABLE movimientos_puntos IN SHARE MODE"))
+        descuadre = calculado.subquery("descuadre")
+        resultado = await db.execute(
+            update(Usuario)
+            .where(Usuario.id_usuario == descuadre.c.id_usuario)
+            .values(
+                puntos_totales=descuadre.c.totales,
+                puntos_disponibles=descuadre.c.disponibles,
+                puntos_canjeados=descuadre.c.canjeados,
+            )
+            .returning(
+                descuadre.c.id_usuario,
+                descuadre.c.puntos_totales, descuadre.c.puntos_disponibles, descuadre.c.puntos_canjeados,
+                descuadre.c.totales, descuadre.c.disponibles, descuadre.c.canjeados,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        filas = resultado.all()
+        if filas:
+            logger.warning("Saldos de puntos corregidos desde el libro: %s usuarios", len(filas))
+        return filas
+
+    def obtener_metricas(self) -> Dict[str, Any]:
+        """Movimientos registrados por tipo (y débitos rechazados) en este worker"""
+        return dict(self.movimientos)
+
+
+# Instancia global del servicio
+puntos_service = PuntosService()
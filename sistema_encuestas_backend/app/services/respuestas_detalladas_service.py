@@ -0,0 +1,485 @@
+# app/services/respuestas_detalladas_service.py
+import asyncio
+import csv
+import glob
+import io
+import json
+import logging
+import os
+import tempfile
+import weakref
+from contextlib import suppress
+from datetime import date
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional, Tuple
+
+from fastapi import Response
+from openpyxl import Workbook
+from sqlalchemy import func, select
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.encuesta import Encuesta
+from app.models.opcion import Opcion
+from app.models.participacion import Participacion
+from app.models.pregunta import Pregunta
+from app.models.respuesta import Respuesta
+from app.models.usuario import Usuario
+from app.utils.paginacion import Paginacion
+
+logger = logging.getLogger(__name__)
+
+TIPOS_EXPORTABLES = ("opcion_multiple", "texto_libre")
+SIN_RESPUESTA = "Sin respuesta"
+
+# Columnas fijas de la exportación tabular (clave de la fila -> encabezado),
+# las mismas que arma el panel de administración
+COLUMNAS_FIJAS = {
+    "participante_id": "ID Participante",
+    "edad": "Edad",
+    "sexo": "Sexo",
+    "localizacion": "Localización",
+    "fecha": "Fecha",
+    "encuesta_id": "ID Encuesta",
+    "encuesta_nom": "Nombre Encuesta",
+}
+
+
+class EncabezadosEncuesta:
+    """Datos fijos de una encuesta, resueltos una sola vez antes de recorrer las respuestas"""
+
+    def __init__(self, encuesta: Encuesta, preguntas: List[Pregunta], opciones: Dict[int, str]):
+        self.id_encuesta = encuesta.id_encuesta
+        self.titulo = encuesta.titulo
+        self.version = encuesta.version
+        # Solo se exportan las preguntas de opción múltiple y texto libre, en orden
+        self.preguntas = [p for p in preguntas if str(p.tipo) in TIPOS_EXPORTABLES]
+        self.pregunta_por_id = {p.id_pregunta: p for p in self.preguntas}
+        self.opciones = opciones
+
+    @property
+    def columnas(self) -> List[str]:
+        """Textos de las preguntas, usados como encabezados de columna"""
+        return list(dict.fromkeys(p.texto for p in self.preguntas))
+
+    @property
+    def encabezados_tabla(self) -> List[str]:
+        """Primera fila de la exportación CSV/XLSX"""
+        return list(COLUMNAS_FIJAS.values()) + self.columnas
+
+
+class RespuestasDetalladasService:
+    """Servicio para recorrer las respuestas individuales de una encuesta fila por fila"""
+
+    # Filas que se traen del cursor del servidor en cada lote
+    TAMANO_LOTE = 2000
+    # Filas por bloque enviado al cliente
+    FILAS_POR_BLOQUE = 100
+    # Bytes por bloque al enviar un archivo ya armado (XLSX o Parquet)
+    BYTES_POR_BLOQUE = 64 * 1024
+    # Un candado por clave de la caché Parquet mientras se genera (se liberan solos sin uso)
+    _candados_parquet: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    @staticmethod
+    async def obtener_encabezados(db: AsyncSession, id_encuesta: int) -> Optional[EncabezadosEncuesta]:
+        """Carga la encuesta, sus preguntas y el mapa id_opcion -> texto (None si no existe)"""
+        encuesta = await db.get(Encuesta, id_encuesta)
+        if encuesta is None:
+            return None
+
+        query_preguntas = await db.execute(
+            select(Pregunta)
+            .where(Pregunta.id_encuesta == id_encuesta)
+            .order_by(Pregunta.orden, Pregunta.id_pregunta)
+        )
+        preguntas = query_preguntas.scalars().all()
+
+        query_opciones = await db.execute(
+            select(Opcion.id_opcion, Opcion.texto_opcion)
+            .join(Pregunta, Pregunta.id_pregunta == Opcion.id_pregunta)
+            .where(Pregunta.id_encuesta == id_encuesta)
+        )
+        opciones = {fila.id_opcion: fila.texto_opcion for fila in query_opciones}
+
+        return EncabezadosEncuesta(encuesta, preguntas, opciones)
+
+    @staticmethod
+    def _calcular_edad(fecha_nacimiento) -> Optional[int]:
+        if not fecha_nacimiento:
+            return None
+        hoy = date.today()
+        edad = hoy.year - fecha_nacimiento.year
+        if (hoy.month, hoy.day) < (fecha_nacimiento.month, fecha_nacimiento.day):
+            edad -= 1
+        return edad
+
+    @staticmethod
+    def _texto_respuesta(pregunta: Pregunta, valores: Optional[List[str]]) -> Optional[str]:
+        """Respuesta a una pregunta (las opciones elegidas unidas por coma) o None"""
+        if not valores:
+            return None
+        if str(pregunta.tipo) == "opcion_multiple":
+            return ", ".join(valores)
+        return valores[0] or None
+
+    @staticmethod
+    def _armar_fila(encabezados: EncabezadosEncuesta, participacion, respuestas: Dict[int, List[str]]) -> Dict[str, Any]:
+        """Arma la fila anonimizada de una participación a partir de sus respuestas agrupadas"""
+        respuestas_dict = {}
+        for pregunta in encabezados.preguntas:
+            texto = RespuestasDetalladasService._texto_respuesta(pregunta, respuestas.get(pregunta.id_pregunta))
+            respuestas_dict[pregunta.texto] = texto or SIN_RESPUESTA
+
+        edad = RespuestasDetalladasService._calcular_edad(participacion.fecha_nacimiento)
+
+        return {
+            "participante_id": f"P{participacion.id_participacion:06d}",  # ID anonimizado
+            "edad": edad if edad else "No especificada",
+            "sexo": participacion.sexo or "No especificado",
+            "localizacion": participacion.localizacion or "No especificada",
+            "fecha": participacion.fecha_participacion.strftime("%Y-%m-%d %H:%M"),
+            "encuesta_id": encabezados.id_encuesta,
+            "encuesta_nom": encabezados.titulo,
+            "respuestas": respuestas_dict
+        }
+
+    @staticmethod
+    def consulta_pagina(id_encuesta: int, pagina: Paginacion):
+        """Claves de las participaciones de una página de la encuesta (más una para el cursor)"""
+        return pagina.aplicar(
+            select(Participacion.id_participacion, Participacion.fecha_participacion)
+            .where(Participacion.id_encuesta == id_encuesta),
+            Participacion.fecha_participacion,
+            Participacion.id_participacion
+        )
+
+    @staticmethod
+    async def ids_pagina(db: AsyncSession, id_encuesta: int, pagina: Paginacion, response: Response) -> List[int]:
+        """
+        Ids de las participaciones de una página (por cursor, de la más reciente
+        a la más antigua) y cursor de la siguiente en X-Next-Cursor. Solo lee
+        el índice (id_encuesta, fecha_participacion, id_participacion).
+        """
+        query = RespuestasDetalladasService.consulta_pagina(id_encuesta, pagina)
+        filas = pagina.cerrar(
+            (await db.execute(query)).all(), response,
+            lambda f: (f.fecha_participacion, f.id_participacion)
+        )
+        return [f.id_participacion for f in filas]
+
+    @staticmethod
+    def consulta_filas(id_encuesta: int, ids: Optional[List[int]] = None):
+        """
+        Participaciones de la encuesta (todas, o solo las de `ids`) con sus
+        respuestas, ordenadas para pivotear en una pasada
+        """
+        query = (
+            select(
+                Participacion.id_participacion,
+                Participacion.fecha_participacion,
+                Usuario.fecha_nacimiento,
+                Usuario.sexo,
+                Usuario.localizacion,
+                Respuesta.id_pregunta,
+                Respuesta.id_opcion,
+                Respuesta.respuesta_texto
+            )
+            .join(Usuario, Usuario.id_usuario == Participacion.id_usuario)
+            .outerjoin(Respuesta, Respuesta.id_participacion == Participacion.id_participacion)
+            .where(Participacion.id_encuesta == id_encuesta)
+            .order_by(
+                Participacion.fecha_participacion.desc(),
+                Participacion.id_participacion.desc(),
+                Respuesta.id_respuesta
+            )
+        )
+        if ids is not None:
+            query = query.where(Participacion.id_participacion.in_(ids))
+        return query
+
+    @staticmethod
+    async def _iterar_participaciones(
+        encabezados: EncabezadosEncuesta,
+        ids: Optional[List[int]] = None
+    ) -> AsyncIterator[Tuple[Any, Dict[int, List[str]]]]:
+        """
+        Genera (participación, respuestas agrupadas por pregunta) de la más
+        reciente a la más antigua.
+
+        Usa una única consulta con cursor del lado del servidor, ordenada por
+        participación, y pivotea las respuestas en una sola pasada, así que la
+        memoria no depende del tamaño de la encuesta. Abre su propia sesión
+        porque se consume mientras se envía la respuesta HTTP. Con `ids` recorre
+        solo esas participaciones (una página, ver ids_pagina).
+        """
+        query = RespuestasDetalladasService.consulta_filas(encabezados.id_encuesta, ids).execution_options(
+            yield_per=RespuestasDetalladasService.TAMANO_LOTE
+        )
+
+        opciones = encabezados.opciones
+        pregunta_por_id = encabezados.pregunta_por_id
+
+        async with SessionLocal() as db:
+            resultado = await db.stream(query)
+
+            actual = None
+            respuestas: Dict[int, List[str]] = {}
+            async for fila in resultado:
+                if actual is None or fila.id_participacion != actual.id_participacion:
+                    if actual is not None:
+                        yield actual, respuestas
+                    actual = fila
+                    respuestas = {}
+
+                pregunta = pregunta_por_id.get(fila.id_pregunta)
+                if pregunta is None:
+                    continue
+                if str(pregunta.tipo) == "opcion_multiple":
+                    texto = opciones.get(fila.id_opcion)
+                else:
+                    texto = fila.respuesta_texto
+                if texto is not None:
+                    respuestas.setdefault(fila.id_pregunta, []).append(texto)
+
+            if actual is not None:
+                yield actual, respuestas
+
+    @staticmethod
+    async def iterar_filas(
+        encabezados: EncabezadosEncuesta,
+        ids: Optional[List[int]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Genera una fila anonimizada por participación (ver _iterar_participaciones)"""
+        async for participacion, respuestas in RespuestasDetalladasService._iterar_participaciones(encabezados, ids):
+            yield RespuestasDetalladasService._armar_fila(encabezados, participacion, respuestas)
+
+    @staticmethod
+    async def generar_json(encabezados: EncabezadosEncuesta, ids: Optional[List[int]] = None) -> AsyncIterator[bytes]:
+        """Emite las filas como un arreglo JSON, en bloques de varias filas"""
+        yield b"["
+        separador = ""
+        bloque: List[str] = []
+        async for fila in RespuestasDetalladasService.iterar_filas(encabezados, ids):
+            bloque.append(separador + json.dumps(fila, ensure_ascii=False))
+            separador = ","
+            if len(bloque) >= RespuestasDetalladasService.FILAS_POR_BLOQUE:
+                yield "".join(bloque).encode("utf-8")
+                bloque = []
+        bloque.append("]")
+        yield "".join(bloque).encode("utf-8")
+
+    @staticmethod
+    async def generar_ndjson(encabezados: EncabezadosEncuesta, ids: Optional[List[int]] = None) -> AsyncIterator[bytes]:
+        """Emite las filas como NDJSON (una por línea), en bloques de varias filas"""
+        bloque: List[str] = []
+        async for fila in RespuestasDetalladasService.iterar_filas(encabezados, ids):
+            bloque.append(json.dumps(fila, ensure_ascii=False) + "\n")
+            if len(bloque) >= RespuestasDetalladasService.FILAS_POR_BLOQUE:
+                yield "".join(bloque).encode("utf-8")
+                bloque = []
+        if bloque:
+            yield "".join(bloque).encode("utf-8")
+
+    @staticmethod
+    def _valores_tabla(encabezados: EncabezadosEncuesta, fila: Dict[str, Any]) -> List[Any]:
+        """Fila como lista, en el orden de encabezados_tabla"""
+        respuestas = fila["respuestas"]
+        return [fila[clave] for clave in COLUMNAS_FIJAS] + [respuestas.get(c, "") for c in encabezados.columnas]
+
+    @staticmethod
+    async def generar_csv(encabezados: EncabezadosEncuesta) -> AsyncIterator[bytes]:
+        """
+        Emite la encuesta completa como CSV UTF-8 (con BOM para que Excel
+        respete los acentos), escrito por bloques de varias filas
+        """
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        buffer.write("\ufeff")
+        escritor.writerow(encabezados.encabezados_tabla)
+        filas = 0
+        async for fila in RespuestasDetalladasService.iterar_filas(encabezados):
+            escritor.writerow(RespuestasDetalladasService._valores_tabla(encabezados, fila))
+            filas += 1
+            if filas % RespuestasDetalladasService.FILAS_POR_BLOQUE == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    async def generar_xlsx(encabezados: EncabezadosEncuesta) -> AsyncIterator[bytes]:
+        """
+        Emite la encuesta completa como XLSX.
+
+        El libro se arma en modo write_only de openpyxl: cada fila se escribe
+        a un archivo temporal al agregarla, así que la memoria no depende de la
+        cantidad de participaciones. Un XLSX es un ZIP cuyo índice va al final,
+        por eso el archivo se envía por bloques recién cuando está completo.
+        """
+        with tempfile.TemporaryFile() as archivo:
+            libro = Workbook(write_only=True)
+            hoja = libro.create_sheet("Respuestas Detalladas")
+            hoja.append(encabezados.encabezados_tabla)
+            async for fila in RespuestasDetalladasService.iterar_filas(encabezados):
+                hoja.append(RespuestasDetalladasService._valores_tabla(encabezados, fila))
+
+            # Comprimir el libro bloquea: se hace fuera del event loop
+            await run_in_threadpool(libro.save, archivo)
+            archivo.seek(0)
+            while True:
+                bloque = await run_in_threadpool(archivo.read, RespuestasDetalladasService.BYTES_POR_BLOQUE)
+                if not bloque:
+                    break
+                yield bloque
+
+    @staticmethod
+    def _esquema_parquet(encabezados: EncabezadosEncuesta):
+        """Columnas tipadas: demografía anonimizada y una columna por pregunta"""
+        import pyarrow as pa
+
+        # Pocos valores distintos repetidos en muchas filas: codificación por diccionario
+        categoria = pa.dictionary(pa.int32(), pa.string())
+        return pa.schema(
+            [
+                ("participante_id", pa.string()),
+                ("edad", pa.int16()),
+                ("sexo", categoria),
+                ("localizacion", categoria),
+                ("fecha", pa.timestamp("us")),
+                ("encuesta_id", pa.int32()),
+                ("encuesta_nom", categoria),
+            ]
+            + [(columna, categoria) for columna in encabezados.columnas]
+        )
+
+    @staticmethod
+    async def generar_parquet(encabezados: EncabezadosEncuesta, ruta: str) -> int:
+        """
+        Escribe la encuesta completa en `ruta` como Parquet, un row group por
+        lote de TAMANO_LOTE participaciones leídas del cursor. Sin respuesta,
+        edad o fecha el valor es NULL (no un texto). Devuelve la cantidad de filas.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        esquema = RespuestasDetalladasService._esquema_parquet(encabezados)
+        texto_respuesta = RespuestasDetalladasService._texto_respuesta
+        lote: Dict[str, List[Any]] = {nombre: [] for nombre in esquema.names}
+        filas = 0
+
+        def escribir_lote(columnas: Dict[str, List[Any]]) -> None:
+            escritor.write_batch(pa.RecordBatch.from_pydict(columnas, schema=esquema))
+
+        escritor = pq.ParquetWriter(ruta, esquema, compression="zstd")
+        try:
+            async for participacion, respuestas in RespuestasDetalladasService._iterar_participaciones(encabezados):
+                lote["participante_id"].append(f"P{participacion.id_participacion:06d}")
+                lote["edad"].append(RespuestasDetalladasService._calcular_edad(participacion.fecha_nacimiento))
+                lote["sexo"].append(participacion.sexo)
+                lote["localizacion"].append(participacion.localizacion)
+                lote["fecha"].append(participacion.fecha_participacion)
+                lote["encuesta_id"].append(encabezados.id_encuesta)
+                lote["encuesta_nom"].append(encabezados.titulo)
+                # Con textos de pregunta repetidos gana la última, como en _armar_fila
+                textos = {
+                    pregunta.texto: texto_respuesta(pregunta, respuestas.get(pregunta.id_pregunta))
+                    for pregunta in encabezados.preguntas
+                }
+                for columna in encabezados.columnas:
+                    lote[columna].append(textos[columna])
+
+                filas += 1
+                if filas % RespuestasDetalladasService.TAMANO_LOTE == 0:
+                    await run_in_threadpool(escribir_lote, lote)
+                    lote = {nombre: [] for nombre in esquema.names}
+
+            if filas % RespuestasDetalladasService.TAMANO_LOTE:
+                await run_in_threadpool(escribir_lote, lote)
+        finally:
+            await run_in_threadpool(escritor.close)
+        return filas
+
+    @staticmethod
+    def _abrir_si_existe(ruta: str) -> Optional[BinaryIO]:
+        try:
+            return open(ruta, "rb")
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    async def abrir_parquet(db: AsyncSession, encabezados: EncabezadosEncuesta) -> BinaryIO:
+        """
+        Parquet de la encuesta en la caché de disco (EXPORT_CACHE_DIR), ya
+        abierto para enviarlo; lo genera si no existe. El nombre incluye la
+        versión de la encuesta, la fecha de la última participación y el día
+        (la edad depende de la fecha), así que una descarga repetida solo lee
+        el índice (id_encuesta, fecha_participacion, ...) y envía el archivo.
+
+        Se devuelve abierto porque otra petición puede eliminar esta versión
+        al generar la siguiente: un archivo abierto se sigue leyendo aunque se
+        borre. El llamador lo cierra (enviar_archivo lo hace al terminar).
+        """
+        ultima = await db.scalar(
+            select(func.max(Participacion.fecha_participacion))
+            .where(Participacion.id_encuesta == encabezados.id_encuesta)
+        )
+        prefijo = f"encuesta_{encabezados.id_encuesta}_"
+        clave = (
+            f"{prefijo}v{encabezados.version}_"
+            f"{ultima.strftime('%Y%m%dT%H%M%S%f') if ultima else 'vacia'}_"
+            f"{date.today():%Y%m%d}"
+        )
+        directorio = settings.export_cache_dir
+        ruta = os.path.join(directorio, f"{clave}.parquet")
+        archivo = RespuestasDetalladasService._abrir_si_existe(ruta)
+        if archivo is not None:
+            return archivo
+
+        # Las descargas simultáneas de este worker que no encuentran el archivo esperan a
+        # la primera en lugar de generarlo cada una
+        candado = RespuestasDetalladasService._candados_parquet.get(clave)
+        if candado is None:
+            candado = RespuestasDetalladasService._candados_parquet[clave] = asyncio.Lock()
+        async with candado:
+            archivo = RespuestasDetalladasService._abrir_si_existe(ruta)
+            if archivo is not None:
+                return archivo
+
+            # Se escribe en un temporal y se renombra: una descarga concurrente nunca ve un archivo a medias
+            os.makedirs(directorio, exist_ok=True)
+            descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix=f"{clave}.", suffix=".tmp")
+            os.close(descriptor)
+            try:
+                filas = await RespuestasDetalladasService.generar_parquet(encabezados, temporal)
+                os.replace(temporal, ruta)
+            except BaseException:
+                with suppress(FileNotFoundError):
+                    os.remove(temporal)
+                raise
+            archivo = open(ruta, "rb")
+            logger.info("Parquet de la encuesta %s generado: %s filas", encabezados.id_encuesta, filas)
+
+        # Las versiones anteriores de la misma encuesta ya no se van a pedir; las descargas
+        # en curso las tienen abiertas (en Windows no se pueden borrar y quedan para la próxima)
+        for anterior in glob.glob(os.path.join(directorio, f"{prefijo}*.parquet")):
+            if anterior != ruta:
+                with suppress(OSError):
+                    os.remove(anterior)
+        return archivo
+
+    @staticmethod
+    async def enviar_archivo(archivo: BinaryIO) -> AsyncIterator[bytes]:
+        """Envía un archivo abierto por bloques, leyendo fuera del event loop, y lo cierra al terminar"""
+        try:
+            while True:
+                bloque = await run_in_threadpool(archivo.read, RespuestasDetalladasService.BYTES_POR_BLOQUE)
+                if not bloque:
+                    break
+                yield bloque
+        finally:
+            archivo.close()
+
+
+# Instancia global del servicio
+respuestas_detalladas_service = RespuestasDetalladasService()
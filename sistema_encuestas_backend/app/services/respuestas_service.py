@@ -0,0 +1,132 @@
+# app/services/respuestas_service.py
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import Integer, String, bindparam, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.movimiento_puntos import TipoMovimiento
+from app.models.participacion import Participacion
+from app.models.respuesta import Respuesta
+from app.models.usuario import Usuario
+from app.services.definiciones_encuesta_service import DefinicionEncuesta
+from app.services.puntos_service import puntos_service
+from app.services.stats_service import stats_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RespuestasService:
+    """Servicio para registrar las respuestas de una encuesta"""
+
+    @staticmethod
+    async def registrar_respuestas(
+        db: AsyncSession,
+        id_usuario: int,
+        definicion: DefinicionEncuesta,
+        respuestas: List[Dict[str, Any]],
+        tiempo_total: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Registra la participación, las respuestas y los puntos en una sola transacción.
+
+        Recibe la definición de la encuesta (cacheada por worker), que aporta los
+        puntos y permite validar las respuestas sin consultar la encuesta.
+        Usa un número fijo de sentencias sin importar la cantidad de preguntas:
+        1. INSERT de la participación con ON CONFLICT sobre (id_usuario, id_encuesta)
+        2. INSERT ... SELECT FROM unnest(...) con todas las respuestas
+        3. Movimiento en movimientos_puntos junto con el UPDATE del saldo del usuario
+        4. Upsert del resumen diario en stats_diarias
+
+        La restricción única reemplaza la verificación previa de "ya participó",
+        por lo que dos envíos simultáneos del mismo usuario no pueden duplicarse.
+        """
+        definicion.validar_respuestas(respuestas)
+
+        ahora = datetime.now()
+        id_encuesta = definicion.id_encuesta
+
+        # 1. Crear la participación con los puntos de la definición
+        stmt_participacion = (
+            pg_insert(Participacion)
+            .values(
+                id_usuario=id_usuario,
+                id_encuesta=id_encuesta,
+                fecha_participacion=ahora,
+                puntaje_obtenido=definicion.puntos_otorga,
+                tiempo_respuesta_segundos=tiempo_total or 0,
+            )
+            .on_conflict_do_nothing(index_elements=["id_usuario", "id_encuesta"])
+            .returning(Participacion.id_participacion, Participacion.puntaje_obtenido)
+        )
+        fila = (await db.execute(stmt_participacion)).first()
+
+        if fila is None:
+            raise HTTPException(status_code=400, detail="Ya has respondido esta encuesta")
+
+        id_participacion, puntos = fila
+
+        # 2. Insertar todas las respuestas en una sola sentencia a partir de arreglos
+        if respuestas:
+            filas = func.unnest(
+                bindparam("preguntas", [r["id_pregunta"] for r in respuestas], type_=ARRAY(Integer)),
+                bindparam("opciones", [r.get("id_opcion") for r in respuestas], type_=ARRAY(Integer)),
+                bindparam("textos", [r.get("respuesta_texto") for r in respuestas], type_=ARRAY(String)),
+            ).table_valued("id_pregunta", "id_opcion", "respuesta_texto").render_derived(name="filas")
+
+            await db.execute(
+                insert(Respuesta.__table__).from_select(
+                    [
+                        "id_pregunta",
+                        "id_opcion",
+                        "respuesta_texto",
+                        "id_usuario",
+                        "id_participacion",
+                        "fecha_respuesta",
+                    ],
+                    select(
+                        filas.c.id_pregunta,
+                        filas.c.id_opcion,
+                        filas.c.respuesta_texto,
+                        literal(id_usuario),
+                        literal(id_participacion),
+                        literal(ahora),
+                    ),
+                )
+            )
+
+        # 3. Movimiento en el libro de puntos y saldo del usuario en la misma sentencia
+        if puntos:
+            saldo = await puntos_service.registrar_movimiento(
+                db, id_usuario, TipoMovimiento.PARTICIPACION, puntos, id_participacion=id_participacion
+            )
+            puntos_totales = saldo.puntos_totales
+        else:
+            puntos_totales = await db.scalar(
+                select(Usuario.puntos_totales).where(Usuario.id_usuario == id_usuario)
+            )
+
+        # 4. Resumen diario del dashboard; al final para retener menos tiempo la fila compartida
+        await stats_service.registrar_participacion(
+            db, ahora, id_encuesta, len(respuestas), tiempo_total
+        )
+
+        await db.commit()
+
+        logger.debug(
+            "Respuestas registradas: participacion=%s usuario=%s encuesta=%s respuestas=%s",
+            id_participacion, id_usuario, id_encuesta, len(respuestas)
+        )
+
+        return {
+            "id_participacion": id_participacion,
+            "puntos_obtenidos": puntos,
+            "puntos_totales": puntos_totales,
+        }
+
+
+# Instancia global del servicio
+respuestas_service = RespuestasService()
@@ -0,0 +1,145 @@
+# app/services/stats_service.py
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import Date, cast, delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.participacion import Participacion
+from app.models.respuesta import Respuesta
+from app.models.stats_diaria import StatsDiaria
+from app.utils.cache import CacheTTL
+from app.utils.logs import campos
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StatsService:
+    """Servicio para mantener el resumen diario (stats_diarias) que lee el dashboard"""
+
+    # Los usuarios distintos no se pueden sumar entre días ni encuestas, así que no
+    # salen de stats_diarias: se cuentan sobre participaciones y se cachean por worker
+    cache_usuarios_activos = CacheTTL(max_entradas=8, ttl_segundos=settings.cache_dashboard_ttl_segundos)
+
+    @staticmethod
+    async def registrar_participacion(
+        db: AsyncSession,
+        fecha: datetime,
+        id_encuesta: int,
+        respuestas: int,
+        tiempo_respuesta_segundos: Optional[int] = None
+    ) -> None:
+        """
+        Suma una participación al día y encuesta indicados.
+        Se ejecuta dentro de la transacción del llamador; conviene hacerlo justo antes
+        del commit porque la fila del día es compartida por todos los envíos de la encuesta.
+
+        Primero intenta un UPDATE (el caso normal, la fila del día ya existe) y solo
+        si no afectó filas usa INSERT ... ON CONFLICT DO UPDATE, que es más costoso.
+        """
+        dia = fecha.date()
+        tiempo = tiempo_respuesta_segundos or 0
+
+        resultado = await db.execute(
+            update(StatsDiaria)
+            .where(StatsDiaria.fecha == dia, StatsDiaria.id_encuesta == id_encuesta)
+            .values(
+                participaciones=StatsDiaria.participaciones + 1,
+                respuestas=StatsDiaria.respuestas + respuestas,
+                tiempo_respuesta_total=StatsDiaria.tiempo_respuesta_total + tiempo,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount:
+            return
+
+        stmt = pg_insert(StatsDiaria).values(
+            fecha=dia,
+            id_encuesta=id_encuesta,
+            participaciones=1,
+            respuestas=respuestas,
+            tiempo_respuesta_total=tiempo,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StatsDiaria.fecha, StatsDiaria.id_encuesta],
+            set_={
+                "participaciones": StatsDiaria.participaciones + stmt.excluded.participaciones,
+                "respuestas": StatsDiaria.respuestas + stmt.excluded.respuestas,
+                "tiempo_respuesta_total": StatsDiaria.tiempo_respuesta_total + stmt.excluded.tiempo_respuesta_total,
+            },
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def recalcular(db: AsyncSession, desde: Optional[date] = None) -> int:
+        """
+        Reconstruye stats_diarias desde participaciones y respuestas (todo, o a partir de `desde`).
+        Devuelve la cantidad de filas generadas. No hace commit.
+        """
+        fecha = cast(Participacion.fecha_participacion, Date)
+
+        respuestas_por_participacion = (
+            select(Respuesta.id_participacion, func.count().label("cantidad"))
+            .group_by(Respuesta.id_participacion)
+            .subquery()
+        )
+
+        agregado = (
+            select(
+                fecha.label("fecha"),
+                Participacion.id_encuesta,
+                func.count().label("participaciones"),
+                func.coalesce(func.sum(respuestas_por_participacion.c.cantidad), 0).label("respuestas"),
+                func.coalesce(func.sum(Participacion.tiempo_respuesta_segundos), 0).label("tiempo_respuesta_total"),
+            )
+            .outerjoin(
+                respuestas_por_participacion,
+                respuestas_por_participacion.c.id_participacion == Participacion.id_participacion
+            )
+            .where(Participacion.fecha_participacion.is_not(None))
+            .group_by(fecha, Participacion.id_encuesta)
+        )
+
+        borrar = delete(StatsDiaria)
+        if desde is not None:
+            inicio = datetime.combine(desde, datetime.min.time())
+            agregado = agregado.where(Participacion.fecha_participacion >= inicio)
+            borrar = borrar.where(StatsDiaria.fecha >= desde)
+
+        # Bloquea los upserts de la ingesta hasta el commit para no perder ni duplicar filas
+        await db.execute(text("LOCK TABLE stats_diarias IN EXCLUSIVE MODE"))
+        await db.execute(borrar)
+        resultado = await db.execute(
+            pg_insert(StatsDiaria).from_select(
+                ["fecha", "id_encuesta", "participaciones", "respuestas", "tiempo_respuesta_total"],
+                agregado,
+            )
+        )
+        logger.info("stats_diarias recalculada", extra=campos(desde=desde or "inicio", filas=resultado.rowcount))
+        return resultado.rowcount
+
+    @classmethod
+    async def usuarios_activos(cls, db: AsyncSession, dias: int = 30) -> int:
+        """Usuarios distintos que participaron en los últimos `dias` días (cacheado por worker)"""
+        activos = cls.cache_usuarios_activos.obtener(dias)
+        if activos is None:
+            fecha_limite = datetime.now() - timedelta(days=dias)
+            activos = await db.scalar(
+                select(func.count(func.distinct(Participacion.id_usuario)))
+                .where(Participacion.fecha_participacion >= fecha_limite)
+            ) or 0
+            cls.cache_usuarios_activos.guardar(dias, activos)
+        return activos
+
+    @staticmethod
+    def rango_dias(dias: int, hasta: Optional[date] = None) -> list:
+        """Lista de fechas de los últimos `dias` días, terminando en `hasta` (hoy por defecto)"""
+        hasta = hasta or datetime.now().date()
+        return [hasta - timedelta(days=i) for i in range(dias - 1, -1, -1)]
+
+
+# Instancia global del servicio
+stats_service = StatsService()
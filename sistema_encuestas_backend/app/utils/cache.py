@@ -0,0 +1,65 @@
+"""
+Caché en memoria con expiración (TTL) y desalojo LRU
+
+Cada worker de uvicorn mantiene su propia instancia; no se comparte entre procesos.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class CacheTTL:
+    """Caché LRU acotada cuyas entradas expiran después de `ttl_segundos`"""
+
+    def __init__(self, max_entradas: int, ttl_segundos: float):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave: Hashable) -> Optional[Any]:
+        """Devuelve el valor si existe y no expiró, o None"""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+
+            expira, valor = entrada
+            if expira <= ahora:
+                del self._datos[clave]
+                self.fallos += 1
+                return None
+
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave: Hashable, valor: Any) -> None:
+        """Guarda un valor, desalojando la entrada menos usada si se supera el límite"""
+        if self.max_entradas <= 0 or self.ttl_segundos <= 0:
+            return
+
+        expira = time.monotonic() + self.ttl_segundos
+        with self._lock:
+            self._datos[clave] = (expira, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave: Hashable) -> None:
+        """Elimina una entrada si existe"""
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self) -> None:
+        """Elimina todas las entradas"""
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self) -> int:
+        return len(self._datos)
@@ -0,0 +1,184 @@
+"""
+Logging estructurado y no bloqueante
+
+Los loggers de la aplicación solo encolan el LogRecord (QueueHandler); un hilo
+(QueueListener) arma el mensaje y escribe en stdout y, si se configura, en un
+archivo. Así el event loop no espera ni al formateo ni al disco.
+
+Los registros llevan pares clave=valor además del mensaje:
+
+    logger.info("Respuestas registradas", extra=campos(id_encuesta=3, id_usuario=7))
+
+produce
+
+    ts=2024-05-01T12:00:00 nivel=INFO logger=app.routers.respuestas_router msg="Respuestas registradas" id_encuesta=3 id_usuario=7
+
+Solo se escriben los campos pasados con campos(); otras claves de `extra` (por
+ejemplo color_message, que agrega uvicorn con códigos ANSI) se ignoran.
+
+El formateo es diferido: los argumentos y campos se convierten a texto en el
+hilo del listener, por eso deben ser valores simples (números, textos, fechas)
+y no objetos ORM.
+
+Los registros por debajo de WARNING pueden muestrearse por logger
+(LOG_MUESTREO="app.middleware.auth_middleware=0.01,app.routers=0.1"); las
+advertencias y errores nunca se descartan.
+"""
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+def campos(**valores: Any) -> Dict[str, Any]:
+    """Pares clave=valor para pasar como `extra` a una llamada de logging"""
+    return {"campos": valores}
+
+
+def _valor(valor: Any) -> str:
+    texto = str(valor)
+    if not texto or any(c in texto for c in ' "=\n'):
+        return '"' + texto.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+    return texto
+
+
+class FormateadorClaveValor(logging.Formatter):
+    """Formatea cada registro en una línea clave=valor"""
+
+    def __init__(self):
+        super().__init__(datefmt="%Y-%m-%dT%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        partes = [
+            f"ts={self.formatTime(record, self.datefmt)}",
+            f"nivel={record.levelname}",
+            f"logger={record.name}",
+            f"msg={_valor(record.getMessage())}",
+        ]
+        for clave, valor in (getattr(record, "campos", None) or {}).items():
+            partes.append(f"{clave}={_valor(valor)}")
+
+        linea = " ".join(partes)
+        if record.exc_info:
+            linea += "\n" + self.formatException(record.exc_info)
+        if record.stack_info:
+            linea += "\n" + self.formatStack(record.stack_info)
+        return linea
+
+
+class FiltroMuestreo(logging.Filter):
+    """Deja pasar solo una fracción de los registros DEBUG/INFO de cada logger"""
+
+    def __init__(self, tasas: Dict[str, float]):
+        super().__init__()
+        self.tasas = tasas
+        self._tasa_por_logger: Dict[str, float] = {}
+
+    @staticmethod
+    def desde_texto(texto: str) -> "FiltroMuestreo":
+        """Interpreta "logger=tasa,logger=tasa" (tasa entre 0 y 1)"""
+        tasas = {}
+        for par in filter(None, (p.strip() for p in texto.split(","))):
+            nombre, _, tasa = par.partition("=")
+            tasas[nombre.strip()] = min(1.0, max(0.0, float(tasa)))
+        return FiltroMuestreo(tasas)
+
+    def tasa(self, nombre_logger: str) -> float:
+        """Tasa del prefijo configurado más largo que coincide con el logger"""
+        tasa = self._tasa_por_logger.get(nombre_logger)
+        if tasa is None:
+            tasa = 1.0
+            coincidencia = -1
+            for prefijo, valor in self.tasas.items():
+                if (nombre_logger == prefijo or nombre_logger.startswith(prefijo + ".")) and len(prefijo) > coincidencia:
+                    tasa, coincidencia = valor, len(prefijo)
+            self._tasa_por_logger[nombre_logger] = tasa
+        return tasa
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        tasa = self.tasa(record.name)
+        return tasa >= 1.0 or random.random() < tasa
+
+
+class QueueHandlerDiferido(QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo que registra y que, si la cola
+    está llena, descarta el registro en lugar de bloquear.
+    """
+
+    def __init__(self, cola: queue.Queue):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # La versión base llama a format() aquí; el formateo queda para el listener
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandlerDiferido] = None
+
+
+def configurar_logging() -> None:
+    """Instala el QueueHandler en el logger raíz y arranca el listener (una vez por proceso)"""
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    formateador = FormateadorClaveValor()
+    destinos = [logging.StreamHandler(sys.stdout)]
+    if settings.log_archivo:
+        destinos.append(logging.FileHandler(settings.log_archivo, encoding="utf-8"))
+    for destino in destinos:
+        destino.setFormatter(formateador)
+
+    cola: queue.Queue = queue.Queue(maxsize=settings.log_cola_max)
+    _handler = QueueHandlerDiferido(cola)
+    _handler.addFilter(FiltroMuestreo.desde_texto(settings.log_muestreo))
+
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(_handler)
+    raiz.setLevel(settings.log_nivel.upper())
+
+    # uvicorn instala sus propios handlers síncronos (el access log escribe en cada petición)
+    for nombre in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logger_uvicorn = logging.getLogger(nombre)
+        logger_uvicorn.handlers.clear()
+        logger_uvicorn.propagate = True
+
+    _listener = QueueListener(cola, *destinos, respect_handler_level=True)
+    _listener.start()
+    atexit.register(detener_logging)
+
+
+def detener_logging() -> None:
+    """Vacía la cola y detiene el listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def obtener_metricas() -> Dict[str, Any]:
+    """Estado de la cola de logs de este worker"""
+    if _handler is None:
+        return {"activo": False}
+    return {
+        "activo": _listener is not None,
+        "en_cola": _handler.queue.qsize(),
+        "descartados": _handler.descartados,
+    }
@@ -0,0 +1,128 @@
+"""
+Paginación por cursor (keyset) para los listados
+
+Los listados se ordenan de lo más reciente a lo más antiguo por una clave
+(una fecha) y la clave primaria como desempate. El cursor es opaco para el
+cliente: codifica la clave y la clave primaria de la última fila entregada, y
+la página siguiente empieza con WHERE (clave, pk) < (cursor), que el índice
+(..., clave, pk) resuelve sin recorrer las páginas anteriores. Pedir la
+página N cuesta lo mismo que pedir la primera, a diferencia de OFFSET.
+
+La respuesta sigue siendo la lista de filas; el cursor de la página siguiente
+va en el encabezado X-Next-Cursor y falta cuando no hay más filas:
+
+    @router.get("/canjes")
+    async def historial_canjes(response: Response, pagina: Paginacion = Depends(paginacion), ...):
+        query = pagina.aplicar(select(Canje)..., Canje.fecha_solicitud, Canje.id_canje)
+        filas = (await db.execute(query)).scalars().all()
+        return pagina.cerrar(filas, response, lambda c: (c.fecha_solicitud, c.id_canje))
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, Callable, List, Optional, Sequence
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.expression import ColumnElement
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 500
+ENCABEZADO_CURSOR = "X-Next-Cursor"
+
+
+def _valor_a_json(valor: Any) -> Any:
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+def _valor_desde_json(valor: Any, tipo: type) -> Any:
+    if valor is None:
+        return None
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is date:
+        return date.fromisoformat(valor)
+    if tipo is int:
+        if isinstance(valor, bool) or not isinstance(valor, int):
+            raise ValueError("se esperaba un entero")
+        return valor
+    return tipo(valor)
+
+
+def codificar_cursor(valores: Sequence[Any]) -> str:
+    """Cursor opaco (base64 url-safe sin relleno) con los valores de la última fila"""
+    crudo = json.dumps([_valor_a_json(v) for v in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, tipos: Sequence[type]) -> tuple:
+    """Valores del cursor convertidos a `tipos`; lanza 400 si el cursor no es válido"""
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(crudo)
+        if not isinstance(valores, list) or len(valores) != len(tipos):
+            raise ValueError("cantidad de valores incorrecta")
+        valores = tuple(_valor_desde_json(v, t) for v, t in zip(valores, tipos))
+        # La clave primaria (el último valor) nunca es NULL
+        if valores[-1] is None:
+            raise ValueError("clave primaria vacía")
+        return valores
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+class Paginacion:
+    """Cursor y límite de una petición a un listado"""
+
+    def __init__(self, cursor: Optional[str], limite: int):
+        self.cursor = cursor
+        self.limite = limite
+
+    def condicion(self, columnas: Sequence[ColumnElement]) -> Optional[ColumnElement]:
+        """
+        Filas posteriores al cursor en orden descendente de `columnas` ([clave, pk]
+        o [pk]). Con DESC, PostgreSQL pone los NULL primero: un cursor con la
+        clave NULL sigue con el resto de los NULL y después con todas las
+        claves no nulas; con la clave no nula, la comparación de filas deja
+        afuera los NULL que ya se entregaron.
+        """
+        if not self.cursor:
+            return None
+        valores = decodificar_cursor(self.cursor, [c.type.python_type for c in columnas])
+        if len(columnas) == 1:
+            return columnas[0] < valores[0]
+        clave, pk = columnas
+        valor_clave, valor_pk = valores
+        if valor_clave is None:
+            return or_(and_(clave.is_(None), pk < valor_pk), clave.is_not(None))
+        return tuple_(clave, pk) < tuple_(valor_clave, valor_pk)
+
+    def aplicar(self, query: Select, *columnas: ColumnElement) -> Select:
+        """Filtra desde el cursor, ordena de forma descendente y pide una fila de más"""
+        condicion = self.condicion(columnas)
+        if condicion is not None:
+            query = query.where(condicion)
+        return query.order_by(*(c.desc() for c in columnas)).limit(self.limite + 1)
+
+    def cerrar(self, filas: Sequence[Any], response: Response, clave: Callable[[Any], Sequence[Any]]) -> List[Any]:
+        """
+        Recorta la fila de más y, si la había, publica el cursor de la página
+        siguiente en X-Next-Cursor. `clave` devuelve (clave, pk) de una fila.
+        """
+        filas = list(filas)
+        if len(filas) > self.limite:
+            filas = filas[:self.limite]
+            response.headers[ENCABEZADO_CURSOR] = codificar_cursor(clave(filas[-1]))
+        return filas
+
+
+def paginacion(
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO, description="Filas por página"),
+) -> Paginacion:
+    """Dependencia de FastAPI con los parámetros de paginación por cursor"""
+    return Paginacion(cursor, limite)
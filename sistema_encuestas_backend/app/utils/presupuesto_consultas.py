@@ -0,0 +1,82 @@
+"""
+Presupuesto de consultas SQL por ruta
+
+Cada endpoint puede declarar cuántas sentencias SQL debería ejecutar como
+máximo con @presupuesto_consultas(n). verificar_presupuestos_consultas.py
+recorre las rutas con presupuesto y falla si alguna lo supera, y con el
+encabezado X-Query-Budget cualquier petición registra sus sentencias
+agrupadas por huella (ver app/middleware/metricas_middleware.py).
+
+La huella de una sentencia es su texto sin valores: literales, parámetros y
+listas IN se reemplazan por "?", así una consulta ejecutada dentro de un bucle
+aparece como una sola huella repetida N veces.
+"""
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_PARAMETROS = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+")
+_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def huella_sql(sentencia: str) -> str:
+    """Texto de la sentencia sin valores concretos, para agrupar sentencias iguales"""
+    huella = _CADENAS.sub("?", sentencia)
+    huella = _PARAMETROS.sub("?", huella)
+    huella = _NUMEROS.sub("?", huella)
+    huella = _LISTAS.sub("(?, ...)", huella)
+    return _ESPACIOS.sub(" ", huella).strip()
+
+
+def presupuesto_consultas(maximo: int) -> Callable:
+    """
+    Declara el máximo de sentencias SQL de un endpoint. Va debajo del decorador
+    de la ruta:
+
+        @router.get("/activas")
+        @presupuesto_consultas(1)
+        async def obtener_encuestas_activas(...):
+    """
+    def decorador(endpoint: Callable) -> Callable:
+        endpoint.presupuesto_consultas = maximo
+        return endpoint
+    return decorador
+
+
+def presupuesto_de_ruta(ruta) -> Optional[int]:
+    """Presupuesto declarado por el endpoint de la ruta, o None"""
+    return getattr(getattr(ruta, "endpoint", None), "presupuesto_consultas", None)
+
+
+class PresupuestoExcedido(AssertionError):
+    """Un bloque o endpoint ejecutó más sentencias que su presupuesto"""
+
+
+class ReporteConsultas:
+    """Sentencias ejecutadas agrupadas por huella"""
+
+    def __init__(self, sentencias: List[str]):
+        self.sentencias = sentencias
+        self.huellas: Counter = Counter(huella_sql(s) for s in sentencias)
+
+    @property
+    def total(self) -> int:
+        return len(self.sentencias)
+
+    def repetidas(self) -> Dict[str, int]:
+        """Huellas ejecutadas más de una vez (posibles N+1), de más a menos repetida"""
+        return {huella: n for huella, n in self.huellas.most_common() if n > 1}
+
+    def texto(self, maximo: Optional[int] = None) -> str:
+        """Resumen legible: total, presupuesto y cada huella con su cantidad"""
+        encabezado = f"{self.total} sentencias"
+        if maximo is not None:
+            encabezado += f" (presupuesto {maximo})"
+        lineas = [encabezado]
+        for huella, n in self.huellas.most_common():
+            marca = "  ⚠️ " if n > 1 else "    "
+            lineas.append(f"{marca}{n:>3}x {huella[:200]}")
+        return "\n".join(lineas)
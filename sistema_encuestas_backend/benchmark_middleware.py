@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los middlewares de CORS y headers de seguridad
+
+Compara las versiones anteriores (BaseHTTPMiddleware, reproducidas aquí) con
+las versiones ASGI de app/middleware sobre una app mínima de Starlette, para
+medir solo el costo de los middlewares. Las peticiones se envían directamente
+a la app ASGI, sin servidor HTTP ni red.
+
+Casos:
+- json: respuesta JSON pequeña
+- streaming: StreamingResponse de 100 fragmentos
+
+Uso:
+    python benchmark_middleware.py
+    python benchmark_middleware.py --peticiones 10000 --repeticiones 5
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import os
+import time
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app.middleware.cors_middleware import CORSErrorMiddleware
+from app.middleware.security_headers import SecurityHeadersMiddleware
+
+ORIGEN = "http://localhost:3000"
+ORIGENES = [ORIGEN, "http://127.0.0.1:3000"]
+
+
+class CORSErrorMiddlewareLegado(BaseHTTPMiddleware):
+    """Implementación anterior de CORSErrorMiddleware"""
+
+    def __init__(self, app, allowed_origins: list):
+        super().__init__(app)
+        self.allowed_origins = allowed_origins
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        origin = request.headers.get("origin")
+        logging.getLogger("app.middleware.cors_middleware").info(
+            f"🌐 CORS - Petición desde origen: {origin} a {request.method} {request.url.path}"
+        )
+        try:
+            response = await call_next(request)
+        except Exception:
+            response = JSONResponse(status_code=500, content={"detail": "Error interno del servidor"})
+        if origin and origin in self.allowed_origins:
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+            response.headers["Access-Control-Allow-Methods"] = "*"
+            response.headers["Access-Control-Allow-Headers"] = "*"
+        if request.method == "OPTIONS":
+            response.headers["Access-Control-Max-Age"] = "3600"
+        return response
+
+
+class SecurityHeadersMiddlewareLegado(BaseHTTPMiddleware):
+    """Implementación anterior de SecurityHeadersMiddleware"""
+
+    async def dispatch(self, request: Request, call_next):
+        response: Response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
+        csp = (
+            "default-src 'self'; "
+            "script-src 'self' 'unsafe-inline'; "
+            "style-src 'self' 'unsafe-inline'; "
+            "img-src 'self' data: https:; "
+            "font-src 'self'; "
+            "connect-src 'self'"
+        )
+        response.headers["Content-Security-Policy"] = csp
+        if request.url.scheme == "https":
+            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        return response
+
+
+async def json_endpoint(request):
+    return JSONResponse({"pong": True})
+
+
+async def streaming_endpoint(request):
+    async def fragmentos():
+        for i in range(100):
+            yield b"x" * 1024
+    return StreamingResponse(fragmentos(), media_type="application/octet-stream")
+
+
+def crear_app(middlewares):
+    rutas = [Route("/json", json_endpoint), Route("/streaming", streaming_endpoint)]
+    return Starlette(routes=rutas, middleware=middlewares)
+
+
+def crear_apps():
+    return {
+        "sin middleware": crear_app([]),
+        "legado": crear_app([
+            Middleware(CORSErrorMiddlewareLegado, allowed_origins=ORIGENES),
+            Middleware(SecurityHeadersMiddlewareLegado),
+        ]),
+        "asgi": crear_app([
+            Middleware(CORSErrorMiddleware, allowed_origins=ORIGENES),
+            Middleware(SecurityHeadersMiddleware),
+        ]),
+    }
+
+
+async def peticion(app, ruta: str) -> int:
+    """Envía una petición GET a la app ASGI y devuelve los bytes de cuerpo recibidos"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": ruta,
+        "raw_path": ruta.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"testserver"), (b"origin", ORIGEN.encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    recibido = {"bytes": 0, "status": None}
+    cuerpo_enviado = False
+
+    async def receive():
+        nonlocal cuerpo_enviado
+        if not cuerpo_enviado:
+            cuerpo_enviado = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # El cliente no se desconecta: quien espera el disconnect queda bloqueado hasta ser cancelado
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            recibido["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            recibido["bytes"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    assert recibido["status"] == 200
+    return recibido["bytes"]
+
+
+async def medir(app, ruta: str, peticiones: int) -> float:
+    """Peticiones por segundo atendidas en serie"""
+    inicio = time.perf_counter()
+    for _ in range(peticiones):
+        await peticion(app, ruta)
+    return peticiones / (time.perf_counter() - inicio)
+
+
+async def main(args):
+    # El middleware anterior registraba una línea INFO por petición
+    logging.basicConfig(level=logging.INFO, stream=open(os.devnull, "w"))
+
+    apps = crear_apps()
+    print("🚀 Benchmark de middlewares (CORS + headers de seguridad)")
+    print(f"🔁 {args.peticiones} peticiones x {args.repeticiones} repeticiones (mediana)")
+    print("=" * 60)
+    print(f"{'Caso':>10} | {'Middlewares':>15} | {'req/s':>10} | {'vs legado':>9}")
+    print("-" * 60)
+
+    for ruta in ("/json", "/streaming"):
+        resultados = {}
+        for nombre, app in apps.items():
+            await medir(app, ruta, min(500, args.peticiones))  # calentamiento
+            resultados[nombre] = statistics.median(
+                [await medir(app, ruta, args.peticiones) for _ in range(args.repeticiones)]
+            )
+        for nombre, rps in resultados.items():
+            relacion = rps / resultados["legado"]
+            print(f"{ruta.strip('/'):>10} | {nombre:>15} | {rps:>10.0f} | {relacion:>8.2f}x")
+        print("-" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de los middlewares ASGI")
+    parser.add_argument("--peticiones", type=int, default=2000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
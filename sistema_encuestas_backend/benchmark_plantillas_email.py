@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark del renderizado de los correos
+
+Compara, para cada tipo de correo (verificación, bienvenida de Google y
+recuperación de contraseña), el costo por correo de:
+
+- compilar: la plantilla se compila en cada correo, como hacía antes
+  EmailService con jinja2.Template(html_template). Se reproduce con un
+  entorno sin caché de plantillas, que también vuelve a renderizar los
+  estilos y el pie comunes.
+- precompilada: email_service.renderizar, con las plantillas compiladas una
+  vez al iniciar y los estilos y el pie ya renderizados.
+
+También mide el arranque del servicio (compilar todas las plantillas) sin y
+con la caché de bytecode en disco.
+
+Uso:
+    python benchmark_plantillas_email.py
+    python benchmark_plantillas_email.py --correos 5000 --repeticiones 5
+"""
+import argparse
+import logging
+import statistics
+import sys
+import os
+import time
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from markupsafe import Markup
+
+from app.services.email_service import PLANTILLAS, NOMBRE_SISTEMA, crear_entorno_plantillas, email_service
+
+TOKEN = "3f2b8c1e-9d4a-4c7b-8e6f-1a2b3c4d5e6f"
+CORREOS = {
+    "verificacion": (
+        ("verificacion.html", "verificacion.txt"),
+        {"nombre": "María", "token": TOKEN, "verification_link": f"http://localhost:3000/verificar-correo?token={TOKEN}"},
+    ),
+    "bienvenida_google": (
+        ("bienvenida_google.html",),
+        {"nombre": "María"},
+    ),
+    "recuperacion": (
+        ("recuperacion.html", "recuperacion.txt"),
+        {"nombre": "María", "reset_link": f"http://localhost:3000/reset-password?token={TOKEN}"},
+    ),
+}
+
+
+def renderizar_compilando(entorno, plantillas, contexto) -> int:
+    """Compila y renderiza en cada llamada (entorno sin caché)"""
+    globales = {
+        "estilos_base": Markup(entorno.get_template("_estilos.html").render()),
+        "pie": Markup(entorno.get_template("_pie.html").render(nombre_sistema=NOMBRE_SISTEMA)),
+        "nombre_sistema": NOMBRE_SISTEMA,
+        "frontend_url": email_service.frontend_url,
+    }
+    return sum(len(entorno.get_template(p).render(**globales, **contexto)) for p in plantillas)
+
+
+def renderizar_precompilada(plantillas, contexto) -> int:
+    return sum(len(email_service.renderizar(p, **contexto)) for p in plantillas)
+
+
+def medir(funcion, correos: int) -> float:
+    """Microsegundos por correo"""
+    inicio = time.perf_counter()
+    for _ in range(correos):
+        funcion()
+    return (time.perf_counter() - inicio) / correos * 1e6
+
+
+def medir_arranque(cache_bytecode: bool) -> float:
+    """Milisegundos en crear el entorno y compilar todas las plantillas"""
+    inicio = time.perf_counter()
+    entorno = crear_entorno_plantillas(cache_bytecode=cache_bytecode)
+    for nombre in PLANTILLAS + ("_estilos.html", "_pie.html"):
+        entorno.get_template(nombre)
+    return (time.perf_counter() - inicio) * 1000
+
+
+def main(args):
+    logging.disable(logging.WARNING)
+    sin_cache = crear_entorno_plantillas(cache_bytecode=False).overlay(cache_size=0)
+
+    print("🚀 Benchmark de plantillas de correo")
+    print(f"🔁 {args.correos} correos x {args.repeticiones} repeticiones (mediana)")
+    print("=" * 64)
+    print(f"{'Correo':>18} | {'compilar µs':>12} | {'precompilada µs':>15} | {'mejora':>8}")
+    print("-" * 64)
+
+    for tipo, (plantillas, contexto) in CORREOS.items():
+        antes = lambda: renderizar_compilando(sin_cache, plantillas, contexto)
+        despues = lambda: renderizar_precompilada(plantillas, contexto)
+        # Mismo contenido por los dos caminos
+        assert antes() == despues(), f"{tipo}: los dos caminos no generan el mismo correo"
+        medir(antes, min(200, args.correos))  # calentamiento
+        medir(despues, min(200, args.correos))
+        t_antes = statistics.median(medir(antes, args.correos) for _ in range(args.repeticiones))
+        t_despues = statistics.median(medir(despues, args.correos) for _ in range(args.repeticiones))
+        print(f"{tipo:>18} | {t_antes:>12.1f} | {t_despues:>15.1f} | {t_antes / t_despues:>7.1f}x")
+    print("-" * 64)
+
+    medir_arranque(cache_bytecode=True)  # deja la caché de bytecode escrita
+    sin_bytecode = statistics.median(medir_arranque(False) for _ in range(args.repeticiones))
+    con_bytecode = statistics.median(medir_arranque(True) for _ in range(args.repeticiones))
+    print(f"Arranque (compilar {len(PLANTILLAS)} plantillas): {sin_bytecode:.1f} ms sin caché de bytecode, "
+          f"{con_bytecode:.1f} ms con caché")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Costo de renderizar cada correo, compilando o precompilado")
+    parser.add_argument("--correos", type=int, default=2000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    main(parser.parse_args())
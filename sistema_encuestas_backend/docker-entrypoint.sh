@@ -119,11 +119,16 @@ echo "🎯 Iniciando aplicación FastAPI..."
 export PYTHONPATH=/app
 export PYTHONUNBUFFERED=1
 
+# Métricas Prometheus compartidas entre workers: el directorio debe empezar vacío
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 # Iniciar uvicorn con configuración optimizada para producción
 exec uvicorn app.main:app \
     --host 0.0.0.0 \
     --port 8000 \
-    --workers 4 \
+    --workers ${WEB_CONCURRENCY:-4} \
     --worker-class uvicorn.workers.UvicornWorker \
     --access-log \
     --log-level info \
@@ -26,23 +26,81 @@ def conectar_db():
         print(f"❌ Error conectando a la base de datos: {e}")
         return None
 
-def ejecutar_sql_file(cursor, file_path):
-    """Ejecuta un archivo SQL"""
+def dividir_comandos(sql_content):
+    """
+    Divide un archivo SQL en comandos y quita las líneas de comentario de cada uno.
+    Los ';' dentro de bloques $$ ... $$ (cuerpos de funciones) no cortan el comando.
+    """
+    commands = []
+    actual = []
+    en_bloque = False
+    for linea in sql_content.splitlines():
+        if not en_bloque and linea.strip().startswith('--'):
+            continue
+        partes = linea.split('$$')
+        for i, parte in enumerate(partes):
+            if i > 0:
+                en_bloque = not en_bloque
+                actual.append('$$')
+            if en_bloque:
+                actual.append(parte)
+                continue
+            trozos = parte.split(';')
+            actual.append(trozos[0])
+            for trozo in trozos[1:]:
+                commands.append(''.join(actual).strip())
+                actual = [trozo]
+        actual.append('\n')
+    commands.append(''.join(actual).strip())
+    return [c for c in commands if c]
+
+def ejecutar_sql_file(cursor, file_path, autocommit=False, estricta=False):
+    """
+    Ejecuta un archivo SQL.
+    Con autocommit=True cada comando se confirma por separado, sin savepoints
+    (necesario para CREATE INDEX CONCURRENTLY, que no puede ir en una transacción).
+    Con estricta=True el primer comando que falla revierte el archivo completo y
+    devuelve False, en lugar de seguir con un warning.
+    """
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             sql_content = f.read()
         
-        # Dividir por comandos y ejecutar
-        commands = [cmd.strip() for cmd in sql_content.split(';') if cmd.strip() and not cmd.strip().startswith('--')]
+        commands = dividir_comandos(sql_content)
+        
+        if estricta:
+            cursor.execute("SAVEPOINT migracion_archivo")
+            try:
+                for command in commands:
+                    cursor.execute(command)
+                cursor.execute("RELEASE SAVEPOINT migracion_archivo")
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT migracion_archivo")
+                print(f"❌ Error en comando, migración revertida: {e}")
+                return False
+            print(f"✅ {file_path} - {len(commands)} comandos ejecutados")
+            return True
         
         executed = 0
         for command in commands:
-            if command.strip():
+            if not command.strip():
+                continue
+            if autocommit:
                 try:
                     cursor.execute(command)
                     executed += 1
                 except psycopg2.Error as e:
                     print(f"⚠️  Warning en comando: {e}")
+                continue
+            # Un savepoint por comando para que un fallo no aborte toda la transacción
+            cursor.execute("SAVEPOINT migracion_comando")
+            try:
+                cursor.execute(command)
+                cursor.execute("RELEASE SAVEPOINT migracion_comando")
+                executed += 1
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT migracion_comando")
+                print(f"⚠️  Warning en comando: {e}")
         
         print(f"✅ {file_path} - {executed} comandos ejecutados")
         return True
@@ -105,6 +163,45 @@ def main():
         {
             'file': 'app/migrations/add_profile_fields.sql',
             'name': 'Campos de perfil (fecha_nacimiento, sexo, localizacion)'
+        },
+        {
+            'file': 'app/migrations/add_unique_participacion.sql',
+            'name': 'Participación única por usuario y encuesta',
+            'estricta': True
+        },
+        {
+            'file': 'app/migrations/create_stats_diarias.sql',
+            'name': 'Resumen diario para el dashboard (stats_diarias)'
+        },
+        {
+            'file': 'app/migrations/add_version_encuestas.sql',
+            'name': 'Versión de la definición de encuestas'
+        },
+        {
+            'file': 'app/migrations/add_version_configuraciones.sql',
+            'name': 'Versión de la configuración y aviso entre workers'
+        },
+        {
+            'file': 'app/migrations/add_catalogo_premios.sql',
+            'name': 'Contador de canjes por premio e índices del catálogo'
+        },
+        {
+            'file': 'app/migrations/add_movimientos_puntos.sql',
+            'name': 'Libro de movimientos de puntos'
+        },
+        {
+            'file': 'app/migrations/add_email_outbox.sql',
+            'name': 'Bandeja de salida de correos'
+        },
+        {
+            'file': 'app/migrations/add_indices_consultas.sql',
+            'name': 'Índices para las consultas frecuentes (CONCURRENTLY)',
+            'autocommit': True
+        },
+        {
+            'file': 'app/migrations/add_indices_paginacion.sql',
+            'name': 'Índices para la paginación por cursor (CONCURRENTLY)',
+            'autocommit': True
         }
     ]
     
@@ -113,10 +210,26 @@ def main():
     # Ejecutar cada migración
     for migracion in migraciones:
         print(f"\n📦 Ejecutando: {migracion['name']}")
-        if ejecutar_sql_file(cursor, migracion['file']):
+        autocommit = migracion.get('autocommit', False)
+        if autocommit:
+            # Confirmar lo anterior y ejecutar este archivo fuera de una transacción
+            conn.commit()
+            conn.autocommit = True
+        ok = ejecutar_sql_file(
+            cursor, migracion['file'], autocommit=autocommit, estricta=migracion.get('estricta', False)
+        )
+        if autocommit:
+            conn.autocommit = False
+        if ok:
             success_count += 1
         else:
             print(f"❌ Falló: {migracion['name']}")
+            if migracion.get('estricta'):
+                # La aplicación depende de esta migración: no se confirma nada
+                conn.rollback()
+                conn.close()
+                print("❌ Migraciones revertidas; corrija el error y vuelva a ejecutar")
+                sys.exit(1)
     
     # Confirmar cambios
     conn.commit()
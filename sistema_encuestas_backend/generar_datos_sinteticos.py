@@ -0,0 +1,606 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos para benchmarks a escala
+
+Crea usuarios con datos demográficos (edad, sexo y localización según
+CodeSystem-GeoCiudadesPYCS.json), encuestas con preguntas de opción múltiple
+(sí/no, escala de 5 y listas) y de texto libre, y millones de participaciones
+y respuestas con distribuciones sesgadas: pocas encuestas concentran la
+mayoría de las participaciones (Zipf) y pocos usuarios participan mucho más
+que el resto.
+
+Todo se carga con COPY (formato binario de asyncpg) en tramos que se generan
+y cargan en paralelo, cada uno en su propio proceso y conexión. Con la misma
+semilla se generan exactamente los mismos datos: los ids se reservan en bloque
+al inicio y cada tramo usa un generador aleatorio derivado de la semilla.
+
+Los datos quedan marcados con el lote (por defecto "s<semilla>"): los emails
+son sint_<lote>_<n>@example.com y los títulos empiezan con [<lote>]. Todos los
+usuarios generados tienen la contraseña "sintetico123".
+
+Uso:
+    python generar_datos_sinteticos.py --usuarios 200000 --encuestas 300 --respuestas 10000000
+    python generar_datos_sinteticos.py --respuestas 10000000 --procesos 8 --diferir-indices --recalcular-stats
+    python generar_datos_sinteticos.py --eliminar s42
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncpg
+
+from app.config import settings
+
+PASSWORD = "sintetico123"
+ARCHIVO_CIUDADES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "CodeSystem-GeoCiudadesPYCS.json")
+
+# Peso aproximado (miles de habitantes) de las ciudades más pobladas; el resto pesa PESO_CIUDAD_MENOR
+PESOS_CIUDADES = {
+    "0": 520, "1001": 300, "1109": 280, "1114": 260, "1102": 240, "1103": 175, "1108": 140,
+    "1107": 130, "701": 130, "1301": 120, "1112": 100, "1110": 100, "1106": 90, "1115": 80,
+}
+PESO_CIUDAD_MENOR = 15
+
+SEXOS = ("M", "F", "Otro", "Prefiero no decir")
+PESOS_SEXOS = (48.5, 48.5, 1.5, 1.5)
+
+# Edad de los usuarios: (desde, hasta, peso)
+EDADES = ((18, 24, 24), (25, 34, 30), (35, 44, 20), (45, 54, 13), (55, 64, 8), (65, 80, 5))
+
+# Actividad por hora del día (participaciones)
+PESOS_HORAS = (1, 1, 1, 1, 1, 2, 3, 5, 7, 8, 8, 8, 9, 8, 7, 7, 8, 9, 10, 11, 10, 8, 5, 3)
+
+NOMBRES = (
+    "María", "José", "Juan", "Ana", "Carlos", "Luis", "Rosa", "Jorge", "Carmen", "Miguel", "Laura", "Pedro",
+    "Sofía", "Diego", "Lucía", "Fernando", "Gabriela", "Ramón", "Patricia", "Alberto", "Mónica", "Raúl",
+)
+APELLIDOS = (
+    "González", "Benítez", "Martínez", "López", "Giménez", "Vera", "Duarte", "Ramírez", "Fernández",
+    "Villalba", "Rojas", "Acosta", "Báez", "Cáceres", "Ortiz", "Sanabria", "Núñez", "Escobar", "Ayala",
+)
+TEMAS = (
+    "Satisfacción con el servicio", "Hábitos de consumo", "Transporte público", "Uso de billeteras digitales",
+    "Preferencias de compra", "Salud y bienestar", "Educación", "Turismo interno", "Conectividad", "Alimentación",
+)
+TEXTOS_LIBRES = (
+    "Muy buena experiencia", "Podría mejorar la atención", "Sin comentarios", "Precios altos",
+    "Me gustaría más opciones", "Todo bien", "La aplicación es lenta", "Excelente", "Regular", "No lo uso",
+)
+OPCIONES_SI_NO = ("Sí", "No")
+OPCIONES_ESCALA = ("Muy en desacuerdo", "En desacuerdo", "Neutral", "De acuerdo", "Muy de acuerdo")
+
+# Filas por tarea: cada bloque de usuarios o tramo de participaciones se genera y se carga en un proceso.
+# Son fijos (no dependen de --procesos) para que la misma semilla genere los mismos datos.
+BLOQUE_USUARIOS = 50_000
+TAMANO_TRAMO = 50_000
+# Parte de los usuarios que puede participar en una misma encuesta como máximo
+COBERTURA_MAXIMA = 0.9
+PROBABILIDAD_TEXTO = 0.6
+
+COLUMNAS_USUARIOS = (
+    "id_usuario", "nombre", "apellido", "documento_numero", "celular_numero", "email", "metodo_registro",
+    "password_hash", "estado", "rol_id", "fecha_registro", "email_verificado", "fecha_verificacion",
+    "proveedor_auth", "puntos_totales", "puntos_disponibles", "puntos_canjeados", "fecha_nacimiento", "sexo",
+    "localizacion",
+)
+COLUMNAS_PARTICIPACIONES = (
+    "id_participacion", "id_usuario", "id_encuesta", "fecha_participacion", "puntaje_obtenido",
+    "tiempo_respuesta_segundos",
+)
+COLUMNAS_RESPUESTAS = ("id_pregunta", "id_usuario", "id_participacion", "id_opcion", "respuesta_texto", "fecha_respuesta")
+
+
+@dataclass(frozen=True)
+class PlanPregunta:
+    id_pregunta: int
+    opciones: Tuple[int, ...]  # vacío = texto libre
+    acumulados: Tuple[float, ...]  # pesos acumulados de las opciones
+
+
+@dataclass(frozen=True)
+class PlanEncuesta:
+    numero: int
+    id_encuesta: int
+    puntos: int
+    inicio: datetime
+    segundos_ventana: int
+    preguntas: Tuple[PlanPregunta, ...]
+
+    @property
+    def respuestas_esperadas(self) -> float:
+        return sum(1 if p.opciones else PROBABILIDAD_TEXTO for p in self.preguntas)
+
+
+@dataclass(frozen=True)
+class Tramo:
+    indice: int
+    encuesta: PlanEncuesta
+    cantidad: int
+    franja: int  # los usuarios del tramo cumplen id % franjas == franja: tramos de una encuesta no se solapan
+    franjas: int
+    id_participacion_inicio: int
+
+
+def azar_de(semilla: int, *partes) -> random.Random:
+    """Generador determinista por semilla y parte (las semillas str no dependen de PYTHONHASHSEED)"""
+    return random.Random(":".join(str(p) for p in (semilla,) + partes))
+
+
+def dsn() -> str:
+    return settings.database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+def cargar_ciudades() -> Tuple[List[str], List[float]]:
+    with open(ARCHIVO_CIUDADES, encoding="utf-8") as archivo:
+        conceptos = json.load(archivo)["concept"]
+    codigos = [c["code"] for c in conceptos]
+    return codigos, acumular(PESOS_CIUDADES.get(c, PESO_CIUDAD_MENOR) for c in codigos)
+
+
+def acumular(pesos) -> List[float]:
+    acumulados, total = [], 0.0
+    for peso in pesos:
+        total += peso
+        acumulados.append(total)
+    return acumulados
+
+
+def elegir(azar: random.Random, valores, acumulados):
+    return valores[bisect(acumulados, azar.random() * acumulados[-1])]
+
+
+async def reservar_ids(conexion, tabla: str, columna: str, cantidad: int) -> int:
+    """Reserva `cantidad` ids consecutivos de la secuencia de la tabla y devuelve el primero"""
+    if cantidad <= 0:
+        return 0
+    ultimo = await conexion.fetchval(
+        "SELECT setval(pg_get_serial_sequence($1, $2), nextval(pg_get_serial_sequence($1, $2)) + $3 - 1)",
+        tabla, columna, cantidad
+    )
+    return ultimo - cantidad + 1
+
+
+# ---------------------------------------------------------------------------
+# Usuarios
+# ---------------------------------------------------------------------------
+
+def filas_usuarios(semilla: int, lote: str, desde: int, hasta: int, id_base: int, password_hash: str, ahora: datetime, dias: int):
+    ciudades, acumulados_ciudades = cargar_ciudades()
+    acumulados_sexos = acumular(PESOS_SEXOS)
+    acumulados_edades = acumular(peso for _, _, peso in EDADES)
+    azar = azar_de(semilla, "usuarios", desde)
+    for indice in range(desde, hasta):
+        edad_min, edad_max, _ = elegir(azar, EDADES, acumulados_edades)
+        nacimiento = ahora - timedelta(days=azar.randint(edad_min * 365, edad_max * 365 + 364))
+        registro = ahora - timedelta(seconds=azar.randint(0, dias * 86400))
+        yield (
+            id_base + indice, azar.choice(NOMBRES), azar.choice(APELLIDOS), f"{lote}-{indice}",
+            f"09{azar.randint(71, 99)}{azar.randint(100000, 999999)}", f"sint_{lote}_{indice}@example.com",
+            "local", password_hash, True, 3, registro, True, registro, "local", 0, 0, 0,
+            nacimiento.replace(hour=0, minute=0, second=0, microsecond=0),
+            elegir(azar, SEXOS, acumulados_sexos), elegir(azar, ciudades, acumulados_ciudades),
+        )
+
+
+async def _cargar_usuarios(url: str, *args) -> int:
+    conexion = await asyncpg.connect(url)
+    try:
+        resultado = await conexion.copy_records_to_table("usuarios", records=filas_usuarios(*args), columns=COLUMNAS_USUARIOS)
+        return int(resultado.split()[-1])
+    finally:
+        await conexion.close()
+
+
+def cargar_usuarios(url: str, *args) -> Tuple[str, int, int]:
+    """Proceso hijo: genera y copia un bloque de usuarios"""
+    return "usuarios", asyncio.run(_cargar_usuarios(url, *args)), 0
+
+
+# ---------------------------------------------------------------------------
+# Encuestas, preguntas y opciones (pocas filas: se generan en el proceso principal)
+# ---------------------------------------------------------------------------
+
+async def crear_encuestas(conexion, args, lote: str, ahora: datetime) -> List[PlanEncuesta]:
+    azar = azar_de(args.semilla, "encuestas")
+    cantidades = [azar.randint(args.preguntas_min, args.preguntas_max) for _ in range(args.encuestas)]
+    tipos = []  # (tipo, opciones) por pregunta, en orden
+    for cantidad in cantidades:
+        for _ in range(cantidad):
+            sorteo = azar.random()
+            if sorteo < 0.15:
+                tipos.append(("texto_libre", ()))
+            elif sorteo < 0.4:
+                tipos.append(("opcion_multiple", OPCIONES_SI_NO))
+            elif sorteo < 0.7:
+                tipos.append(("opcion_multiple", OPCIONES_ESCALA))
+            else:
+                tipos.append(("opcion_multiple", tuple(f"Opción {k + 1}" for k in range(azar.randint(3, 7)))))
+
+    id_encuesta = await reservar_ids(conexion, "encuestas", "id_encuesta", args.encuestas)
+    id_pregunta = await reservar_ids(conexion, "preguntas", "id_pregunta", len(tipos))
+    id_opcion = await reservar_ids(conexion, "opciones", "id_opcion", sum(len(o) for _, o in tipos))
+    id_creador = await conexion.fetchval("SELECT min(id_usuario) FROM usuarios WHERE rol_id = 1")
+
+    encuestas, preguntas, opciones, planes = [], [], [], []
+    posicion = 0
+    for numero, cantidad in enumerate(cantidades):
+        inicio = ahora - timedelta(days=azar.randint(1, args.dias))
+        duracion = timedelta(days=azar.randint(7, 120))
+        fin = min(inicio + duracion, ahora)
+        puntos = azar.choice((5, 10, 10, 15, 20, 25))
+        tema = azar.choice(TEMAS)
+        encuestas.append((
+            id_encuesta + numero, f"[{lote}] {tema} #{numero + 1}", f"Encuesta sintética sobre {tema.lower()}",
+            inicio.date(), (inicio + duracion).date(), puntos, True, inicio, id_creador,
+            f"{max(1, cantidad // 3)} min", "usuarios", 1,
+        ))
+        planes_preguntas = []
+        for orden in range(cantidad):
+            tipo, textos = tipos[posicion]
+            posicion += 1
+            preguntas.append((id_pregunta, id_encuesta + numero, orden + 1, tipo, f"{tema}: pregunta {orden + 1}"))
+            ids_opciones = tuple(range(id_opcion, id_opcion + len(textos)))
+            for id_o, texto in zip(ids_opciones, textos):
+                opciones.append((id_o, id_pregunta, texto))
+            # Preferencias sesgadas: algunas opciones se eligen mucho más que otras
+            pesos = [azar.random() ** 2 + 0.02 for _ in textos]
+            planes_preguntas.append(PlanPregunta(id_pregunta, ids_opciones, tuple(acumular(pesos))))
+            id_pregunta += 1
+            id_opcion += len(textos)
+        planes.append(PlanEncuesta(
+            numero, id_encuesta + numero, puntos, inicio, max(3600, int((fin - inicio).total_seconds())), tuple(planes_preguntas)
+        ))
+
+    await conexion.copy_records_to_table("encuestas", records=encuestas, columns=(
+        "id_encuesta", "titulo", "descripcion", "fecha_inicio", "fecha_fin", "puntos_otorga", "estado",
+        "fecha_creacion", "id_usuario_creador", "tiempo_estimado", "visible_para", "version",
+    ))
+    await conexion.copy_records_to_table("preguntas", records=preguntas, columns=("id_pregunta", "id_encuesta", "orden", "tipo", "texto"))
+    await conexion.copy_records_to_table("opciones", records=opciones, columns=("id_opcion", "id_pregunta", "texto_opcion"))
+    return planes
+
+
+# ---------------------------------------------------------------------------
+# Participaciones y respuestas
+# ---------------------------------------------------------------------------
+
+def planificar_tramos(planes: List[PlanEncuesta], args, id_participacion_inicio: int) -> List[Tramo]:
+    """Reparte las participaciones entre encuestas con pesos Zipf y las divide en tramos"""
+    pesos = [1 / (rango + 1) ** args.sesgo_encuestas for rango in range(len(planes))]
+    azar_de(args.semilla, "popularidad").shuffle(pesos)
+    total_pesos = sum(pesos)
+    respuestas_por_participacion = sum(p * e.respuestas_esperadas for p, e in zip(pesos, planes)) / total_pesos
+    participaciones = args.respuestas / respuestas_por_participacion
+    maximo = int(args.usuarios * COBERTURA_MAXIMA)
+
+    tramos, siguiente_id = [], id_participacion_inicio
+    for peso, plan in zip(pesos, planes):
+        cantidad = min(maximo, round(participaciones * peso / total_pesos))
+        if cantidad == 0:
+            continue
+        franjas = math.ceil(cantidad / TAMANO_TRAMO)
+        for franja in range(franjas):
+            porcion = cantidad // franjas + (1 if franja < cantidad % franjas else 0)
+            tramos.append(Tramo(len(tramos), plan, porcion, franja, franjas, siguiente_id))
+            siguiente_id += porcion
+    return tramos
+
+
+def elegir_usuarios(azar: random.Random, tramo: Tramo, usuarios: int, sesgo: float) -> List[int]:
+    """
+    Índices de usuario distintos para el tramo. Los índices bajos participan
+    más (índice = N · u^sesgo) y solo se usan los de la franja del tramo, así
+    dos tramos de la misma encuesta nunca repiten usuario.
+    """
+    franjas, franja = tramo.franjas, tramo.franja
+    # Índices de la franja: franja, franja + franjas, ...
+    capacidad = (usuarios - franja + franjas - 1) // franjas
+    elegidos, vistos = [], set()
+    for _ in range(tramo.cantidad):
+        for _intento in range(8):
+            posicion = int(capacidad * azar.random() ** sesgo)
+            if posicion not in vistos:
+                break
+        else:
+            # Zona muy ocupada: se busca el siguiente libre
+            while posicion in vistos:
+                posicion = (posicion + 1) % capacidad
+        vistos.add(posicion)
+        elegidos.append(posicion * franjas + franja)
+    return elegidos
+
+
+def filas_tramo(tramo: Tramo, semilla: int, usuarios: int, id_usuario_base: int, sesgo: float):
+    azar = azar_de(semilla, "tramo", tramo.encuesta.numero, tramo.franja)
+    plan = tramo.encuesta
+    acumulados_horas = acumular(PESOS_HORAS)
+    participaciones = []
+    for numero, indice in enumerate(elegir_usuarios(azar, tramo, usuarios, sesgo)):
+        dia = plan.inicio + timedelta(seconds=azar.randint(0, plan.segundos_ventana))
+        hora = elegir(azar, range(24), acumulados_horas)
+        fecha = dia.replace(hour=hora, minute=azar.randint(0, 59), second=azar.randint(0, 59), microsecond=0)
+        duracion = int(azar.lognormvariate(5.0, 0.6))  # mediana ~150 s
+        participaciones.append((
+            tramo.id_participacion_inicio + numero, id_usuario_base + indice, plan.id_encuesta, fecha, plan.puntos, duracion,
+        ))
+
+    def respuestas():
+        for id_participacion, id_usuario, _, fecha, _, duracion in participaciones:
+            paso = timedelta(seconds=duracion / max(1, len(plan.preguntas)))
+            momento = fecha
+            for pregunta in plan.preguntas:
+                momento += paso
+                if pregunta.opciones:
+                    yield (pregunta.id_pregunta, id_usuario, id_participacion,
+                           elegir(azar, pregunta.opciones, pregunta.acumulados), None, momento)
+                elif azar.random() < PROBABILIDAD_TEXTO:
+                    yield (pregunta.id_pregunta, id_usuario, id_participacion, None, azar.choice(TEXTOS_LIBRES), momento)
+
+    return participaciones, respuestas()
+
+
+async def _cargar_tramo(url: str, tramo: Tramo, *args) -> Tuple[int, int]:
+    participaciones, respuestas = filas_tramo(tramo, *args)
+    conexion = await asyncpg.connect(url)
+    try:
+        async with conexion.transaction():
+            await conexion.copy_records_to_table("participaciones", records=participaciones, columns=COLUMNAS_PARTICIPACIONES)
+            resultado = await conexion.copy_records_to_table("respuestas", records=respuestas, columns=COLUMNAS_RESPUESTAS)
+        return len(participaciones), int(resultado.split()[-1])
+    finally:
+        await conexion.close()
+
+
+def cargar_tramo(url: str, tramo: Tramo, *args) -> Tuple[str, int, int]:
+    """Proceso hijo: genera y copia las participaciones y respuestas de un tramo"""
+    return "tramo", *asyncio.run(_cargar_tramo(url, tramo, *args))
+
+
+# ---------------------------------------------------------------------------
+# Índices, puntos y limpieza
+# ---------------------------------------------------------------------------
+
+async def quitar_indices(conexion) -> List[str]:
+    """
+    Elimina las claves foráneas y los índices secundarios (no únicos) de
+    participaciones y respuestas. Devuelve las sentencias para recrearlos.
+    """
+    claves = await conexion.fetch("""
+        SELECT conrelid::regclass::text AS tabla, conname AS nombre, pg_get_constraintdef(oid) AS definicion
+        FROM pg_constraint
+        WHERE conrelid IN ('participaciones'::regclass, 'respuestas'::regclass) AND contype = 'f'
+    """)
+    indices = await conexion.fetch("""
+        SELECT i.relname AS nombre, pg_get_indexdef(i.oid) AS definicion
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid IN ('participaciones'::regclass, 'respuestas'::regclass)
+          AND NOT x.indisunique AND NOT x.indisprimary
+    """)
+    for clave in claves:
+        await conexion.execute(f'ALTER TABLE {clave["tabla"]} DROP CONSTRAINT "{clave["nombre"]}"')
+    for indice in indices:
+        await conexion.execute(f'DROP INDEX "{indice["nombre"]}"')
+    # Primero los índices: validar las claves foráneas es más rápido con ellos
+    return [i["definicion"] for i in indices] + [
+        f'ALTER TABLE {c["tabla"]} ADD CONSTRAINT "{c["nombre"]}" {c["definicion"]}' for c in claves
+    ]
+
+
+async def restaurar_indices(conexion, sentencias: List[str]) -> None:
+    for sentencia in sentencias:
+        inicio = time.perf_counter()
+        await conexion.execute(sentencia)
+        print(f"   🔧 {sentencia[:90]} ({time.perf_counter() - inicio:.1f} s)")
+
+
+async def eliminar_lote(lote: str) -> None:
+    encuestas = "SELECT id_encuesta FROM encuestas WHERE titulo LIKE $1"
+    usuarios = "SELECT id_usuario FROM usuarios WHERE email LIKE $2"
+    titulos, emails = f"[{lote}] %", f"sint\\_{lote}\\_%"
+    sentencias = (
+        ("respuestas", f"DELETE FROM respuestas WHERE id_participacion IN (SELECT id_participacion FROM participaciones WHERE id_encuesta IN ({encuestas}) OR id_usuario IN ({usuarios}))", titulos, emails),
+        ("participaciones", f"DELETE FROM participaciones WHERE id_encuesta IN ({encuestas}) OR id_usuario IN ({usuarios})", titulos, emails),
+        ("stats_diarias", f"DELETE FROM stats_diarias WHERE id_encuesta IN ({encuestas})", titulos),
+        ("opciones", f"DELETE FROM opciones WHERE id_pregunta IN (SELECT id_pregunta FROM preguntas WHERE id_encuesta IN ({encuestas}))", titulos),
+        ("preguntas", f"DELETE FROM preguntas WHERE id_encuesta IN ({encuestas})", titulos),
+        ("encuestas", "DELETE FROM encuestas WHERE titulo LIKE $1", titulos),
+        ("usuarios", "DELETE FROM usuarios WHERE email LIKE $1", emails),
+    )
+    conexion = await asyncpg.connect(dsn())
+    try:
+        async with conexion.transaction():
+            for tabla, sentencia, *parametros in sentencias:
+                resultado = await conexion.execute(sentencia, *parametros)
+                print(f"   🗑️ {tabla}: {resultado.split()[-1]} filas")
+    finally:
+        await conexion.close()
+
+
+# ---------------------------------------------------------------------------
+
+def ejecutar_en_paralelo(procesos: int, tareas: list, etiqueta: str, total_esperado: int) -> Tuple[int, int]:
+    """Ejecuta (función, args) en procesos hijos mostrando el avance; devuelve filas principales y respuestas"""
+    principales = respuestas = 0
+    inicio = time.perf_counter()
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+        futuros = [pool.submit(funcion, *argumentos) for funcion, argumentos in tareas]
+        for futuro in as_completed(futuros):
+            _, filas, filas_respuestas = futuro.result()
+            principales += filas
+            respuestas += filas_respuestas
+            segundos = time.perf_counter() - inicio
+            print(
+                f"\r   {etiqueta}: {principales:,}/{total_esperado:,}"
+                + (f" · respuestas {respuestas:,} ({respuestas / segundos:,.0f}/s)" if respuestas else "")
+                + f" · {segundos:.1f} s",
+                end="", flush=True
+            )
+    print()
+    return principales, respuestas
+
+
+async def preparar(args, lote: str):
+    conexion = await asyncpg.connect(dsn())
+    try:
+        existentes = await conexion.fetchval("SELECT count(*) FROM usuarios WHERE email LIKE $1", f"sint\\_{lote}\\_%")
+        if existentes:
+            raise SystemExit(f"❌ El lote {lote} ya existe ({existentes} usuarios). Usa --lote u --eliminar {lote}")
+        id_usuario_base = await reservar_ids(conexion, "usuarios", "id_usuario", args.usuarios)
+        indices = await quitar_indices(conexion) if args.diferir_indices else []
+        return id_usuario_base, indices
+    finally:
+        await conexion.close()
+
+
+async def finalizar(args, planes: List[PlanEncuesta], id_usuario_base: int, indices) -> None:
+    conexion = await asyncpg.connect(dsn())
+    try:
+        if indices:
+            print("🔧 Recreando índices y claves foráneas...")
+            await restaurar_indices(conexion, indices)
+        print("🪙 Registrando movimientos de puntos y saldos de los usuarios...")
+        await conexion.execute("""
+            WITH movimientos AS (
+                INSERT INTO movimientos_puntos (id_usuario, tipo, puntos, id_participacion, fecha)
+                SELECT id_usuario, 'participacion', puntaje_obtenido, id_participacion, fecha_participacion
+                FROM participaciones
+                WHERE id_usuario BETWEEN $1 AND $2 AND puntaje_obtenido <> 0
+                RETURNING id_usuario, puntos
+            )
+            UPDATE usuarios u
+            SET puntos_totales = s.total, puntos_disponibles = s.total
+            FROM (
+                SELECT id_usuario, sum(puntos) AS total
+                FROM movimientos
+                GROUP BY id_usuario
+            ) s
+            WHERE u.id_usuario = s.id_usuario
+        """, id_usuario_base, id_usuario_base + args.usuarios - 1)
+        print("📊 ANALYZE...")
+        for tabla in ("usuarios", "encuestas", "preguntas", "opciones", "participaciones", "respuestas", "movimientos_puntos"):
+            await conexion.execute(f"ANALYZE {tabla}")
+    finally:
+        await conexion.close()
+
+    if args.recalcular_stats and not planes:
+        # Falló antes de planificar las encuestas: no se cargaron participaciones de este lote
+        print("⚪ Sin encuestas planificadas; no se recalcula stats_diarias")
+    elif args.recalcular_stats:
+        from sqlalchemy.ext.asyncio import AsyncSession
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import NullPool
+        from app.database import crear_engine
+        from app.services.stats_service import stats_service
+
+        print("📈 Recalculando stats_diarias...")
+        engine = crear_engine(statement_timeout_ms=0, poolclass=NullPool)
+        async with sessionmaker(bind=engine, class_=AsyncSession)() as db:
+            filas = await stats_service.recalcular(db, desde=min(p.inicio for p in planes).date())
+        await engine.dispose()
+        print(f"   {filas} filas")
+
+
+async def crear_encuestas_y_tramos(args, lote: str, ahora: datetime) -> Tuple[List[PlanEncuesta], List[Tramo]]:
+    conexion = await asyncpg.connect(dsn())
+    try:
+        planes = await crear_encuestas(conexion, args, lote, ahora)
+        # Se reserva una vez planificado, para conocer el total exacto
+        tramos = planificar_tramos(planes, args, 0)
+        total = sum(t.cantidad for t in tramos)
+        id_inicio = await reservar_ids(conexion, "participaciones", "id_participacion", total)
+        return planes, planificar_tramos(planes, args, id_inicio)
+    finally:
+        await conexion.close()
+
+
+def main(args) -> int:
+    if args.eliminar:
+        print(f"🗑️ Eliminando el lote {args.eliminar}...")
+        asyncio.run(eliminar_lote(args.eliminar))
+        return 0
+
+    lote = args.lote or f"s{args.semilla}"
+    if len(lote) > 10:
+        print("❌ El lote debe tener como máximo 10 caracteres (se usa en documento_numero)")
+        return 2
+    # Las fechas se calculan desde --hasta: con la misma fecha y semilla se generan los mismos datos
+    ahora = datetime.combine(date.fromisoformat(args.hasta), datetime.min.time())
+    url = dsn()
+
+    print("🏭 Generador de datos sintéticos")
+    print(f"📦 Lote {lote}: {args.usuarios:,} usuarios, {args.encuestas} encuestas, ~{args.respuestas:,} respuestas")
+    print(f"⚙️ {args.procesos} procesos, semilla {args.semilla}")
+    print("=" * 60)
+    inicio = time.perf_counter()
+
+    id_usuario_base, indices = asyncio.run(preparar(args, lote))
+    planes: List[PlanEncuesta] = []
+    try:
+        from passlib.context import CryptContext
+        password_hash = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(PASSWORD)
+
+        print("👥 Usuarios")
+        tareas = [
+            (cargar_usuarios, (url, args.semilla, lote, desde, min(desde + BLOQUE_USUARIOS, args.usuarios),
+                               id_usuario_base, password_hash, ahora, args.dias))
+            for desde in range(0, args.usuarios, BLOQUE_USUARIOS)
+        ]
+        ejecutar_en_paralelo(args.procesos, tareas, "usuarios", args.usuarios)
+
+        print("📋 Encuestas, preguntas y opciones")
+        planes, tramos = asyncio.run(crear_encuestas_y_tramos(args, lote, ahora))
+        total_participaciones = sum(t.cantidad for t in tramos)
+        print(f"   {len(planes)} encuestas, {sum(len(p.preguntas) for p in planes)} preguntas, {len(tramos)} tramos")
+
+        print("📝 Participaciones y respuestas")
+        tareas = [
+            (cargar_tramo, (url, tramo, args.semilla, args.usuarios, id_usuario_base, args.sesgo_usuarios))
+            for tramo in tramos
+        ]
+        _, respuestas = ejecutar_en_paralelo(args.procesos, tareas, "participaciones", total_participaciones)
+    finally:
+        asyncio.run(finalizar(args, planes, id_usuario_base, indices))
+
+    segundos = time.perf_counter() - inicio
+    print("=" * 60)
+    print(f"✅ {args.usuarios:,} usuarios, {total_participaciones:,} participaciones y {respuestas:,} respuestas en {segundos:.1f} s")
+    print(f"🔑 Contraseña de los usuarios: {PASSWORD} (emails sint_{lote}_<n>@example.com)")
+    if not args.recalcular_stats:
+        print("💡 Para el dashboard: python recalcular_stats_diarias.py")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera usuarios, encuestas, participaciones y respuestas sintéticas con COPY")
+    parser.add_argument("--usuarios", type=int, default=100_000, help="Usuarios a crear")
+    parser.add_argument("--encuestas", type=int, default=200, help="Encuestas a crear")
+    parser.add_argument("--respuestas", type=int, default=1_000_000, help="Respuestas aproximadas a crear")
+    parser.add_argument("--preguntas-min", type=int, default=5, help="Preguntas mínimas por encuesta")
+    parser.add_argument("--preguntas-max", type=int, default=25, help="Preguntas máximas por encuesta")
+    parser.add_argument("--sesgo-encuestas", type=float, default=1.0, help="Exponente Zipf de la popularidad de encuestas (0 = uniforme)")
+    parser.add_argument("--sesgo-usuarios", type=float, default=2.0, help="Concentración de la actividad de usuarios (1 = uniforme)")
+    parser.add_argument("--dias", type=int, default=365, help="Días de historia hacia atrás desde --hasta")
+    parser.add_argument("--hasta", default=date.today().isoformat(), help="Fecha de referencia (AAAA-MM-DD); fijarla para reproducir")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla: misma semilla, mismos datos")
+    parser.add_argument("--lote", default=None, help="Marca de los datos generados (por defecto s<semilla>)")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 2, help="Procesos que generan y copian en paralelo")
+    parser.add_argument("--diferir-indices", action="store_true", help="Quitar índices secundarios y claves foráneas de participaciones y respuestas durante la carga y recrearlos al final")
+    parser.add_argument("--recalcular-stats", action="store_true", help="Recalcular stats_diarias al terminar")
+    parser.add_argument("--eliminar", metavar="LOTE", default=None, help="Eliminar los datos de un lote generado y salir")
+    sys.exit(main(parser.parse_args()))
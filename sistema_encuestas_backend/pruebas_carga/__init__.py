@@ -0,0 +1,23 @@
+"""
+Pruebas de carga de la API
+
+Simula encuestados y administradores reales contra un backend local:
+
+- Encuestado: registro → verificación del correo → login → encuestas activas
+  → detalle de una encuesta → envío de respuestas → premios → canje.
+- Administrador: login y consulta periódica del dashboard y las analíticas.
+
+Los encuestados llegan según un proceso de Poisson con la tasa de cada etapa
+(modelo abierto: una respuesta lenta no frena las llegadas) y los
+administradores consultan en bucle cada cierto intervalo. Al terminar se
+informan p50/p95/p99 y tasa de error por endpoint y se escribe un JSON con los
+resultados.
+
+Solo se ejecuta contra un backend y un PostgreSQL locales: crea datos de
+prueba directamente en la base (administrador, encuestas y un premio), lee de
+ella los tokens de verificación de correo y los elimina al terminar.
+
+Uso (con el backend levantado con RATE_LIMIT_ACTIVO=false):
+    python -m pruebas_carga --etapas 2x30,5x60 --usuarios 300 --admins 2
+    python -m pruebas_carga --url http://localhost:8000 --salida resultados_carga.json
+"""
@@ -0,0 +1,103 @@
+"""
+python -m pruebas_carga --etapas 2x30,5x60 --usuarios 300 --admins 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# Agregar el directorio del backend al path (para importar app.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_URL
+from pruebas_carga.configuracion import ConfiguracionCarga, parsear_etapas
+from pruebas_carga.ejecutor import PruebaCarga
+from pruebas_carga.metricas import guardar_json, imprimir_tabla
+
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(
+        prog="python -m pruebas_carga",
+        description="Prueba de carga con recorridos de encuestados y administradores (solo backend y base locales)",
+    )
+    parser.add_argument("--url", default="http://localhost:8000", help="URL del backend (debe ser local)")
+    parser.add_argument("--database-url", default=DATABASE_URL, help="Base donde sembrar datos (por defecto DATABASE_URL)")
+    parser.add_argument(
+        "--etapas", default="1x30,3x60",
+        help="Llegadas de encuestados por segundo y duración de cada etapa: <tasa>x<segundos>,..."
+    )
+    parser.add_argument("--usuarios", type=int, default=500, help="Encuestados a registrar como máximo")
+    parser.add_argument("--admins", type=int, default=1, help="Administradores consultando el panel")
+    parser.add_argument("--intervalo-admin", type=float, default=5.0, help="Segundos entre consultas de cada administrador")
+    parser.add_argument("--pausa", type=float, default=0.5, help="Pausa media del usuario entre pasos (segundos)")
+    parser.add_argument("--encuestas", type=int, default=5, help="Encuestas de prueba a crear")
+    parser.add_argument("--preguntas", type=int, default=8, help="Preguntas por encuesta")
+    parser.add_argument("--max-en-curso", type=int, default=200, help="Recorridos simultáneos como máximo")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por petición (segundos)")
+    parser.add_argument("--semilla", type=int, default=None, help="Semilla para reproducir llegadas y respuestas")
+    parser.add_argument("--salida", default="resultados_carga.json", help="Archivo JSON con los resultados")
+    parser.add_argument("--muestras", default=None, help="CSV opcional con cada petición (endpoint, etapa, ms, status)")
+    parser.add_argument(
+        "--max-tasa-error", type=float, default=None,
+        help="Terminar con código 1 si la tasa de error total la supera (por ejemplo 0.01)"
+    )
+    return parser.parse_args()
+
+
+async def main(args) -> int:
+    configuracion = ConfiguracionCarga(
+        url=args.url,
+        database_url=args.database_url,
+        etapas=parsear_etapas(args.etapas),
+        usuarios=args.usuarios,
+        admins=args.admins,
+        intervalo_admin=args.intervalo_admin,
+        pausa=args.pausa,
+        encuestas=args.encuestas,
+        preguntas=args.preguntas,
+        max_en_curso=args.max_en_curso,
+        timeout=args.timeout,
+        semilla=args.semilla,
+    )
+    prueba = PruebaCarga(configuracion)
+
+    print("🔥 Prueba de carga del Sistema de Encuestas")
+    print(f"🎯 Backend: {configuracion.url}")
+    print("=" * 115)
+    resultados = await prueba.ejecutar()
+
+    print()
+    imprimir_tabla(resultados["endpoints"])
+    total = resultados["total"]
+    print("-" * 115)
+    print(
+        f"Total: {total['peticiones']} peticiones, {total['peticiones_por_segundo']} req/s, "
+        f"error {total['tasa_error'] * 100:.2f}%, p95 {total['p95_ms']} ms, p99 {total['p99_ms']} ms"
+    )
+    print(f"Recorridos: {resultados['recorridos']}")
+    if resultados["fallas_por_paso"]:
+        print(f"⚠️ Fallas por paso: {resultados['fallas_por_paso']}")
+    if resultados["llegadas_descartadas"]:
+        print(f"⚠️ {resultados['llegadas_descartadas']} llegadas descartadas (población agotada o --max-en-curso alcanzado)")
+    if any("429" in r["status"] for r in resultados["endpoints"].values()):
+        print("⚠️ Hubo respuestas 429: levantar el backend con RATE_LIMIT_ACTIVO=false para medir sin límite de peticiones")
+
+    guardar_json(resultados, args.salida)
+    print(f"💾 Resultados en {args.salida}")
+    if args.muestras:
+        prueba.metricas.guardar_muestras_csv(args.muestras)
+        print(f"💾 Muestras en {args.muestras}")
+
+    if args.max_tasa_error is not None and total["tasa_error"] > args.max_tasa_error:
+        print(f"❌ Tasa de error {total['tasa_error']:.4f} mayor que {args.max_tasa_error}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    argumentos = parsear_argumentos()
+    try:
+        sys.exit(asyncio.run(main(argumentos)))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
@@ -0,0 +1,78 @@
+"""
+Parámetros de una prueba de carga y verificación de que los destinos son locales
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+HOSTS_LOCALES = {"localhost", "127.0.0.1", "::1"}
+
+
+@dataclass(frozen=True)
+class Etapa:
+    """Llegadas de encuestados por segundo durante `segundos`"""
+    tasa: float
+    segundos: float
+
+
+@dataclass
+class ConfiguracionCarga:
+    url: str
+    database_url: str
+    etapas: List[Etapa]
+    usuarios: int
+    admins: int = 1
+    intervalo_admin: float = 5.0
+    pausa: float = 0.5
+    encuestas: int = 5
+    preguntas: int = 8
+    max_en_curso: int = 200
+    timeout: float = 30.0
+    semilla: Optional[int] = None
+
+    @property
+    def duracion(self) -> float:
+        return sum(etapa.segundos for etapa in self.etapas)
+
+
+def parsear_etapas(texto: str) -> List[Etapa]:
+    """
+    "2x30,5x60" → 2 llegadas/s durante 30 s y luego 5 llegadas/s durante 60 s
+    """
+    etapas = []
+    for parte in texto.split(","):
+        tasa, _, segundos = parte.strip().partition("x")
+        try:
+            etapa = Etapa(tasa=float(tasa), segundos=float(segundos))
+        except ValueError:
+            raise ValueError(f"Etapa inválida '{parte}': se espera <llegadas por segundo>x<segundos>")
+        if etapa.tasa < 0 or etapa.segundos <= 0:
+            raise ValueError(f"Etapa inválida '{parte}': la tasa no puede ser negativa y la duración debe ser positiva")
+        etapas.append(etapa)
+    return etapas
+
+
+def _host_url(url: str) -> Tuple[str, str]:
+    partes = urlsplit(url)
+    host = partes.hostname or ""
+    # postgresql://user:pass@/db?host=/var/run/postgresql (socket unix)
+    if not host:
+        host = parse_qs(partes.query).get("host", [""])[0]
+    return partes.scheme, host
+
+
+def es_destino_local(url: str) -> bool:
+    """True si la URL apunta a la máquina local (loopback o socket unix)"""
+    _, host = _host_url(url)
+    return host in HOSTS_LOCALES or host.startswith("/")
+
+
+def exigir_destinos_locales(configuracion: ConfiguracionCarga) -> None:
+    """Rechaza la prueba si el backend o la base no son locales"""
+    for nombre, url in (("--url", configuracion.url), ("DATABASE_URL", configuracion.database_url)):
+        if not es_destino_local(url):
+            _, host = _host_url(url)
+            raise ValueError(
+                f"{nombre} apunta a '{host}': las pruebas de carga solo se ejecutan contra "
+                f"un backend y un PostgreSQL locales ({', '.join(sorted(HOSTS_LOCALES))} o socket unix)"
+            )
@@ -0,0 +1,109 @@
+"""
+Datos de prueba en la base local: administrador, encuestas con preguntas y un
+premio. Los encuestados se registran por la API durante la prueba; todo lo que
+lleva el prefijo de la ejecución se elimina al terminar.
+"""
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.database import crear_engine
+from app.models import Canje, EmailOutbox, Encuesta, Opcion, Participacion, Pregunta, Premio, Respuesta, StatsDiaria, Usuario
+from app.models.premio import EstadoPremio, TipoPremio
+from app.models.token_verificacion import TokenVerificacion
+from app.services.password_service import password_service
+
+PUNTOS_POR_ENCUESTA = 10
+
+
+@dataclass
+class DatosPrueba:
+    prefijo: str
+    admin_email: str
+    admin_password: str
+    ids_encuestas: List[int]
+    id_premio: int
+
+
+class BaseLocal:
+    """Acceso directo a la base para sembrar, leer tokens de verificación y limpiar"""
+
+    def __init__(self, database_url: str, prefijo: str):
+        self.prefijo = prefijo
+        self.engine = crear_engine(database_url, poolclass=NullPool)
+        self.Session = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    def email(self, identificador) -> str:
+        return f"{self.prefijo}_{identificador}@example.com"
+
+    async def sembrar(self, cantidad_encuestas: int, cantidad_preguntas: int) -> DatosPrueba:
+        password = f"Carga-{self.prefijo}"
+        async with self.Session() as db:
+            admin = Usuario(
+                nombre="Admin", apellido="Carga", documento_numero=f"{self.prefijo[-12:]}-adm",
+                email=self.email("admin"), metodo_registro="local", estado=True, rol_id=1,
+                email_verificado=True, password_hash=await password_service.hash(password)
+            )
+            db.add(admin)
+            await db.flush()
+
+            ids_encuestas = []
+            for i in range(cantidad_encuestas):
+                encuesta = Encuesta(
+                    titulo=f"{self.prefijo} encuesta {i}", descripcion="Encuesta generada por pruebas_carga",
+                    puntos_otorga=PUNTOS_POR_ENCUESTA, estado=True, visible_para="usuarios",
+                    id_usuario_creador=admin.id_usuario
+                )
+                db.add(encuesta)
+                await db.flush()
+                ids_encuestas.append(encuesta.id_encuesta)
+                for orden in range(cantidad_preguntas):
+                    tipo = "texto_libre" if orden % 4 == 3 else "opcion_multiple"
+                    pregunta = Pregunta(id_encuesta=encuesta.id_encuesta, orden=orden, tipo=tipo, texto=f"Pregunta {orden}")
+                    db.add(pregunta)
+                    if tipo == "opcion_multiple":
+                        await db.flush()
+                        db.add_all(Opcion(id_pregunta=pregunta.id_pregunta, texto_opcion=f"Opción {j}") for j in range(4))
+
+            # Cuesta lo que otorga una encuesta: cada encuestado puede canjearlo una vez
+            premio = Premio(
+                nombre=f"{self.prefijo} premio", descripcion="Premio generado por pruebas_carga",
+                costo_puntos=PUNTOS_POR_ENCUESTA, tipo=TipoPremio.DIGITAL, estado=EstadoPremio.DISPONIBLE, activo=True
+            )
+            db.add(premio)
+            await db.commit()
+            return DatosPrueba(self.prefijo, admin.email, password, ids_encuestas, premio.id_premio)
+
+    async def token_verificacion(self, id_usuario: int) -> Optional[str]:
+        """Token del correo de verificación (equivale a abrir el enlace del correo)"""
+        async with self.Session() as db:
+            resultado = await db.execute(
+                select(TokenVerificacion.token)
+                .where(TokenVerificacion.id_usuario == id_usuario, TokenVerificacion.tipo == "email_verification")
+                .order_by(TokenVerificacion.id.desc())
+                .limit(1)
+            )
+            return resultado.scalar_one_or_none()
+
+    async def limpiar(self) -> None:
+        usuarios = select(Usuario.id_usuario).where(Usuario.email.like(f"{self.prefijo}\\_%"))
+        encuestas = select(Encuesta.id_encuesta).where(Encuesta.titulo.like(f"{self.prefijo} %"))
+        preguntas = select(Pregunta.id_pregunta).where(Pregunta.id_encuesta.in_(encuestas))
+        async with self.Session() as db:
+            await db.execute(delete(Canje).where(Canje.id_usuario.in_(usuarios)))
+            await db.execute(delete(Respuesta).where(or_(Respuesta.id_usuario.in_(usuarios), Respuesta.id_pregunta.in_(preguntas))))
+            await db.execute(delete(Participacion).where(or_(Participacion.id_usuario.in_(usuarios), Participacion.id_encuesta.in_(encuestas))))
+            await db.execute(delete(TokenVerificacion).where(TokenVerificacion.id_usuario.in_(usuarios)))
+            await db.execute(delete(EmailOutbox).where(EmailOutbox.destinatario.like(f"{self.prefijo}\\_%")))
+            await db.execute(delete(Opcion).where(Opcion.id_pregunta.in_(preguntas)))
+            await db.execute(delete(Pregunta).where(Pregunta.id_encuesta.in_(encuestas)))
+            await db.execute(delete(StatsDiaria).where(StatsDiaria.id_encuesta.in_(encuestas)))
+            await db.execute(delete(Encuesta).where(Encuesta.titulo.like(f"{self.prefijo} %")))
+            await db.execute(delete(Premio).where(Premio.nombre.like(f"{self.prefijo} %")))
+            await db.execute(delete(Usuario).where(Usuario.email.like(f"{self.prefijo}\\_%")))
+            await db.commit()
+        await self.engine.dispose()
@@ -0,0 +1,100 @@
+"""
+Ejecución de una prueba de carga: llegadas de encuestados por etapa,
+administradores en bucle y consolidación de resultados
+"""
+import asyncio
+import random
+import time
+import uuid
+from dataclasses import asdict
+from typing import List, Set
+
+import httpx
+
+from pruebas_carga.configuracion import ConfiguracionCarga, exigir_destinos_locales
+from pruebas_carga.datos import BaseLocal, DatosPrueba
+from pruebas_carga.escenarios import ClienteMedido, PasoFallido, recorrido_admin, recorrido_encuestado
+from pruebas_carga.metricas import RegistroMetricas
+
+
+class PruebaCarga:
+    def __init__(self, configuracion: ConfiguracionCarga):
+        exigir_destinos_locales(configuracion)
+        self.configuracion = configuracion
+        self.azar = random.Random(configuracion.semilla)
+        self.metricas = RegistroMetricas()
+        self.base = BaseLocal(configuracion.database_url, f"carga_{uuid.uuid4().hex[:8]}")
+        self.etapa = 0
+        self.en_curso: Set[asyncio.Task] = set()
+
+    async def _encuestado(self, cliente: ClienteMedido, datos: DatosPrueba, numero: int) -> None:
+        try:
+            await recorrido_encuestado(cliente, self.base, datos, numero, self.configuracion.pausa, self.azar)
+            self.metricas.registrar_recorrido("encuestado", True)
+        except PasoFallido as e:
+            self.metricas.registrar_recorrido("encuestado", False, e.paso)
+        except Exception as e:
+            # Respuesta con forma inesperada (por ejemplo, JSON sin la clave esperada)
+            self.metricas.registrar_recorrido("encuestado", False, type(e).__name__)
+
+    async def _llegadas(self, cliente: ClienteMedido, datos: DatosPrueba) -> List[float]:
+        """
+        Lanza encuestados según un proceso de Poisson con la tasa de cada etapa.
+        Devuelve la duración real de cada etapa (la última incluye la espera de
+        los recorridos pendientes).
+        """
+        configuracion = self.configuracion
+        numero = 0
+        duraciones = []
+        for indice, etapa in enumerate(configuracion.etapas):
+            self.etapa = indice
+            inicio = time.monotonic()
+            fin = inicio + etapa.segundos
+            proxima = inicio
+            while etapa.tasa > 0:
+                proxima += self.azar.expovariate(etapa.tasa)
+                if proxima >= fin:
+                    break
+                await asyncio.sleep(max(0.0, proxima - time.monotonic()))
+                # Población agotada o cliente saturado: la llegada se pierde, no se atrasa
+                if numero >= configuracion.usuarios or len(self.en_curso) >= configuracion.max_en_curso:
+                    self.metricas.llegadas_descartadas += 1
+                    continue
+                tarea = asyncio.create_task(self._encuestado(cliente, datos, numero))
+                self.en_curso.add(tarea)
+                tarea.add_done_callback(self.en_curso.discard)
+                numero += 1
+            await asyncio.sleep(max(0.0, fin - time.monotonic()))
+            if indice < len(configuracion.etapas) - 1:
+                duraciones.append(time.monotonic() - inicio)
+        if self.en_curso:
+            await asyncio.gather(*self.en_curso)
+        duraciones.append(time.monotonic() - inicio)
+        return duraciones
+
+    async def ejecutar(self) -> dict:
+        configuracion = self.configuracion
+        print(f"📦 Sembrando datos de prueba (prefijo {self.base.prefijo})...")
+        try:
+            datos = await self.base.sembrar(configuracion.encuestas, configuracion.preguntas)
+            limites = httpx.Limits(max_connections=configuracion.max_en_curso + configuracion.admins)
+            async with httpx.AsyncClient(base_url=configuracion.url, timeout=configuracion.timeout, limits=limites) as http:
+                cliente = ClienteMedido(http, self.metricas, lambda: self.etapa)
+                hasta = time.monotonic() + configuracion.duracion
+                admins = [
+                    asyncio.create_task(recorrido_admin(
+                        cliente, datos, configuracion.intervalo_admin, hasta, self.azar, self.metricas
+                    ))
+                    for _ in range(configuracion.admins)
+                ]
+                print(f"🚀 Carga en curso: {len(configuracion.etapas)} etapas, {configuracion.duracion:.0f} s")
+                duraciones = await self._llegadas(cliente, datos)
+                await asyncio.gather(*admins)
+        finally:
+            await self.base.limpiar()
+            print("🧹 Datos de prueba eliminados")
+
+        resumen_configuracion = asdict(configuracion)
+        # La URL de la base puede incluir la contraseña
+        resumen_configuracion.pop("database_url")
+        return self.metricas.resultados(resumen_configuracion, duraciones)
@@ -0,0 +1,147 @@
+"""
+Recorridos de encuestados y administradores
+
+Cada petición se registra con el nombre del endpoint (plantilla de ruta, no la
+URL concreta) para agrupar las latencias igual que las métricas del backend.
+"""
+import asyncio
+import random
+import time
+from typing import Callable, Optional
+
+import httpx
+
+from pruebas_carga.datos import BaseLocal, DatosPrueba
+from pruebas_carga.metricas import SIN_RESPUESTA, RegistroMetricas
+
+
+class PasoFallido(Exception):
+    """Un paso del recorrido no obtuvo la respuesta esperada; el recorrido se abandona"""
+
+    def __init__(self, paso: str, detalle: str):
+        super().__init__(f"{paso}: {detalle}")
+        self.paso = paso
+
+
+class ClienteMedido:
+    """Cliente HTTP que mide cada petición y la asigna a la etapa en curso"""
+
+    def __init__(self, cliente: httpx.AsyncClient, metricas: RegistroMetricas, etapa_actual: Callable[[], int]):
+        self.cliente = cliente
+        self.metricas = metricas
+        self.etapa_actual = etapa_actual
+
+    async def pedir(self, metodo: str, endpoint: str, url: str, esperado: int = 200, **kwargs) -> httpx.Response:
+        etapa = self.etapa_actual()
+        inicio = time.perf_counter()
+        try:
+            respuesta = await self.cliente.request(metodo, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.metricas.registrar(endpoint, etapa, inicio, time.perf_counter() - inicio, SIN_RESPUESTA, True)
+            raise PasoFallido(endpoint, f"{type(e).__name__}: {e}")
+        segundos = time.perf_counter() - inicio
+        error = respuesta.status_code != esperado
+        self.metricas.registrar(endpoint, etapa, inicio, segundos, respuesta.status_code, error)
+        if error:
+            raise PasoFallido(endpoint, f"HTTP {respuesta.status_code}: {respuesta.text[:200]}")
+        return respuesta
+
+
+async def pausar(media: float, azar: random.Random) -> None:
+    """Tiempo de lectura/escritura del usuario entre pasos (exponencial con la media indicada)"""
+    if media > 0:
+        await asyncio.sleep(azar.expovariate(1 / media))
+
+
+def armar_respuestas(encuesta: dict, azar: random.Random) -> list:
+    respuestas = []
+    for pregunta in encuesta["preguntas"]:
+        if pregunta["opciones"]:
+            opcion = azar.choice(pregunta["opciones"])
+            respuestas.append({"id_pregunta": pregunta["id_pregunta"], "id_opcion": opcion["id_opcion"]})
+        else:
+            respuestas.append({"id_pregunta": pregunta["id_pregunta"], "respuesta_texto": "Respuesta de prueba de carga"})
+    return respuestas
+
+
+async def recorrido_encuestado(
+    cliente: ClienteMedido, base: BaseLocal, datos: DatosPrueba, numero: int, pausa: float, azar: random.Random
+) -> None:
+    """registro → verificación del correo → login → encuestas → responder → premios → canje"""
+    email = base.email(numero)
+    password = f"Clave-{numero:06d}"
+    registro = await cliente.pedir("POST", "POST /api/auth/registro", "/api/auth/registro", json={
+        "nombre": "Carga", "apellido": "Encuestado", "documento_numero": f"{datos.prefijo[-12:]}{numero:06d}",
+        "email": email, "password": password,
+    })
+
+    token_correo = await base.token_verificacion(registro.json()["usuario_id"])
+    if token_correo is None:
+        raise PasoFallido("token_verificacion", "el registro no generó token de verificación")
+    await pausar(pausa, azar)
+    await cliente.pedir("GET", "GET /api/auth/verificar-correo", "/api/auth/verificar-correo", params={"token": token_correo})
+
+    login = await cliente.pedir("POST", "POST /api/auth/login", "/api/auth/login", json={"email": email, "password": password})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    activas = await cliente.pedir("GET", "GET /api/encuestas/activas", "/api/encuestas/activas", headers=headers)
+    # Se elige entre las encuestas sembradas para conocer su estructura y los puntos que otorgan
+    disponibles = [e["id_encuesta"] for e in activas.json() if e["id_encuesta"] in datos.ids_encuestas]
+    id_encuesta = azar.choice(disponibles or datos.ids_encuestas)
+    await pausar(pausa, azar)
+
+    encuesta = await cliente.pedir("GET", "GET /api/encuestas/{encuesta_id}", f"/api/encuestas/{id_encuesta}", headers=headers)
+    await pausar(pausa * 4, azar)
+
+    await cliente.pedir("POST", "POST /api/respuestas/", "/api/respuestas/", headers=headers, json={
+        "id_encuesta": id_encuesta,
+        "tiempo_total": azar.randint(30, 300),
+        "respuestas": armar_respuestas(encuesta.json(), azar),
+    })
+    await pausar(pausa, azar)
+
+    await cliente.pedir("GET", "GET /api/premios/", "/api/premios/", headers=headers)
+    await pausar(pausa, azar)
+
+    await cliente.pedir("POST", "POST /api/premios/canjear", "/api/premios/canjear", headers=headers, json={
+        "id_premio": datos.id_premio, "acepta_terminos": True,
+    })
+
+
+async def login_admin(cliente: ClienteMedido, datos: DatosPrueba) -> dict:
+    login = await cliente.pedir("POST", "POST /api/auth/login", "/api/auth/login", json={
+        "email": datos.admin_email, "password": datos.admin_password,
+    })
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+
+async def ronda_admin(cliente: ClienteMedido, datos: DatosPrueba, headers: dict, azar: random.Random) -> None:
+    """Lo que refresca el panel de administración: dashboard y analíticas de una encuesta"""
+    id_encuesta = azar.choice(datos.ids_encuestas)
+    await cliente.pedir("GET", "GET /api/dashboard/stats", "/api/dashboard/stats", headers=headers)
+    await cliente.pedir("GET", "GET /api/dashboard/charts", "/api/dashboard/charts", headers=headers)
+    await cliente.pedir("GET", "GET /api/admin/encuestas-resumen", "/api/admin/encuestas-resumen", headers=headers)
+    await cliente.pedir(
+        "GET", "GET /api/admin/estadisticas-por-encuesta/{id_encuesta}",
+        f"/api/admin/estadisticas-por-encuesta/{id_encuesta}", headers=headers
+    )
+
+
+async def recorrido_admin(
+    cliente: ClienteMedido, datos: DatosPrueba, intervalo: float, hasta: float, azar: random.Random,
+    metricas: RegistroMetricas
+) -> None:
+    """Inicia sesión y consulta el panel cada `intervalo` segundos hasta `hasta` (reloj monotónico)"""
+    headers: Optional[dict] = None
+    # Desfase inicial para que los administradores no consulten todos a la vez
+    await asyncio.sleep(azar.uniform(0, intervalo))
+    while time.monotonic() < hasta:
+        inicio = time.monotonic()
+        try:
+            if headers is None:
+                headers = await login_admin(cliente, datos)
+            await ronda_admin(cliente, datos, headers, azar)
+            metricas.registrar_recorrido("admin", True)
+        except PasoFallido as e:
+            metricas.registrar_recorrido("admin", False, e.paso)
+        await asyncio.sleep(max(0.0, intervalo - (time.monotonic() - inicio)))
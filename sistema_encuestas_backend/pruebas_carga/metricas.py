@@ -0,0 +1,122 @@
+"""
+Registro de latencias y errores por endpoint
+"""
+import csv
+import json
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# Código usado cuando la petición no obtuvo respuesta (timeout, conexión rechazada)
+SIN_RESPUESTA = "sin_respuesta"
+
+
+@dataclass(frozen=True)
+class Muestra:
+    endpoint: str
+    etapa: int
+    inicio: float
+    segundos: float
+    status: str
+    error: bool
+
+
+def percentil(ordenados: List[float], p: float) -> Optional[float]:
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not ordenados:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+def resumir(muestras: List[Muestra], duracion: float) -> dict:
+    """Conteo, percentiles (ms), tasa de error y códigos de estado de un grupo de muestras"""
+    latencias = sorted(m.segundos * 1000 for m in muestras)
+    errores = sum(1 for m in muestras if m.error)
+
+    def ms(valor: Optional[float]) -> Optional[float]:
+        return round(valor, 2) if valor is not None else None
+
+    return {
+        "peticiones": len(muestras),
+        "errores": errores,
+        "tasa_error": round(errores / len(muestras), 4) if muestras else 0.0,
+        "peticiones_por_segundo": round(len(muestras) / duracion, 2) if duracion > 0 else None,
+        "p50_ms": ms(percentil(latencias, 50)),
+        "p95_ms": ms(percentil(latencias, 95)),
+        "p99_ms": ms(percentil(latencias, 99)),
+        "max_ms": ms(latencias[-1] if latencias else None),
+        "media_ms": ms(sum(latencias) / len(latencias) if latencias else None),
+        "status": dict(sorted(Counter(m.status for m in muestras).items())),
+    }
+
+
+class RegistroMetricas:
+    """Acumula las muestras de todas las peticiones y los recorridos de la prueba"""
+
+    def __init__(self):
+        self.muestras: List[Muestra] = []
+        self.recorridos: Counter = Counter()
+        self.fallas_por_paso: Counter = Counter()
+        self.llegadas_descartadas = 0
+
+    def registrar(self, endpoint: str, etapa: int, inicio: float, segundos: float, status, error: bool) -> None:
+        self.muestras.append(Muestra(endpoint, etapa, inicio, segundos, str(status), error))
+
+    def registrar_recorrido(self, tipo: str, completo: bool, paso_fallido: Optional[str] = None) -> None:
+        self.recorridos[f"{tipo}_{'completos' if completo else 'fallidos'}"] += 1
+        if paso_fallido:
+            self.fallas_por_paso[f"{tipo}:{paso_fallido}"] += 1
+
+    def por_endpoint(self, muestras: List[Muestra], duracion: float) -> Dict[str, dict]:
+        grupos: Dict[str, List[Muestra]] = defaultdict(list)
+        for muestra in muestras:
+            grupos[muestra.endpoint].append(muestra)
+        return {endpoint: resumir(grupo, duracion) for endpoint, grupo in sorted(grupos.items())}
+
+    def resultados(self, configuracion: dict, duraciones_etapas: List[float]) -> dict:
+        duracion_total = sum(duraciones_etapas)
+        etapas = []
+        for indice, duracion in enumerate(duraciones_etapas):
+            muestras = [m for m in self.muestras if m.etapa == indice]
+            etapas.append({
+                "etapa": indice,
+                **configuracion["etapas"][indice],
+                "total": resumir(muestras, duracion),
+                "endpoints": self.por_endpoint(muestras, duracion),
+            })
+        return {
+            "configuracion": configuracion,
+            "duracion_segundos": round(duracion_total, 2),
+            "total": resumir(self.muestras, duracion_total),
+            "endpoints": self.por_endpoint(self.muestras, duracion_total),
+            "etapas": etapas,
+            "recorridos": dict(self.recorridos),
+            "fallas_por_paso": dict(self.fallas_por_paso),
+            "llegadas_descartadas": self.llegadas_descartadas,
+        }
+
+    def guardar_muestras_csv(self, ruta: str) -> None:
+        with open(ruta, "w", newline="", encoding="utf-8") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(["endpoint", "etapa", "inicio", "ms", "status", "error"])
+            for m in self.muestras:
+                escritor.writerow([m.endpoint, m.etapa, round(m.inicio, 4), round(m.segundos * 1000, 3), m.status, int(m.error)])
+
+
+def guardar_json(resultados: dict, ruta: str) -> None:
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+
+
+def imprimir_tabla(endpoints: Dict[str, dict]) -> None:
+    print(f"{'Endpoint':<55} | {'N':>6} | {'Err %':>6} | {'p50':>8} | {'p95':>8} | {'p99':>8} | {'Máx':>8}")
+    print("-" * 115)
+    for endpoint, r in endpoints.items():
+        def ms(clave):
+            return f"{r[clave]:.1f}" if r[clave] is not None else "-"
+        print(
+            f"{endpoint:<55} | {r['peticiones']:>6} | {r['tasa_error'] * 100:>6.1f} | "
+            f"{ms('p50_ms'):>8} | {ms('p95_ms'):>8} | {ms('p99_ms'):>8} | {ms('max_ms'):>8}"
+        )
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Reconcilia los saldos de puntos de usuarios con el libro movimientos_puntos
+
+Compara puntos_totales, puntos_disponibles y puntos_canjeados de cada
+usuario con la suma de sus movimientos en una sola pasada. Por defecto solo
+informa los descuadres; con --aplicar los corrige en la misma sentencia
+(bloquea los movimientos nuevos mientras se ejecuta).
+
+Uso:
+    python recalcular_saldos_puntos.py            # solo informa
+    python recalcular_saldos_puntos.py --aplicar  # corrige los saldos desde el libro
+"""
+import argparse
+import asyncio
+import sys
+import os
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database import DATABASE_URL, crear_engine
+from app.services.puntos_service import puntos_service
+
+
+async def main(args) -> int:
+    engine = crear_engine(args.database_url, statement_timeout_ms=0)
+    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    print("🪙 Reconciliando saldos de puntos con movimientos_puntos")
+
+    try:
+        async with Session() as db:
+            descuadres = await puntos_service.recalcular_saldos(db, aplicar=args.aplicar)
+            await db.commit()
+    except Exception as e:
+        print(f"❌ Error reconciliando saldos: {e}")
+        return 1
+    finally:
+        await engine.dispose()
+
+    if not descuadres:
+        print("✅ Todos los saldos coinciden con el libro")
+        return 0
+
+    for d in descuadres[:args.mostrar]:
+        print(
+            f"   usuario {d.id_usuario}: "
+            f"totales {d.puntos_totales} -> {d.totales}, "
+            f"disponibles {d.puntos_disponibles} -> {d.disponibles}, "
+            f"canjeados {d.puntos_canjeados} -> {d.canjeados}"
+        )
+    if len(descuadres) > args.mostrar:
+        print(f"   ... y {len(descuadres) - args.mostrar} más")
+
+    if args.aplicar:
+        print(f"✅ {len(descuadres)} saldos corregidos desde el libro")
+        return 0
+    print(f"⚠️ {len(descuadres)} usuarios descuadrados; usa --aplicar para corregirlos")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcilia usuarios.puntos_* con movimientos_puntos")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--aplicar", action="store_true", help="Corregir los saldos descuadrados")
+    parser.add_argument("--mostrar", type=int, default=20, help="Descuadres a listar como máximo")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Reconstruye la tabla stats_diarias a partir de participaciones y respuestas
+
+Útil después de crear la tabla, de una carga masiva o si el resumen quedó
+desfasado. Bloquea las actualizaciones de la ingesta mientras se ejecuta.
+
+Uso:
+    python recalcular_stats_diarias.py                     # todo el historial
+    python recalcular_stats_diarias.py --desde 2026-01-01  # solo desde una fecha
+"""
+import argparse
+import asyncio
+import sys
+import os
+from datetime import date
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database import DATABASE_URL, crear_engine
+from app.services.stats_service import stats_service
+
+
+async def main(args):
+    engine = crear_engine(args.database_url, statement_timeout_ms=0)
+    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    print("📊 Recalculando stats_diarias")
+    print(f"📅 Desde: {args.desde or 'el inicio'}")
+
+    try:
+        async with Session() as db:
+            filas = await stats_service.recalcular(db, desde=args.desde)
+            await db.commit()
+        print(f"✅ {filas} filas generadas")
+    except Exception as e:
+        print(f"❌ Error recalculando stats_diarias: {e}")
+        sys.exit(1)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye stats_diarias")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--desde", type=date.fromisoformat, default=None, help="Fecha AAAA-MM-DD")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Prueba de concurrencia del canje de premios
+
+Crea un premio con stock limitado y un grupo de usuarios con puntos para
+varios canjes cada uno. Después lanza todos los intentos de canje a la vez
+contra canje_service (cada uno con su propia sesión y transacción) y al
+terminar comprueba en la base que:
+
+- no se vendió más stock del que había (sobreventa cero),
+- el premio quedó AGOTADO si se terminó el stock,
+- premios.total_canjes coincide con los canjes registrados,
+- ningún usuario gastó más puntos de los que tenía, y a cada uno se le
+  descontó exactamente lo que suman sus canjes,
+- cada canje tiene su débito en movimientos_puntos y el saldo en caché de
+  cada usuario coincide con su libro.
+
+Informa canjes por segundo y latencia por intento. Termina con código 1 si
+alguna comprobación falla. Elimina los datos de prueba al terminar.
+
+Uso:
+    python verificar_canje_concurrente.py
+    python verificar_canje_concurrente.py --usuarios 1000 --intentos 5000 --stock 200 --conexiones 40
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("LOG_NIVEL", "WARNING")
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database import crear_engine
+from app.models.canje import Canje
+from app.models.movimiento_puntos import MovimientoPuntos, TipoMovimiento
+from app.models.premio import EstadoPremio, Premio, TipoPremio
+from app.models.usuario import Usuario
+from app.services.canje_service import CanjeService
+from app.services.puntos_service import puntos_service
+from pruebas_carga.metricas import percentil
+
+SUFIJO = uuid.uuid4().hex[:8]
+PREFIJO = f"canje_{SUFIJO}"
+
+
+async def crear_datos(Session, args) -> int:
+    """Crea los usuarios y el premio de prueba; devuelve el id del premio"""
+    async with Session() as db:
+        usuarios = [
+            Usuario(
+                nombre="Concurrente", apellido=PREFIJO, documento_numero=f"cc-{SUFIJO}-{i}",
+                email=f"{PREFIJO}_{i}@example.com", rol_id=3, email_verificado=True, metodo_registro="local",
+                puntos_totales=args.puntos, puntos_disponibles=args.puntos, puntos_canjeados=0
+            )
+            for i in range(args.usuarios)
+        ]
+        db.add_all(usuarios)
+        if args.puntos:
+            # Saldo inicial también en el libro, para que cuadre con usuarios.puntos_*
+            await db.flush()
+            db.add_all([
+                MovimientoPuntos(id_usuario=u.id_usuario, tipo=TipoMovimiento.APERTURA, puntos=args.puntos)
+                for u in usuarios
+            ])
+        premio = Premio(
+            nombre=f"{PREFIJO} premio", costo_puntos=args.costo, tipo=TipoPremio.DIGITAL,
+            stock_disponible=args.stock, stock_original=args.stock,
+            estado=EstadoPremio.DISPONIBLE if args.stock else EstadoPremio.AGOTADO, activo=True
+        )
+        db.add(premio)
+        await db.commit()
+        return premio.id_premio
+
+
+async def eliminar_datos(Session) -> None:
+    """Elimina todo lo creado con el prefijo de esta ejecución"""
+    async with Session() as db:
+        usuarios = select(Usuario.id_usuario).where(Usuario.apellido == PREFIJO)
+        await db.execute(delete(Canje).where(Canje.id_usuario.in_(usuarios)))
+        await db.execute(delete(Premio).where(Premio.nombre.like(f"{PREFIJO}%")))
+        await db.execute(delete(Usuario).where(Usuario.apellido == PREFIJO))
+        await db.commit()
+
+
+async def lanzar_canjes(Session, servicio: CanjeService, ids_usuarios, id_premio: int, intentos: int):
+    """Todos los intentos arrancan juntos; el pool de conexiones acota cuántos corren a la vez"""
+    largada = asyncio.Event()
+    latencias = []
+    resultados = Counter()
+    ultimo_canje = [0.0]
+
+    async def intento(id_usuario: int):
+        await largada.wait()
+        inicio = time.perf_counter()
+        try:
+            async with Session() as db:
+                await servicio.canjear(db, id_usuario=id_usuario, id_premio=id_premio)
+            resultados["canjeado"] += 1
+            ultimo_canje[0] = time.perf_counter()
+        except HTTPException as e:
+            resultados[f"{e.status_code} {e.detail.split('.')[0]}"] += 1
+        except Exception as e:
+            resultados[f"error {type(e).__name__}"] += 1
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    tareas = [
+        asyncio.create_task(intento(ids_usuarios[i % len(ids_usuarios)]))
+        for i in range(intentos)
+    ]
+    await asyncio.sleep(0)
+    inicio = time.perf_counter()
+    largada.set()
+    await asyncio.gather(*tareas)
+    duracion = time.perf_counter() - inicio
+    # Los canjes se concentran al principio (hasta agotar el stock): su tasa se mide hasta el último
+    duracion_canjes = max(ultimo_canje[0] - inicio, 0.0)
+    return duracion, duracion_canjes, sorted(latencias), resultados
+
+
+async def comprobar(Session, args, id_premio: int, canjeados: int) -> list:
+    """Invariantes después de la prueba; devuelve la lista de fallas"""
+    fallas = []
+    async with Session() as db:
+        premio = await db.get(Premio, id_premio)
+        registrados = await db.scalar(select(func.count(Canje.id_canje)).where(Canje.id_premio == id_premio))
+
+        print(f"📦 Stock: {args.stock} inicial, {premio.stock_disponible} final, {registrados} canjes registrados")
+        if registrados > args.stock:
+            fallas.append(f"Sobreventa: {registrados - args.stock} canjes más que el stock")
+        if premio.stock_disponible != args.stock - registrados:
+            fallas.append(f"stock_disponible={premio.stock_disponible}, se esperaba {args.stock - registrados}")
+        if premio.stock_disponible == 0 and premio.estado != EstadoPremio.AGOTADO:
+            fallas.append(f"Stock en 0 pero el premio quedó {premio.estado.name}")
+        if premio.stock_disponible and premio.estado != EstadoPremio.DISPONIBLE:
+            fallas.append(f"Quedó stock pero el premio está {premio.estado.name}")
+        if premio.total_canjes != registrados:
+            fallas.append(f"total_canjes={premio.total_canjes}, se registraron {registrados}")
+        if registrados != canjeados:
+            fallas.append(f"El servicio informó {canjeados} canjes y hay {registrados} en la base")
+
+        gastado = (
+            select(Canje.id_usuario, func.sum(Canje.puntos_utilizados).label("gastado"))
+            .where(Canje.id_premio == id_premio)
+            .group_by(Canje.id_usuario)
+            .subquery()
+        )
+        usuarios = (await db.execute(
+            select(
+                Usuario.id_usuario, Usuario.puntos_disponibles, Usuario.puntos_canjeados,
+                func.coalesce(gastado.c.gastado, 0).label("gastado")
+            )
+            .outerjoin(gastado, gastado.c.id_usuario == Usuario.id_usuario)
+            .where(Usuario.apellido == PREFIJO)
+        )).all()
+        negativos = sum(1 for u in usuarios if u.puntos_disponibles < 0)
+        descuadrados = sum(
+            1 for u in usuarios
+            if u.puntos_canjeados != u.gastado or args.puntos - u.puntos_disponibles != u.gastado
+        )
+        if negativos:
+            fallas.append(f"{negativos} usuarios con puntos negativos")
+        if descuadrados:
+            fallas.append(f"{descuadrados} usuarios con puntos que no coinciden con sus canjes")
+
+        # El saldo en caché de cada usuario coincide con su libro de movimientos
+        ids = {u.id_usuario for u in usuarios}
+        fuera_de_libro = [d for d in await puntos_service.recalcular_saldos(db, aplicar=False) if d.id_usuario in ids]
+        debitos = await db.scalar(
+            select(func.count(MovimientoPuntos.id_movimiento))
+            .join(Canje, Canje.id_canje == MovimientoPuntos.id_canje)
+            .where(Canje.id_premio == id_premio, MovimientoPuntos.puntos == -Canje.puntos_utilizados)
+        )
+        if fuera_de_libro:
+            fallas.append(f"{len(fuera_de_libro)} usuarios con saldo distinto al de movimientos_puntos")
+        if debitos != registrados:
+            fallas.append(f"{debitos} débitos en movimientos_puntos para {registrados} canjes")
+
+        # Si la demanda (con los puntos de todos) supera el stock, debe venderse todo
+        demanda = min(args.intentos, args.usuarios * (args.puntos // args.costo))
+        if demanda >= args.stock and registrados != args.stock:
+            fallas.append(f"Había demanda para {demanda} canjes y solo se vendieron {registrados} de {args.stock}")
+    return fallas
+
+
+async def main(args) -> int:
+    engine = crear_engine(
+        pool_size=args.conexiones, max_overflow=0, pool_timeout=300
+    )
+    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    servicio = CanjeService()
+
+    print("🎁 Prueba de concurrencia del canje de premios")
+    print(
+        f"📦 {args.usuarios} usuarios con {args.puntos} puntos, premio de {args.costo} puntos "
+        f"con stock {args.stock}, {args.intentos} intentos sobre {args.conexiones} conexiones (prefijo {PREFIJO})"
+    )
+    print("=" * 90)
+    try:
+        id_premio = await crear_datos(Session, args)
+        async with Session() as db:
+            ids_usuarios = (await db.scalars(
+                select(Usuario.id_usuario).where(Usuario.apellido == PREFIJO).order_by(Usuario.id_usuario)
+            )).all()
+
+        duracion, duracion_canjes, latencias, resultados = await lanzar_canjes(
+            Session, servicio, ids_usuarios, id_premio, args.intentos
+        )
+
+        print(f"⏱️ {args.intentos} intentos en {duracion:.2f} s: {args.intentos / duracion:.0f} intentos/s")
+        if resultados["canjeado"]:
+            print(f"⏱️ {resultados['canjeado']} canjes en {duracion_canjes:.2f} s: "
+                  f"{resultados['canjeado'] / duracion_canjes:.0f} canjes/s")
+        # Incluye la espera por una conexión libre del pool
+        print(f"📊 Latencia por intento: p50 {percentil(latencias, 50):.1f} ms, "
+              f"p95 {percentil(latencias, 95):.1f} ms, p99 {percentil(latencias, 99):.1f} ms")
+        for resultado, cantidad in resultados.most_common():
+            print(f"   {resultado}: {cantidad}")
+
+        fallas = await comprobar(Session, args, id_premio, resultados["canjeado"])
+    finally:
+        await eliminar_datos(Session)
+        await engine.dispose()
+        print("🧹 Datos de prueba eliminados")
+
+    if fallas:
+        for falla in fallas:
+            print(f"❌ {falla}")
+        return 1
+    print("✅ Sin sobreventa de stock ni de puntos")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Canjes simultáneos contra un premio con stock limitado")
+    parser.add_argument("--usuarios", type=int, default=500, help="Usuarios que compiten por el premio")
+    parser.add_argument("--intentos", type=int, default=3000, help="Intentos de canje en total (se reparten entre los usuarios)")
+    parser.add_argument("--stock", type=int, default=300, help="Stock inicial del premio")
+    parser.add_argument("--costo", type=int, default=10, help="Costo del premio en puntos")
+    parser.add_argument("--puntos", type=int, default=30, help="Puntos iniciales de cada usuario")
+    parser.add_argument("--conexiones", type=int, default=20, help="Conexiones a la base (transacciones simultáneas)")
+    argumentos = parser.parse_args()
+    if min(argumentos.usuarios, argumentos.intentos, argumentos.costo, argumentos.conexiones) < 1 or argumentos.stock < 0:
+        parser.error("usuarios, intentos, costo y conexiones deben ser positivos; stock no puede ser negativo")
+    sys.exit(asyncio.run(main(argumentos)))
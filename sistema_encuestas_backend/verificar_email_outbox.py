@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Prueba de la bandeja de salida de correos contra un servidor SMTP local
+
+Levanta un servidor aiosmtpd en 127.0.0.1 (sin TLS ni login), encola correos
+de verificación con email_service y los envía con email_outbox_service
+llamando a procesar_lote, como lo hace el ciclo de cada worker. Comprueba que:
+
+- todos los correos llegan una sola vez y quedan 'enviado',
+- el pool no abre más conexiones SMTP que EMAIL_OUTBOX_CONEXIONES,
+- un rechazo temporal (451) se reintenta y termina enviado,
+- un rechazo permanente (550) queda 'fallido' sin reintentos.
+
+Informa correos por segundo con el pool y con una conexión nueva por correo
+(el envío anterior, aiosmtplib.send). Termina con código 1 si alguna
+comprobación falla. Elimina los correos de prueba al terminar.
+
+No corre si hay correos pendientes ajenos a la prueba: se enviarían al
+servidor local.
+
+Uso:
+    python verificar_email_outbox.py
+    python verificar_email_outbox.py --correos 1000 --conexiones 4 --lote 50
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+import uuid
+from collections import Counter
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Deben fijarse antes de importar la app (EmailService y Settings se leen al importar)
+PUERTO_SMTP = _puerto_libre()
+os.environ["SMTP_SERVER"] = "127.0.0.1"
+os.environ["SMTP_PORT"] = str(PUERTO_SMTP)
+os.environ["SMTP_USE_TLS"] = "false"
+os.environ["SMTP_USERNAME"] = ""
+os.environ["SMTP_PASSWORD"] = ""
+os.environ["EMAIL_OUTBOX_ACTIVO"] = "false"
+os.environ.setdefault("LOG_NIVEL", "WARNING")
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+from sqlalchemy import delete, func, select, update
+
+from app.database import SessionLocal
+from app.models.email_outbox import EmailOutbox, EstadoEmail
+from app.services.email_outbox_service import EmailOutboxService
+from app.services.email_service import email_service
+
+SUFIJO = uuid.uuid4().hex[:8]
+PREFIJO = f"outbox_{SUFIJO}"
+
+
+class ServidorPrueba:
+    """Handler de aiosmtpd: guarda los destinatarios y la conexión de cada correo"""
+
+    def __init__(self):
+        self.recibidos = Counter()
+        self.conexiones = set()
+        self.rechazos_temporales = Counter()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if "rechazado" in address:
+            return "550 5.1.1 Buzon inexistente"
+        if "temporal" in address and not self.rechazos_temporales[address]:
+            self.rechazos_temporales[address] += 1
+            return "451 4.2.0 Intente mas tarde"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.conexiones.add(session.peer)
+        self.recibidos.update(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+async def encolar(destinatarios) -> float:
+    """Encola un correo de verificación por destinatario; devuelve segundos por correo"""
+    inicio = time.perf_counter()
+    async with SessionLocal() as db:
+        for destinatario in destinatarios:
+            email_service.encolar_correo_verificacion(db, destinatario, "Prueba", uuid.uuid4().hex)
+        await db.commit()
+    return (time.perf_counter() - inicio) / max(len(destinatarios), 1)
+
+
+async def vaciar(servicio: EmailOutboxService) -> int:
+    procesados = 0
+    while True:
+        n = await servicio.procesar_lote()
+        if n == 0:
+            return procesados
+        procesados += n
+
+
+async def estados() -> dict:
+    async with SessionLocal() as db:
+        filas = await db.execute(
+            select(EmailOutbox.destinatario, EmailOutbox.estado, EmailOutbox.intentos)
+            .where(EmailOutbox.destinatario.like(f"{PREFIJO}%"))
+        )
+        return {f.destinatario: (f.estado, f.intentos) for f in filas}
+
+
+async def main(args) -> int:
+    async with SessionLocal() as db:
+        ajenos = await db.scalar(
+            select(func.count()).select_from(EmailOutbox)
+            .where(EmailOutbox.estado == EstadoEmail.PENDIENTE)
+            .where(EmailOutbox.destinatario.not_like(f"{PREFIJO}%"))
+        )
+    if ajenos:
+        print(f"❌ Hay {ajenos} correos pendientes reales en email_outbox; no se ejecuta la prueba")
+        return 1
+
+    handler = ServidorPrueba()
+    controlador = Controller(handler, hostname="127.0.0.1", port=PUERTO_SMTP)
+    controlador.start()
+    servicio = EmailOutboxService(
+        activo=False, intervalo_segundos=1, tamano_lote=args.lote,
+        conexiones=args.conexiones, max_intentos=3
+    )
+    errores = []
+
+    print(f"📧 Servidor SMTP de prueba en 127.0.0.1:{PUERTO_SMTP}")
+    try:
+        # 1. Envío con el pool
+        destinatarios = [f"{PREFIJO}_{i}@example.com" for i in range(args.correos)]
+        por_correo = await encolar(destinatarios)
+        inicio = time.perf_counter()
+        await vaciar(servicio)
+        duracion = time.perf_counter() - inicio
+        print(f"   encolar: {por_correo * 1000:.2f} ms por correo (lo que espera el endpoint)")
+        print(f"   pool de {args.conexiones} conexiones: {args.correos} correos en {duracion:.2f} s "
+              f"({args.correos / duracion:.0f}/s), {len(handler.conexiones)} conexiones SMTP")
+
+        resultado = await estados()
+        if any(handler.recibidos[d] != 1 for d in destinatarios):
+            errores.append("no todos los correos llegaron exactamente una vez")
+        if any(resultado[d][0] != EstadoEmail.ENVIADO for d in destinatarios):
+            errores.append("hay correos enviados que no quedaron 'enviado'")
+        if len(handler.conexiones) > args.conexiones:
+            errores.append(f"se usaron {len(handler.conexiones)} conexiones (máximo {args.conexiones})")
+
+        # 2. Una conexión por correo, como antes de la bandeja de salida
+        inicio = time.perf_counter()
+        for i in range(args.correos):
+            mensaje = email_service.armar_mensaje(f"{PREFIJO}_directo_{i}@example.com", "Prueba", "<p>Prueba</p>")
+            await aiosmtplib.send(mensaje, hostname="127.0.0.1", port=PUERTO_SMTP, start_tls=False)
+        directo = time.perf_counter() - inicio
+        print(f"   una conexión por correo: {args.correos} correos en {directo:.2f} s ({args.correos / directo:.0f}/s)")
+
+        # 3. Rechazo temporal y permanente
+        temporal, rechazado = f"{PREFIJO}_temporal@example.com", f"{PREFIJO}_rechazado@example.com"
+        await encolar([temporal, rechazado])
+        await vaciar(servicio)
+        resultado = await estados()
+        if resultado[temporal] != (EstadoEmail.PENDIENTE, 1):
+            errores.append(f"el rechazo temporal quedó {resultado[temporal]} (esperado pendiente, 1 intento)")
+        if resultado[rechazado] != (EstadoEmail.FALLIDO, 1):
+            errores.append(f"el rechazo permanente quedó {resultado[rechazado]} (esperado fallido, 1 intento)")
+
+        # Se adelanta la espera exponencial para no aguardarla
+        async with SessionLocal() as db:
+            await db.execute(
+                update(EmailOutbox).where(EmailOutbox.destinatario == temporal).values(proximo_intento=func.now())
+            )
+            await db.commit()
+        await vaciar(servicio)
+        resultado = await estados()
+        if resultado[temporal] != (EstadoEmail.ENVIADO, 2) or handler.recibidos[temporal] != 1:
+            errores.append(f"el reintento del rechazo temporal quedó {resultado[temporal]}")
+        print(f"   reintentos: {servicio.reintentos}, fallidos: {servicio.fallidos}")
+    finally:
+        await servicio.detener()
+        controlador.stop()
+        async with SessionLocal() as db:
+            await db.execute(delete(EmailOutbox).where(EmailOutbox.destinatario.like(f"{PREFIJO}%")))
+            await db.commit()
+
+    if errores:
+        for error in errores:
+            print(f"❌ {error}")
+        return 1
+    print("✅ Bandeja de salida verificada")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Envío de email_outbox contra un servidor aiosmtpd local")
+    parser.add_argument("--correos", type=int, default=300, help="Correos a encolar y enviar")
+    parser.add_argument("--conexiones", type=int, default=2, help="Conexiones SMTP del pool")
+    parser.add_argument("--lote", type=int, default=20, help="Correos reclamados por lote")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Verificación del presupuesto de consultas SQL por ruta
+
+Crea datos de prueba (usuarios, encuestas con preguntas y opciones,
+participaciones, respuestas, premios y canjes), llama a cada ruta GET de la API con el
+encabezado X-Query-Budget y compara las sentencias ejecutadas contra el
+presupuesto declarado con @presupuesto_consultas. Termina con código 1 si
+alguna ruta lo supera, para usarlo en CI.
+
+Con varias encuestas y respuestas, una consulta dentro de un bucle (N+1)
+aparece como una huella repetida y hace que la ruta supere su presupuesto.
+Las rutas de administración se llaman con la cuenta admin y el resto con la
+cuenta usuario, dueña de las participaciones, respuestas y canjes de prueba.
+
+Elimina los datos de prueba al terminar.
+
+Uso:
+    python verificar_presupuestos_consultas.py
+    python verificar_presupuestos_consultas.py --encuestas 10 --detalle
+"""
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Deben fijarse antes de importar la app (Settings se lee al importar)
+os.environ["PRESUPUESTO_CONSULTAS_HEADER"] = "true"
+os.environ["RATE_LIMIT_ACTIVO"] = "false"
+os.environ["EMAIL_OUTBOX_ACTIVO"] = "false"
+os.environ.setdefault("LOG_NIVEL", "WARNING")
+
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.database import crear_engine, engine
+from app.main import app
+from app.middleware.auth_middleware import cache_usuarios
+from app.models import Canje, Encuesta, Opcion, Participacion, Pregunta, Premio, Respuesta, Usuario
+from app.models.premio import TipoPremio
+from app.services.configuracion_service import configuracion_service
+from app.services.definiciones_encuesta_service import definiciones_encuesta_service
+from app.utils.jwt_manager import crear_token
+from app.utils.presupuesto_consultas import ReporteConsultas, presupuesto_de_ruta
+
+SUFIJO = uuid.uuid4().hex[:8]
+PREFIJO = f"presupuesto_{SUFIJO}"
+
+# Rutas que no se verifican: documentación y métricas no consultan la base
+EXCLUIDAS = {"/openapi.json", "/docs", "/docs/oauth2-redirect", "/redoc", "/metrics"}
+
+# Dependencias que exigen rol de administrador; las rutas que no las usan se llaman con
+# la cuenta "usuario", dueña de las participaciones y respuestas de prueba, para que las
+# rutas del usuario actual (/usuario/me, canjes, historial) recorran datos reales
+DEPENDENCIAS_ADMIN = {"admin_required", "get_admin_user"}
+# Rutas que verifican el rol dentro del handler
+RUTAS_ADMIN = {"/api/premios/admin"}
+
+
+async def crear_datos(Session, cantidad_encuestas: int) -> dict:
+    """Crea los datos de prueba y devuelve los ids para completar las rutas"""
+    async with Session() as db:
+        admin = Usuario(
+            nombre="Admin", apellido=PREFIJO, documento_numero=f"pc-{SUFIJO}-a",
+            email=f"{PREFIJO}_admin@example.com", rol_id=1, email_verificado=True, metodo_registro="local"
+        )
+        usuario = Usuario(
+            nombre="Usuario", apellido=PREFIJO, documento_numero=f"pc-{SUFIJO}-u",
+            email=f"{PREFIJO}_usuario@example.com", rol_id=3, email_verificado=True, metodo_registro="local",
+            puntos_totales=500, puntos_disponibles=500
+        )
+        db.add_all([admin, usuario])
+        await db.flush()
+
+        ids = {"admin": admin, "usuario": usuario, "encuestas": [], "participaciones": [], "premios": []}
+        for i in range(cantidad_encuestas):
+            encuesta = Encuesta(
+                titulo=f"{PREFIJO} encuesta {i}", descripcion="Generada por verificar_presupuestos_consultas.py",
+                puntos_otorga=10, estado=True, visible_para="usuarios", id_usuario_creador=admin.id_usuario
+            )
+            db.add(encuesta)
+            await db.flush()
+            ids["encuestas"].append(encuesta.id_encuesta)
+
+            participacion = Participacion(id_usuario=usuario.id_usuario, id_encuesta=encuesta.id_encuesta, puntaje_obtenido=10)
+            db.add(participacion)
+            await db.flush()
+            ids["participaciones"].append(participacion.id_participacion)
+
+            for orden in range(4):
+                tipo = "texto" if orden == 3 else "opcion_multiple"
+                pregunta = Pregunta(id_encuesta=encuesta.id_encuesta, orden=orden, tipo=tipo, texto=f"Pregunta {orden}")
+                db.add(pregunta)
+                await db.flush()
+                if tipo == "texto":
+                    ids.setdefault("pregunta_texto", pregunta.id_pregunta)
+                    db.add(Respuesta(
+                        id_pregunta=pregunta.id_pregunta, id_usuario=usuario.id_usuario,
+                        id_participacion=participacion.id_participacion, respuesta_texto="Texto libre"
+                    ))
+                    continue
+                opciones = [Opcion(id_pregunta=pregunta.id_pregunta, texto_opcion=f"Opción {j}") for j in range(3)]
+                db.add_all(opciones)
+                await db.flush()
+                db.add(Respuesta(
+                    id_pregunta=pregunta.id_pregunta, id_usuario=usuario.id_usuario,
+                    id_participacion=participacion.id_participacion, id_opcion=opciones[0].id_opcion
+                ))
+
+        for i in range(3):
+            premio = Premio(nombre=f"{PREFIJO} premio {i}", costo_puntos=100, tipo=TipoPremio.DIGITAL)
+            db.add(premio)
+            await db.flush()
+            ids["premios"].append(premio.id_premio)
+            # Canjes del usuario: historial de canjes con una fila por premio
+            db.add(Canje(id_usuario=usuario.id_usuario, id_premio=premio.id_premio, puntos_utilizados=100))
+
+        await db.commit()
+        ids["admin"] = {"id": admin.id_usuario, "email": admin.email}
+        ids["usuario"] = {"id": usuario.id_usuario, "email": usuario.email}
+        return ids
+
+
+async def eliminar_datos(Session) -> None:
+    """Elimina todo lo creado con el prefijo de esta ejecución"""
+    async with Session() as db:
+        usuarios = select(Usuario.id_usuario).where(Usuario.apellido == PREFIJO)
+        encuestas = select(Encuesta.id_encuesta).where(Encuesta.titulo.like(f"{PREFIJO}%"))
+        preguntas = select(Pregunta.id_pregunta).where(Pregunta.id_encuesta.in_(encuestas))
+        await db.execute(delete(Canje).where(Canje.id_usuario.in_(usuarios)))
+        await db.execute(delete(Respuesta).where(Respuesta.id_usuario.in_(usuarios)))
+        await db.execute(delete(Participacion).where(Participacion.id_usuario.in_(usuarios)))
+        await db.execute(delete(Opcion).where(Opcion.id_pregunta.in_(preguntas)))
+        await db.execute(delete(Pregunta).where(Pregunta.id_encuesta.in_(encuestas)))
+        await db.execute(delete(Encuesta).where(Encuesta.titulo.like(f"{PREFIJO}%")))
+        await db.execute(delete(Premio).where(Premio.nombre.like(f"{PREFIJO}%")))
+        await db.execute(delete(Usuario).where(Usuario.apellido == PREFIJO))
+        await db.commit()
+
+
+def token(datos: dict, rol_id: int) -> str:
+    return crear_token({"sub": datos["email"], "usuario_id": datos["id"], "rol_id": rol_id, "email_verificado": True})
+
+
+def _dependencias(dependant) -> set:
+    nombres = set()
+    for sub in dependant.dependencies:
+        nombres.add(getattr(sub.call, "__name__", None))
+        nombres |= _dependencias(sub)
+    return nombres
+
+
+def es_ruta_admin(ruta: APIRoute) -> bool:
+    return ruta.path in RUTAS_ADMIN or bool(_dependencias(ruta.dependant) & DEPENDENCIAS_ADMIN)
+
+
+def verificar_rutas(ids: dict, detalle: bool) -> int:
+    """Llama a cada ruta GET y devuelve la cantidad de rutas que superan su presupuesto"""
+    parametros = {
+        "encuesta_id": ids["encuestas"][0],
+        "id_encuesta": ids["encuestas"][0],
+        "id_participacion": ids["participaciones"][0],
+        "id_usuario": ids["usuario"]["id"],
+        "premio_id": ids["premios"][0],
+        "id_pregunta": ids["pregunta_texto"],
+    }
+    headers_admin = {"Authorization": f"Bearer {token(ids['admin'], 1)}", "X-Query-Budget": "declarado"}
+    headers_usuario = {"Authorization": f"Bearer {token(ids['usuario'], 3)}", "X-Query-Budget": "declarado"}
+
+    # Texto de cada sentencia para mostrar las huellas; el conteo lo informa la API en X-Query-Count
+    sentencias = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def guardar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    excedidas, sin_presupuesto = [], []
+    print(f"{'Ruta':<90} | {'Cuenta':<7} | {'HTTP':>4} | {'SQL':>4} | {'Máx':>4} | {'Rep':>4}")
+    print("-" * 128)
+    with TestClient(app) as cliente:
+        for ruta in app.routes:
+            if not isinstance(ruta, APIRoute) or "GET" not in ruta.methods or ruta.path in EXCLUIDAS:
+                continue
+            url = ruta.path.format(**parametros)
+            # Cachés vacías: se mide el peor caso (usuario, definición de encuesta y configuración desde la base)
+            cache_usuarios.limpiar()
+            definiciones_encuesta_service.cache.limpiar()
+            configuracion_service.invalidar()
+            sentencias.clear()
+            cuenta = "admin" if es_ruta_admin(ruta) else "usuario"
+            respuesta = cliente.get(url, headers=headers_admin if cuenta == "admin" else headers_usuario)
+            consultas = int(respuesta.headers.get("x-query-count", len(sentencias)))
+            maximo = presupuesto_de_ruta(ruta)
+            reporte = ReporteConsultas(list(sentencias))
+            repetidas = sum(reporte.repetidas().values())
+
+            if maximo is None:
+                marca = "⚪"
+                sin_presupuesto.append(ruta.path)
+            elif consultas > maximo:
+                marca = "❌"
+                excedidas.append((ruta.path, reporte, maximo))
+            else:
+                marca = "✅"
+            texto_maximo = "-" if maximo is None else str(maximo)
+            print(f"{marca} {ruta.path:<88} | {cuenta:<7} | {respuesta.status_code:>4} | {consultas:>4} | {texto_maximo:>4} | {repetidas:>4}")
+            if detalle and sentencias:
+                print("\n".join("      " + linea for linea in reporte.texto(maximo).splitlines()))
+
+    event.remove(engine.sync_engine, "before_cursor_execute", guardar)
+
+    if sin_presupuesto:
+        print(f"\n⚪ {len(sin_presupuesto)} rutas GET sin presupuesto declarado")
+    for path, reporte, maximo in excedidas:
+        print(f"\n❌ {path} supera su presupuesto")
+        print(reporte.texto(maximo))
+    return len(excedidas)
+
+
+async def main(args) -> int:
+    engine_datos = crear_engine(poolclass=NullPool)
+    Session = sessionmaker(bind=engine_datos, class_=AsyncSession, expire_on_commit=False)
+
+    print("🔍 Verificación de presupuestos de consultas por ruta")
+    print(f"📦 Datos de prueba: {args.encuestas} encuestas (prefijo {PREFIJO})")
+    print("=" * 128)
+    try:
+        ids = await crear_datos(Session, args.encuestas)
+        # TestClient usa su propio event loop
+        excedidas = await asyncio.to_thread(verificar_rutas, ids, args.detalle)
+    finally:
+        await eliminar_datos(Session)
+        await engine_datos.dispose()
+        print("🧹 Datos de prueba eliminados")
+
+    if excedidas:
+        print(f"\n❌ {excedidas} rutas superan su presupuesto de consultas")
+        return 1
+    print("\n✅ Todas las rutas con presupuesto lo respetan")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica el presupuesto de consultas SQL de cada ruta GET")
+    parser.add_argument("--encuestas", type=int, default=5, help="Encuestas de prueba (más encuestas hacen visibles los N+1)")
+    parser.add_argument("--detalle", action="store_true", help="Mostrar las huellas de las sentencias de cada ruta")
+    sys.exit(asyncio.run(main(parser.parse_args())))
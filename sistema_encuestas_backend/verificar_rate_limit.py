@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Prueba del rate limiter (GCRA) con reloj controlado y contra Redis
+
+Con BackendMemoria y un reloj falso comprueba que:
+
+- una ráfaga deja pasar exactamente `rafaga` peticiones y rechaza la siguiente,
+- reintentar_en (Retry-After) es el tiempo exacto hasta la próxima petición
+  permitida: un instante antes se rechaza y en ese instante se permite,
+- a ritmo sostenido (una petición por intervalo) nunca se rechaza,
+- el diccionario de claves queda acotado a max_claves.
+
+Con RateLimitMiddleware y una app ASGI mínima comprueba que el límite de login
+se aplica solo a POST /api/auth/login (no a cualquier ruta que contenga
+"login"), que el 429 trae Retry-After, que detrás de un proxy confiable cada
+cliente (X-Real-IP / X-Forwarded-For) tiene su propio límite y que un cliente
+que llega directo no puede falsear esos encabezados.
+
+Si hay un Redis accesible (--redis-url, por defecto REDIS_URL), envía la misma
+secuencia de peticiones a BackendRedis y a BackendMemoria y compara permitido,
+restantes y reintentar_en. Sin Redis esa parte se omite (o falla con
+--requerir-redis). Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python verificar_rate_limit.py
+    python verificar_rate_limit.py --redis-url redis://localhost:6379/0 --requerir-redis
+"""
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Deben fijarse antes de importar la app (Settings y las reglas se leen al importar)
+os.environ["RATE_LIMIT_ACTIVO"] = "true"
+os.environ["RATE_LIMIT_BACKEND"] = "memoria"
+os.environ["RATE_LIMIT_IP_DESDE_PROXY"] = "true"
+os.environ["RATE_LIMIT_PROXIES_CONFIABLES"] = "10.0.0.5/32"
+os.environ["RATE_LIMIT_LOGIN_POR_MINUTO"] = "5"
+os.environ["RATE_LIMIT_GENERAL_POR_MINUTO"] = "120"
+os.environ.setdefault("LOG_NIVEL", "WARNING")
+
+import httpx
+
+from app.config import settings
+from app.middleware.rate_limiter import (
+    BackendMemoria, BackendRedis, RateLimiter, RateLimitMiddleware, ReglaLimite
+)
+
+PROXY = "10.0.0.5"
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self) -> float:
+        return self.ahora
+
+
+async def app_ok(scope, receive, send):
+    """App ASGI mínima detrás del middleware"""
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def comprobar(errores: list, condicion: bool, mensaje: str) -> None:
+    if not condicion:
+        errores.append(mensaje)
+
+
+async def probar_gcra(errores: list) -> None:
+    reloj = RelojFalso()
+    limitador = RateLimiter(BackendMemoria(reloj=reloj))
+    regla = ReglaLimite("prueba", limite=5, periodo_segundos=60)  # intervalo 12 s, ráfaga 5
+
+    resultados = [await limitador.verificar("a", regla) for _ in range(6)]
+    comprobar(errores, [r.permitido for r in resultados] == [True] * 5 + [False],
+              f"ráfaga: {[r.permitido for r in resultados]} (esperado 5 permitidas y 1 rechazada)")
+    comprobar(errores, [r.restantes for r in resultados[:5]] == [4, 3, 2, 1, 0],
+              f"restantes en la ráfaga: {[r.restantes for r in resultados[:5]]}")
+    espera = resultados[-1].reintentar_en
+    comprobar(errores, abs(espera - 12.0) < 1e-6, f"reintentar_en tras la ráfaga: {espera} (esperado 12)")
+
+    reloj.ahora += espera - 0.01
+    comprobar(errores, not (await limitador.verificar("a", regla)).permitido,
+              "se permitió una petición antes de reintentar_en")
+    reloj.ahora += 0.01
+    comprobar(errores, (await limitador.verificar("a", regla)).permitido,
+              "se rechazó la petición al cumplirse reintentar_en")
+    comprobar(errores, (await limitador.verificar("b", regla)).permitido,
+              "el límite de una clave afectó a otra")
+
+    # Ritmo sostenido: una petición por intervalo durante 10 periodos
+    sostenida = RateLimiter(BackendMemoria(reloj=reloj))
+    rechazos = 0
+    for _ in range(50):
+        rechazos += not (await sostenida.verificar("c", regla)).permitido
+        reloj.ahora += regla.intervalo
+    comprobar(errores, rechazos == 0, f"ritmo sostenido: {rechazos} rechazos (esperado 0)")
+
+    # Ráfaga explícita de 1: a 60/min, la segunda petición inmediata espera 1 s
+    regla_sin_rafaga = ReglaLimite("sin_rafaga", limite=60, rafaga=1)
+    await sostenida.verificar("d", regla_sin_rafaga)
+    segunda = await sostenida.verificar("d", regla_sin_rafaga)
+    comprobar(errores, not segunda.permitido and abs(segunda.reintentar_en - 1.0) < 1e-6,
+              f"ráfaga 1: {segunda} (esperado rechazo con reintentar_en 1)")
+
+    backend = BackendMemoria(max_claves=100, reloj=reloj)
+    for i in range(1000):
+        await backend.consumir(f"ip{i}", regla.intervalo, regla.tolerancia)
+    comprobar(errores, len(backend) <= 100, f"BackendMemoria guarda {len(backend)} claves (máximo 100)")
+    print("   GCRA en memoria: ráfaga, Retry-After, ritmo sostenido y claves acotadas")
+
+
+async def probar_middleware(errores: list) -> None:
+    reloj = RelojFalso()
+    limitador = RateLimiter(BackendMemoria(reloj=reloj))
+    app = RateLimitMiddleware(app_ok, limitador=limitador)
+
+    async def pedir(ruta: str, cliente: str, headers: dict = None) -> httpx.Response:
+        transporte = httpx.ASGITransport(app=app, client=(cliente, 40000))
+        async with httpx.AsyncClient(transport=transporte, base_url="http://api") as c:
+            return await c.post(ruta, headers=headers or {})
+
+    login = settings.rate_limit_login_por_minuto
+    codigos = [(await pedir("/api/auth/login", "203.0.113.1")).status_code for _ in range(login + 1)]
+    comprobar(errores, codigos == [200] * login + [429], f"login directo: {codigos}")
+    rechazo = await pedir("/api/auth/login", "203.0.113.1")
+    comprobar(errores, rechazo.headers.get("retry-after") == str(int(60 / login)),
+              f"Retry-After del login: {rechazo.headers.get('retry-after')} (esperado {int(60 / login)})")
+
+    # Una ruta que contiene "login" usa la regla general
+    otra = [(await pedir("/api/encuestas/login-social", "203.0.113.2")).status_code for _ in range(login + 1)]
+    comprobar(errores, otra == [200] * (login + 1), f"/api/encuestas/login-social limitada como login: {otra}")
+
+    # Detrás del proxy confiable cada cliente tiene su propio límite
+    for ip in ("198.51.100.1", "198.51.100.2"):
+        codigos = [
+            (await pedir("/api/auth/login", PROXY, {"X-Real-IP": ip})).status_code for _ in range(login)
+        ]
+        comprobar(errores, codigos == [200] * login, f"login de {ip} por el proxy: {codigos}")
+    codigo = (await pedir("/api/auth/login", PROXY, {"X-Forwarded-For": "1.2.3.4, 198.51.100.1"})).status_code
+    comprobar(errores, codigo == 429, f"X-Forwarded-For tomó la IP falseada por el cliente ({codigo})")
+
+    # Un cliente directo no puede cambiar de límite con X-Real-IP
+    codigo = (await pedir("/api/auth/login", "203.0.113.1", {"X-Real-IP": "192.0.2.99"})).status_code
+    comprobar(errores, codigo == 429, f"X-Real-IP de un cliente no confiable fue aceptado ({codigo})")
+    print("   Middleware: rutas de login exactas, Retry-After e IP del cliente detrás del proxy")
+
+
+async def probar_paridad_redis(errores: list, args) -> None:
+    try:
+        import redis.asyncio as redis_asyncio
+        cliente = redis_asyncio.from_url(args.redis_url)
+        await cliente.ping()
+    except Exception as e:
+        mensaje = f"Redis no disponible en {args.redis_url} ({type(e).__name__})"
+        if args.requerir_redis:
+            errores.append(mensaje)
+        else:
+            print(f"   ⚪ {mensaje}; se omite la paridad con memoria")
+        return
+
+    # intervalo 100 ms, ráfaga 3; los instantes caen a 50 ms de cualquier frontera
+    regla = ReglaLimite("paridad", limite=10, periodo_segundos=1, rafaga=3)
+    instantes = [0.0] * 5 + [0.15] * 2 + [0.45] * 4 + [1.05] * 5
+    reloj = RelojFalso()
+    memoria = BackendMemoria(reloj=reloj)
+    redis_backend = BackendRedis(cliente, prefijo=f"rate_limit_prueba_{uuid.uuid4().hex[:8]}:")
+    clave = "paridad"
+
+    esperados, obtenidos = [], []
+    inicio_reloj = reloj.ahora
+    loop = asyncio.get_running_loop()
+    inicio = loop.time()
+    try:
+        for instante in instantes:
+            reloj.ahora = inicio_reloj + instante
+            esperados.append(await memoria.consumir(clave, regla.intervalo, regla.tolerancia))
+            await asyncio.sleep(max(0.0, inicio + instante - loop.time()))
+            obtenidos.append(await redis_backend.consumir(clave, regla.intervalo, regla.tolerancia))
+    finally:
+        await cliente.delete(redis_backend.prefijo + clave)
+        await cliente.aclose()
+
+    for i, (m, r) in enumerate(zip(esperados, obtenidos)):
+        if m.permitido != r.permitido or m.restantes != r.restantes or abs(m.reintentar_en - r.reintentar_en) > 0.03:
+            errores.append(f"paridad Redis/memoria en la petición {i} (t={instantes[i]}): memoria {m}, redis {r}")
+    print(f"   Redis y memoria: {len(instantes)} peticiones con las mismas decisiones")
+
+
+async def main(args) -> int:
+    errores = []
+    print("🚦 Verificación del rate limiter (GCRA)")
+    await probar_gcra(errores)
+    await probar_middleware(errores)
+    await probar_paridad_redis(errores, args)
+
+    if errores:
+        for error in errores:
+            print(f"❌ {error}")
+        return 1
+    print("✅ Rate limiter verificado")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GCRA, Retry-After y paridad Redis/memoria del rate limiter")
+    parser.add_argument("--redis-url", default=settings.redis_url)
+    parser.add_argument("--requerir-redis", action="store_true", help="Fallar si no hay Redis para la paridad")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -5,7 +5,7 @@ import { useEffect, useRef, useState } from "react";
 import Sidebar from "@/components/Sidebar";
 import TopbarInterno from "@/components/TopbarInterno";
 import Image from "next/image";
-import api from "@/app/services/api";
+import api, { getTodasLasPaginas } from "@/app/services/api";
 import { toast, ToastContainer } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
 
@@ -44,8 +44,8 @@ export default function CrearEncuestaPage() {
 
   const cargarEncuestas = async () => {
     try {
-      const response = await api.get("/encuestas/");
-      setEncuestasExistentes(response.data);
+      const encuestas = await getTodasLasPaginas<EncuestaExistente>("/encuestas/");
+      setEncuestasExistentes(encuestas);
     } catch (error) {
       console.error("Error al cargar encuestas:", error);
       toast.error("Error al cargar las encuestas");
@@ -4,7 +4,7 @@ import { useState, useEffect, useCallback } from "react";
 import { useAuth } from "@/context/authContext";
 import api from "@/app/services/api";
 import { FaDownload, FaTable } from "react-icons/fa";
-import { exportToPDF, exportToExcel, exportToCSV, exportToJSON } from "@/app/utils/exportUtils";
+import { exportToPDF, exportToJSON, descargarExportacionEncuesta } from "@/app/utils/exportUtils";
 
 interface Encuesta {
   id: number;
@@ -86,7 +86,7 @@ export default function RespuestasDetalladasPage() {
     });
   };
 
-  const exportarDatos = (formato: 'pdf' | 'excel' | 'csv' | 'json') => {
+  const exportarDatos = (formato: 'pdf' | 'excel' | 'csv' | 'json' | 'parquet') => {
     if (respuestas.length === 0) return;
 
     const columnas = obtenerColumnas();
@@ -118,20 +118,21 @@ export default function RespuestasDetalladasPage() {
           title: `Respuestas: ${respuestas[0]?.encuesta_nom || ''}`
         });
         break;
+      // Excel y CSV se generan en el servidor con todas las participaciones
       case 'excel':
-        exportToExcel({
-          filename,
-          headers,
-          data,
-          title: 'Respuestas Detalladas'
-        });
+        descargarExportacionEncuesta(selectedEncuesta!, 'xlsx', filename).catch(error =>
+          console.error("Error al exportar:", error)
+        );
         break;
       case 'csv':
-        exportToCSV({
-          filename,
-          headers,
-          data
-        });
+        descargarExportacionEncuesta(selectedEncuesta!, 'csv', filename).catch(error =>
+          console.error("Error al exportar:", error)
+        );
+        break;
+      case 'parquet':
+        descargarExportacionEncuesta(selectedEncuesta!, 'parquet', filename).catch(error =>
+          console.error("Error al exportar:", error)
+        );
         break;
       case 'json':
         exportToJSON({
@@ -203,6 +204,13 @@ export default function RespuestasDetalladasPage() {
               <FaDownload />
               JSON
             </button>
+            <button
+              onClick={() => exportarDatos('parquet')}
+              className="px-4 py-2 bg-gray-700 text-white rounded-lg hover:bg-gray-800 transition-colors flex items-center gap-2"
+            >
+              <FaDownload />
+              Parquet
+            </button>
           </div>
         </div>
       )}
@@ -22,6 +22,7 @@ interface EstadisticaPregunta {
   pregunta: string;
   estadisticas?: Record<string, number>;
   respuestas_texto?: string[];
+  total_respuestas_texto?: number;
 }
 
 interface ResultadosData {
@@ -98,7 +99,7 @@ export default function ResultadosAgregadosPage() {
         return {
           pregunta: pregunta.pregunta,
           tipo: 'Texto Libre',
-          resultados: `${pregunta.respuestas_texto?.length || 0} respuestas`
+          resultados: `${pregunta.total_respuestas_texto ?? pregunta.respuestas_texto?.length ?? 0} respuestas`
         };
       }
     });
@@ -294,7 +295,7 @@ export default function ResultadosAgregadosPage() {
               ) : (
                 <div>
                   <h4 className="text-sm font-medium text-gray-600 mb-2">
-                    Respuestas de texto ({pregunta.respuestas_texto?.length || 0} respuestas)
+                    Respuestas de texto ({pregunta.total_respuestas_texto ?? pregunta.respuestas_texto?.length ?? 0} respuestas)
                   </h4>
                   <div className="max-h-64 overflow-y-auto border rounded p-3">
                     {pregunta.respuestas_texto?.map((respuesta, idx) => (
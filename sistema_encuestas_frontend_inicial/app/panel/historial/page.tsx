@@ -4,7 +4,7 @@ import { useEffect, useState } from "react";
 import { useAuth } from "@/context/authContext";
 import { useRouter } from "next/navigation";
 import Link from "next/link";
-import api from "@/app/services/api";
+import { getTodasLasPaginas } from "@/app/services/api";
 
 interface ParticipacionItem {
   id_participacion: number;
@@ -30,10 +30,10 @@ export default function HistorialPage() {
     const fetchHistorial = async () => {
       if (!user) return;
       try {
-        const res = await api.get(
+        const participaciones = await getTodasLasPaginas<ParticipacionItem>(
           `/respuestas/participaciones/${(user as any).id_usuario || user.id_usuario}`
         );
-        setHistorial(res.data);
+        setHistorial(participaciones);
       } catch (error) {
         console.error("Error cargando historial", error);
       }
@@ -1,5 +1,5 @@
 // services/api.ts
-import axios, { AxiosError } from "axios";
+import axios, { AxiosError, AxiosRequestConfig } from "axios";
 import { toast } from "react-toastify";
 
 // Configuración de la API
@@ -77,4 +77,22 @@ api.interceptors.response.use(
   },
 );
 
+// Listados paginados por cursor: sigue X-Next-Cursor hasta la última página
+export async function getTodasLasPaginas<T = any>(
+  url: string,
+  config: AxiosRequestConfig = {},
+): Promise<T[]> {
+  const filas: T[] = [];
+  let cursor: string | undefined;
+  do {
+    const response = await api.get<T[]>(url, {
+      ...config,
+      params: { ...config.params, cursor },
+    });
+    filas.push(...response.data);
+    cursor = response.headers["x-next-cursor"];
+  } while (cursor);
+  return filas;
+}
+
 export default api;
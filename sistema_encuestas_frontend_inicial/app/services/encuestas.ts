@@ -1,4 +1,4 @@
-import api from './api';
+import api, { getTodasLasPaginas } from './api';
 
 // Tipos para las encuestas
 export interface Encuesta {
@@ -216,7 +216,8 @@ export async function canjearPremio(data: any, token: string) {
 }
 
 export async function getHistorialCanjes(token: string) {
-  return api.get('/premios/canjes', { headers: { Authorization: `Bearer ${token}` } });
+  const data = await getTodasLasPaginas('/premios/canjes', { headers: { Authorization: `Bearer ${token}` } });
+  return { data };
 }
 
 export async function getMisDatos(token: string) {
@@ -1,6 +1,7 @@
 import jsPDF from "jspdf";
 import "jspdf-autotable";
 import * as XLSX from "xlsx";
+import api from "@/app/services/api";
 
 interface ExportOptions {
   filename: string;
@@ -80,6 +81,23 @@ export const exportToCSV = ({ filename, headers, data }: ExportOptions) => {
   link.click();
 };
 
+// Descargar CSV/XLSX/Parquet generado en el servidor (no arma el archivo en el navegador)
+export const descargarExportacionEncuesta = async (
+  idEncuesta: number,
+  formato: 'csv' | 'xlsx' | 'parquet',
+  filename: string
+) => {
+  const response = await api.get(`/admin/encuestas/${idEncuesta}/export`, {
+    params: { format: formato },
+    responseType: 'blob',
+  });
+  const link = document.createElement('a');
+  link.href = URL.createObjectURL(response.data);
+  link.download = `${filename}.${formato}`;
+  link.click();
+  URL.revokeObjectURL(link.href);
+};
+
 // Exportar a JSON
 export const exportToJSON = ({ filename, data }: { filename: string; data: any }) => {
   const jsonStr = JSON.stringify(data, null, 2);